@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Profile, Product, CatalogItem, SubCatigory, Order, ProductImage, Tag, Review, SpecificationsProduct, BasketObject
+from django.contrib.admin import helpers
+from django.http import HttpResponseRedirect
+from .banners import rebuild_auto_banners
+from .models import Banner, Profile, Product, CatalogItem, SubCatigory, Order, OrderLine, ProductImage, Tag, Review, SpecificationsProduct, BasketObject
 
 class ReviewInline(admin.TabularInline):
     model = Review
@@ -19,6 +22,12 @@ class SpecificationsProductInline(admin.StackedInline):
 class ProductInline(admin.TabularInline):
     model = Product.tags.through
     extra = 1
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    extra = 0
+    readonly_fields = ("product_id", "title", "description", "price", "count", "image_src", "image_alt")
+    can_delete = False
+
 class SubCatigoryInline(admin.TabularInline):
     model = SubCatigory
     extra = 1
@@ -35,6 +44,7 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ("pk", "count", "title", "price",  "freeDelivery","available",)
     list_display_links = list_display
     inlines = (ProductImageInline, TagInline, ReviewInline, SpecificationsProductInline)
+    readonly_fields = ("review_count", "rating")
     fieldsets = [
         ("main", {
            "fields":["title", "price", "count", "available", "description", "fullDescription", "category",]
@@ -47,6 +57,31 @@ class ProductAdmin(admin.ModelAdmin):
         })
     ]
 
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = ("pk", "product", "source", "position", "is_active")
+    list_display_links = list_display
+    list_select_related = ("product",)
+    actions = ("rebuild_auto",)
+
+    @admin.action(description = "Пересчитать автоматические баннеры (выбирать строки не нужно)")
+    def rebuild_auto(self, request, queryset):
+        """Пересчитывает все автоматические баннеры; выбранные строки не учитываются."""
+        count = rebuild_auto_banners()
+        self.message_user(request, f"Автоматических баннеров: {count}")
+
+    def changelist_view(self, request, extra_context = None):
+        # Admin требует выбрать строки для любого действия; пересчёту выбор не нужен
+        if (
+            request.method == "POST"
+            and request.POST.get("action") == "rebuild_auto"
+            and not request.POST.getlist(helpers.ACTION_CHECKBOX_NAME)
+            and "rebuild_auto" in self.get_actions(request)
+        ):
+            self.rebuild_auto(request, self.get_queryset(request))
+            return HttpResponseRedirect(request.get_full_path())
+        return super().changelist_view(request, extra_context)
+
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     inlines = (ProductInline,)
@@ -57,6 +92,7 @@ class SpecificationsProductAdmin(admin.ModelAdmin):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("pk", "created_at", "fullName", "phone", "address", "status", "city")
     list_display_links = list_display
+    inlines = (OrderLineInline, )
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
@@ -0,0 +1,166 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+
+from .banners import get_banner_product_ids
+from .cache import acached_response
+from .catalog import CatalogQuery
+from .catalog_index import catalog_index, is_enabled as is_catalog_index_enabled
+from .conditional import alist_condition, aproduct_condition
+from .fragments import FRAGMENT_ROW_FIELDS, fragment_response, get_fragments, get_row_fragments
+from .models import CatalogItem, Product
+from .pagination import apaginate_queryset
+from .projections import SALE_PRODUCT_FIELDS, product_rows, project_sale_products
+from .serializers import CatalogItemsSerializer, ProductIdSerializer
+from .utils import ServerTiming
+
+# Асинхронные версии читающих эндпоинтов для запуска под ASGI (backend/asgi.py).
+# Запросы к базе идут через асинхронный ORM, а синхронный код без async-API (кэш фрагментов,
+# снимок каталога, проекции товаров) — через ограниченный пул потоков sync_executor.
+# Ответы совпадают с ответами APIView из views.py байт в байт.
+ASYNC_SYNC_WORKERS = getattr(settings, "ASYNC_SYNC_WORKERS", 8)
+
+sync_executor = ThreadPoolExecutor(max_workers = ASYNC_SYNC_WORKERS, thread_name_prefix = "api-sync")
+renderer = JSONRenderer()
+
+
+def run_sync(func, *args, **kwargs):
+    """Выполняет синхронную функцию в ограниченном пуле потоков, не блокируя цикл событий."""
+    return sync_to_async(func, thread_sensitive = False, executor = sync_executor)(*args, **kwargs)
+
+
+def json_response(data, status:int = 200, headers:dict | None = None) -> HttpResponse:
+    return HttpResponse(renderer.render(data), status = status, content_type = "application/json", headers = headers)
+
+
+def api_view(view):
+    """GET/HEAD-представление, ошибки которого (неверный курсор, 404 и т. п.) отдаются как в APIView."""
+    @require_safe
+    @functools.wraps(view)
+    async def wrapper(request:HttpRequest, *args, **kwargs) -> HttpResponse:
+        try:
+            return await view(request, *args, **kwargs)
+        except Http404:
+            exc = NotFound()
+            return json_response({"detail": exc.detail}, status = exc.status_code)
+        except APIException as exc:
+            return json_response(exc.detail, status = exc.status_code)
+    return wrapper
+
+
+@api_view
+@alist_condition("banners")
+@acached_response("banners")
+async def banners(request:HttpRequest) -> HttpResponse:
+    product_ids = await run_sync(get_banner_product_ids)
+    return fragment_response(await run_sync(get_fragments, product_ids))
+
+
+@api_view
+@alist_condition("sale")
+@acached_response("sale")
+async def sale(request:HttpRequest) -> HttpResponse:
+    object_list, page_info = await apaginate_queryset(
+        request = request,
+        queryset = product_rows(Product.objects.filter(is_sale = True), SALE_PRODUCT_FIELDS),
+        ordering = "id",
+        page_size = 10,
+    )
+    return json_response({"items": await run_sync(project_sale_products, object_list), **page_info})
+
+
+@api_view
+@alist_condition("catalog")
+async def catalog(request:HttpRequest) -> HttpResponse:
+    timing = ServerTiming()
+    with timing.measure("build"):
+        query = CatalogQuery.from_query_params(request.GET)
+        use_index = is_catalog_index_enabled() and catalog_index.supports(query)
+        if not use_index:
+            queryset = product_rows(
+                query.compile(Product.objects.all()), FRAGMENT_ROW_FIELDS, extra = (query.ordering.lstrip("-"),)
+            )
+
+    with timing.measure("query"):
+        if use_index:
+            product_ids, page_info = await run_sync(catalog_index.paginate, request = request, query = query)
+        else:
+            object_list, page_info = await apaginate_queryset(
+                request = request,
+                queryset = queryset,
+                ordering = query.ordering,
+                page_size = query.limit,
+            )
+            product_ids = [row["id"] for row in object_list]
+    with timing.measure("serialize"):
+        if use_index:
+            fragments = await run_sync(get_fragments, product_ids)
+        else:
+            fragments = await run_sync(get_row_fragments, object_list)
+
+    return fragment_response(fragments, page_info, headers = {"Server-Timing": timing.header()})
+
+
+async def product_fragments_page(request:HttpRequest, queryset, ordering:str) -> HttpResponse:
+    object_list, page_info = await apaginate_queryset(
+        request = request,
+        queryset = queryset,
+        ordering = ordering,
+        page_size = 20,
+    )
+    fragments = await run_sync(get_row_fragments, object_list)
+    if "nextCursor" in page_info:
+        return fragment_response(fragments, page_info)
+    return fragment_response(fragments)
+
+
+@api_view
+@alist_condition("popular")
+@acached_response("popular")
+async def popular(request:HttpRequest) -> HttpResponse:
+    queryset = product_rows(Product.objects.filter(rating__gt = 3), FRAGMENT_ROW_FIELDS, extra = ("rating",))
+    return await product_fragments_page(request, queryset, "-rating")
+
+
+@api_view
+@alist_condition("limited")
+@acached_response("limited")
+async def limited(request:HttpRequest) -> HttpResponse:
+    queryset = product_rows(Product.objects.filter(is_limit = True), FRAGMENT_ROW_FIELDS)
+    return await product_fragments_page(request, queryset, "id")
+
+
+@api_view
+@aproduct_condition
+async def product_detail(request:HttpRequest, pk:int) -> HttpResponse:
+    product = await aget_object_or_404(
+        Product.objects.prefetch_related("images", "tags", "reviews", "specifications"), pk = pk
+    )
+    return json_response(ProductIdSerializer(instance = product, partial = True, many = False).data)
+
+
+@api_view
+@alist_condition("catigories", group = "categories")
+@acached_response("catigories")
+async def categories(request:HttpRequest) -> HttpResponse:
+    items = [
+        item async for item in CatalogItem.objects.select_related("image").prefetch_related("subcategories", "tags")
+    ]
+    return json_response(CatalogItemsSerializer(items, many = True).data)
+
+
+@api_view
+@alist_condition("tags", group = "categories")
+async def tags(request:HttpRequest) -> HttpResponse:
+    instance = await aget_object_or_404(
+        CatalogItem.objects.select_related("image").prefetch_related("subcategories", "tags"),
+        pk = request.GET.get("category"),
+    )
+    return json_response(CatalogItemsSerializer(instance = instance).data)
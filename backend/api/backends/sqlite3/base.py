@@ -0,0 +1,31 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+        SQLite с прагмами и режимом транзакций из OPTIONS:
+
+            "pragmas": {"journal_mode": "WAL", "busy_timeout": 5000, ...} — выполняются на каждом новом соединении;
+            "transaction_mode": "IMMEDIATE" — транзакции atomic() начинаются с BEGIN IMMEDIATE.
+
+        В WAL транзакция, которая сначала читает, а потом пишет, при конкурентной записи получает
+        SQLITE_BUSY сразу, без ожидания busy_timeout. BEGIN IMMEDIATE берёт блокировку на запись
+        в начале транзакции, и тогда busy_timeout работает. В Django 5.1 transaction_mode есть
+        из коробки, этот бэкенд можно будет заменить на django.db.backends.sqlite3 + init_command.
+    """
+    def get_connection_params(self) -> dict:
+        params = super().get_connection_params()
+        self.pragmas = params.pop("pragmas", {})
+        self.transaction_mode = params.pop("transaction_mode", None)
+        return params
+
+    def init_connection_state(self) -> None:
+        super().init_connection_state()
+        for name, value in self.pragmas.items():
+            self.connection.execute(f"PRAGMA {name} = {value}")
+
+    def _start_transaction_under_autocommit(self) -> None:
+        if self.transaction_mode:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
+        else:
+            super()._start_transaction_under_autocommit()
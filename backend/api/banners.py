@@ -0,0 +1,48 @@
+from django.db import transaction
+from django.db.models import QuerySet
+
+from .cache import bump_catalog_version
+from .models import Banner, Product
+
+BANNERS_LIMIT = 3
+
+
+def get_banner_product_ids(limit:int = BANNERS_LIMIT) -> list[int]:
+    """
+        id товаров для баннеров главной страницы: сначала выбранные администратором,
+        затем рассчитанные автоматически. Выполняет не больше двух запросов при любом размере каталога.
+    """
+    banners = Banner.objects.filter(
+        is_active = True, product__available = True
+    ).values_list("product_id", flat = True)[:limit * 2]
+
+    product_ids = []
+    for product_id in banners:
+        if product_id not in product_ids:
+            product_ids.append(product_id)
+    if not product_ids:
+        return list(select_top_products(limit).values_list("pk", flat = True))
+    return product_ids[:limit]
+
+
+def select_top_products(limit:int = BANNERS_LIMIT) -> QuerySet:
+    """Правило по умолчанию: доступные товары с лучшим рейтингом и числом отзывов."""
+    return Product.objects.filter(available = True).order_by(
+        "-rating", "-review_count", "-id"
+    )[:limit]
+
+
+@transaction.atomic
+def rebuild_auto_banners(limit:int = BANNERS_LIMIT) -> int:
+    """
+        Пересчитывает автоматические баннеры и сохраняет их в таблицу Banner.
+        bulk_create не отправляет post_save, поэтому версия каталога сдвигается здесь явно.
+    """
+    Banner.objects.filter(source = Banner.SOURCE_AUTO).delete()
+    product_ids = list(select_top_products(limit).values_list("pk", flat = True))
+    Banner.objects.bulk_create([
+        Banner(product_id = product_id, position = position, source = Banner.SOURCE_AUTO)
+        for position, product_id in enumerate(product_ids)
+    ])
+    bump_catalog_version()
+    return len(product_ids)
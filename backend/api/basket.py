@@ -0,0 +1,229 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.http import HttpRequest, HttpResponse
+from rest_framework.exceptions import ValidationError
+
+from .models import Basket, BasketObject, Product
+from .pricing import annotate_line_prices, basket_total, unit_price
+from .projections import PRODUCT_FIELDS
+
+OPERATIONS = ("add", "set", "remove")
+
+BASKET_COOKIE = "basket"
+BASKET_COOKIE_SALT = "api.basket"
+BASKET_COOKIE_MAX_AGE = 60 * 60 * 24 * 30
+MAX_ANONYMOUS_LINES = 100
+
+
+def get_basket(user:User) -> Basket:
+    basket, basket_is_create = Basket.objects.get_or_create(user = user)
+    return basket
+
+
+def get_basket_lines(basket:Basket):
+    """Строки корзины с ценой со скидкой (unit_price) в порядке добавления."""
+    return annotate_line_prices(BasketObject.objects.filter(basket = basket)).order_by("created_at", "pk")
+
+
+def basket_headers(basket:Basket) -> dict:
+    """Заголовки ответа корзины: сумма с учётом скидок одним агрегатным запросом."""
+    return {"Basket-Total": str(basket_total(basket))}
+
+
+def parse_operations(payload) -> list[tuple[str, int, int | None]]:
+    """
+        Приводит тело запроса к списку операций (op, product_id, count).
+
+        Принимает один объект {"id": 1, "count": 2} или список таких объектов
+        с необязательным полем "op": "add" (по умолчанию), "set" или "remove".
+        Для "remove" без "count" строка удаляется целиком.
+    """
+    items = payload if isinstance(payload, list) else [payload]
+    operations = []
+    for item in items:
+        try:
+            op = item.get("op", "add")
+            product_id = int(item["id"])
+            count = item.get("count")
+            count = int(count) if count is not None else None
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise ValidationError({"detail": "Each item needs an integer 'id' and 'count'."})
+        if op not in OPERATIONS:
+            raise ValidationError({"op": f"Unknown operation {op!r}."})
+        if count is None and op != "remove":
+            raise ValidationError({"count": "This field is required."})
+        if count is not None and (count < 0 or (count == 0 and op == "add")):
+            raise ValidationError({"count": "Must be a positive integer."})
+        operations.append((op, product_id, count))
+    return operations
+
+
+def merge_operations(operations:list) -> tuple[dict, dict, dict]:
+    """Сворачивает операции по товарам: повтор "add" складывается, "set" и "remove" перекрывают."""
+    added, assigned, removed = {}, {}, {}
+    for op, product_id, count in operations:
+        if op == "add":
+            if product_id in assigned:
+                assigned[product_id] += count
+            elif product_id in removed and removed[product_id] is None:
+                del removed[product_id]
+                assigned[product_id] = count
+            elif product_id in removed:
+                balance = count - removed.pop(product_id)
+                if balance > 0:
+                    added[product_id] = balance
+                elif balance < 0:
+                    removed[product_id] = -balance
+            else:
+                added[product_id] = added.get(product_id, 0) + count
+        elif op == "set":
+            added.pop(product_id, None)
+            removed.pop(product_id, None)
+            assigned[product_id] = count
+        else:
+            added.pop(product_id, None)
+            assigned.pop(product_id, None)
+            removed[product_id] = count
+    for product_id, count in list(assigned.items()):
+        if count == 0:
+            del assigned[product_id]
+            removed[product_id] = None
+    return added, assigned, removed
+
+
+def check_products(product_ids:set, ignore_missing:bool = False) -> set:
+    """Проверяет товары одним запросом; возвращает существующие id."""
+    if not product_ids:
+        return set()
+    existing = set(Product.objects.filter(pk__in = product_ids).values_list("pk", flat = True))
+    missing = product_ids - existing
+    if missing and not ignore_missing:
+        raise ValidationError({"id": f"Unknown products: {sorted(missing)}."})
+    return existing
+
+
+@transaction.atomic
+def apply_operations(basket:Basket, operations:list, ignore_missing:bool = False) -> None:
+    """
+        Применяет операции к корзине в одной транзакции.
+
+        Число запросов не зависит ни от размера корзины, ни от числа строк в запросе:
+        проверка товаров, upsert для "set", INSERT OR IGNORE + UPDATE с F() для "add"
+        и DELETE + UPDATE с F() для "remove" — каждый тип одним запросом.
+    """
+    added, assigned, removed = merge_operations(operations)
+    existing = check_products(set(added) | set(assigned), ignore_missing = ignore_missing)
+    added = {pk: count for pk, count in added.items() if pk in existing}
+    assigned = {pk: count for pk, count in assigned.items() if pk in existing}
+
+    lines = BasketObject.objects.filter(basket = basket)
+    if assigned:
+        BasketObject.objects.bulk_create(
+            [BasketObject(basket = basket, product_id = pk, count = count) for pk, count in assigned.items()],
+            update_conflicts = True,
+            unique_fields = ["basket", "product"],
+            update_fields = ["count"],
+        )
+    if added:
+        BasketObject.objects.bulk_create(
+            [BasketObject(basket = basket, product_id = pk, count = 0) for pk in added],
+            ignore_conflicts = True,
+        )
+        lines.filter(product_id__in = added).update(count = Case(
+            *[When(product_id = pk, then = F("count") + count) for pk, count in added.items()]
+        ))
+    if removed:
+        whole = [pk for pk, count in removed.items() if count is None]
+        condition = Q(product_id__in = whole)
+        for pk, count in removed.items():
+            if count is not None:
+                condition |= Q(product_id = pk, count__lte = count)
+        lines.filter(condition).delete()
+        partial = {pk: count for pk, count in removed.items() if count is not None}
+        if partial:
+            lines.filter(product_id__in = partial).update(count = Case(
+                *[When(product_id = pk, then = F("count") - count) for pk, count in partial.items()]
+            ))
+
+
+
+def read_anonymous_basket(request:HttpRequest) -> dict[int, int]:
+    """
+        Корзина гостя из подписанной cookie в виде {id товара: количество}.
+        Хранится у клиента, поэтому просмотр и изменение корзины не пишут в базу.
+    """
+    raw = request.get_signed_cookie(
+        BASKET_COOKIE, default = "", salt = BASKET_COOKIE_SALT, max_age = BASKET_COOKIE_MAX_AGE
+    )
+    lines = {}
+    for item in raw.split(","):
+        product_id, _, count = item.partition(":")
+        if product_id.isdigit() and count.isdigit() and int(count) > 0:
+            lines[int(product_id)] = int(count)
+    return lines
+
+
+def write_anonymous_basket(response:HttpResponse, lines:dict) -> None:
+    if not lines:
+        response.delete_cookie(BASKET_COOKIE)
+        return
+    response.set_signed_cookie(
+        BASKET_COOKIE,
+        ",".join(f"{product_id}:{count}" for product_id, count in lines.items()),
+        salt = BASKET_COOKIE_SALT,
+        max_age = BASKET_COOKIE_MAX_AGE,
+        httponly = True,
+        samesite = "Lax",
+    )
+
+
+def apply_anonymous_operations(lines:dict, operations:list) -> dict:
+    """Те же операции, что apply_operations, но над корзиной гостя в памяти."""
+    added, assigned, removed = merge_operations(operations)
+    existing = check_products(set(added) | set(assigned))
+    lines = dict(lines)
+    for product_id, count in assigned.items():
+        if product_id in existing:
+            lines[product_id] = count
+    for product_id, count in added.items():
+        if product_id in existing:
+            lines[product_id] = lines.get(product_id, 0) + count
+    for product_id, count in removed.items():
+        if product_id in lines and (count is None or lines[product_id] <= count):
+            del lines[product_id]
+        elif product_id in lines:
+            lines[product_id] -= count
+    if len(lines) > MAX_ANONYMOUS_LINES:
+        raise ValidationError({"detail": f"Basket can hold at most {MAX_ANONYMOUS_LINES} products."})
+    return lines
+
+
+def get_anonymous_rows(lines:dict) -> list[dict]:
+    """Строки корзины гостя в формате projections.basket_rows одним запросом."""
+    products = {
+        row["id"]: row for row in Product.objects.filter(pk__in = list(lines)).annotate(
+            unit_price = unit_price()
+        ).values(*PRODUCT_FIELDS, "unit_price")
+    }
+    rows = []
+    for product_id, count in lines.items():
+        if product_id in products:
+            rows.append({**products[product_id], "line_count": count})
+    return rows
+
+
+def merge_anonymous_basket(request:HttpRequest, user:User) -> bool:
+    """
+        Переносит корзину гостя в корзину пользователя при входе одной пакетной операцией.
+        Возвращает True, если cookie с корзиной нужно удалить.
+    """
+    lines = read_anonymous_basket(request)
+    if not lines:
+        return False
+    apply_operations(
+        basket = get_basket(user),
+        operations = [("add", product_id, count) for product_id, count in lines.items()],
+        ignore_missing = True,
+    )
+    return True
@@ -0,0 +1,10 @@
+"""
+    Нагрузочный стенд на синтетическом каталоге.
+
+    data.py — детерминированный генератор данных (товары, картинки, теги, характеристики,
+    отзывы, пользователи, корзины и заказы) в заданном масштабе;
+    load.py — нагрузка на настоящие URL API с отчётом p50/p95/p99 и пропускной способности
+    по эндпоинтам в JSON, чтобы сравнивать коммиты между собой.
+
+    Запуск — команды bench_generate и bench_load.
+"""
@@ -0,0 +1,399 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from ..banners import rebuild_auto_banners
+from ..cache import bump_catalog_version
+from ..models import (
+    Banner, Basket, BasketObject, CatalogItem, Order, OrderLine, Product, ProductImage, Profile, Review,
+    SpecificationsProduct, SubCatigory, Tag,
+)
+from ..pricing import CENTS
+from ..ratings import DEFAULT_RATING, round_rating
+from ..search import rebuild_index
+
+# Метки сгенерированных строк: по ним clear() находит и удаляет только синтетические данные
+USER_PREFIX = "bench-user-"
+USER_PASSWORD = "bench-password"
+TITLE_PREFIX = "Bench "
+PRODUCT_DESCRIPTION = "Synthetic benchmark product"
+
+BATCH_SIZE = 5000
+# Сколько товаров держать в памяти для корзин и строк заказов при любом размере каталога
+SAMPLE_SIZE = 10000
+FALLBACK_IMAGE = "images/product/bench.jpg"
+
+ADJECTIVES = (
+    "compact", "wireless", "smart", "portable", "classic", "digital", "premium", "ultra", "silent", "rugged",
+    "modern", "vintage", "ergonomic", "foldable", "waterproof", "solar", "magnetic", "thermal", "mini", "pro",
+)
+NOUNS = (
+    "phone", "laptop", "camera", "speaker", "headphones", "watch", "tablet", "monitor", "keyboard", "mouse",
+    "router", "printer", "lamp", "kettle", "blender", "drone", "charger", "backpack", "projector", "microphone",
+)
+WORDS = ADJECTIVES + NOUNS + (
+    "battery", "display", "warranty", "steel", "aluminium", "cable", "storage", "memory", "screen", "sound",
+    "design", "fast", "light", "durable", "everyday", "travel", "office", "gaming", "home", "outdoor",
+)
+SPECIFICATIONS = {
+    "Color": ("black", "white", "silver", "red", "blue", "green"),
+    "Material": ("plastic", "steel", "aluminium", "glass", "leather"),
+    "Warranty": ("6 months", "1 year", "2 years", "3 years"),
+    "Weight": ("100 g", "250 g", "500 g", "1 kg", "2 kg", "5 kg"),
+    "Power": ("5 W", "10 W", "25 W", "65 W", "100 W"),
+    "Country": ("China", "Japan", "Korea", "Germany", "Russia"),
+}
+VALUATIONS = (1, 2, 3, 4, 5, None)
+VALUATION_WEIGHTS = (5, 5, 10, 30, 45, 5)
+CITIES = ("Moscow", "Kazan", "Novosibirsk", "Yekaterinburg", "Samara", "Omsk")
+
+
+class Scale:
+    """
+        Размер синтетического каталога. products, users, categories и tags — точные количества,
+        остальное — среднее число связанных объектов на товар, категорию или пользователя.
+    """
+    def __init__(
+        self,
+        products:int = 100_000,
+        users:int = 1000,
+        categories:int = 20,
+        subcategories:int = 4,
+        tags:int = 500,
+        images:int = 2,
+        product_tags:int = 2,
+        specifications:int = 4,
+        reviews:int = 5,
+        basket_lines:int = 3,
+        orders:int = 3,
+        order_lines:int = 3,
+    ):
+        self.products = products
+        self.users = users
+        self.categories = max(categories, 1)
+        self.subcategories = subcategories
+        self.tags = tags
+        self.images = images
+        self.product_tags = product_tags
+        self.specifications = specifications
+        self.reviews = reviews
+        self.basket_lines = basket_lines
+        self.orders = orders
+        self.order_lines = order_lines
+
+
+class CatalogGenerator:
+    """
+        Детерминированно наполняет базу синтетическим каталогом: при одинаковых seed и Scale
+        на пустой базе получаются одни и те же данные.
+
+        Строки вставляются через bulk_create пакетами по batch_size товаров, каждый пакет —
+        в своей транзакции. bulk_create не вызывает сигналы, поэтому агрегаты отзывов
+        считаются при генерации, а полнотекстовый индекс, автоматические баннеры
+        и версия кэша каталога обновляются один раз в конце.
+    """
+    def __init__(self, scale:Scale, seed:int = 0, batch_size:int = BATCH_SIZE, log = None):
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.batch_size = max(batch_size, 1)
+        self.log = log or (lambda message: None)
+        self.today = timezone.localdate()
+        # Равномерная выборка товаров (reservoir sampling): (id, название, описание, цена, картинка)
+        self.sample = []
+        self.seen = 0
+
+    def spread(self, mean:int) -> int:
+        """Случайное количество со средним mean."""
+        return self.rng.randint(0, 2 * mean) if mean > 0 else 0
+
+    def sentence(self, words:int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def generate(self) -> dict:
+        self.image_sources = list(ProductImage.objects.order_by("pk").values_list("src", flat = True)[:100])
+        self.image_sources = self.image_sources or [FALLBACK_IMAGE]
+
+        with transaction.atomic():
+            self.create_users()
+            self.create_categories()
+            self.create_tags()
+            self.create_specifications()
+        self.log(f"Пользователей: {len(self.users)}, категорий: {len(self.categories)}, тегов: {len(self.tags)}")
+
+        created = 0
+        while created < self.scale.products:
+            size = min(self.batch_size, self.scale.products - created)
+            with transaction.atomic():
+                self.create_products(created, size)
+            created += size
+            self.log(f"Товаров: {created}/{self.scale.products}")
+
+        with transaction.atomic():
+            self.create_baskets()
+            self.create_orders()
+        self.log("Корзины и заказы созданы, перестраиваю поисковый индекс и баннеры")
+        finalize()
+        return describe_dataset()
+
+    def create_users(self) -> None:
+        password = make_password(USER_PASSWORD)
+        users = User.objects.bulk_create([
+            User(username = f"{USER_PREFIX}{index}", email = f"{USER_PREFIX}{index}@example.com", password = password)
+            for index in range(self.scale.users)
+        ])
+        profiles = Profile.objects.bulk_create([
+            Profile(
+                user = user,
+                fullName = f"{self.rng.choice(ADJECTIVES).capitalize()} {self.rng.choice(NOUNS).capitalize()}",
+                phone = self.rng.randint(10 ** 9, 2 * 10 ** 9),
+                email = user.email,
+            )
+            for user in users
+        ])
+        baskets = Basket.objects.bulk_create([Basket(user = user, profile = profile) for user, profile in zip(users, profiles)])
+        self.users = list(zip(users, profiles, baskets))
+        self.profile_ids = [profile.pk for profile in profiles]
+
+    def create_categories(self) -> None:
+        items = CatalogItem.objects.bulk_create([
+            CatalogItem(title = f"{TITLE_PREFIX}{self.rng.choice(NOUNS)} {index + 1}")
+            for index in range(self.scale.categories)
+        ])
+        SubCatigory.objects.bulk_create([
+            SubCatigory(title = f"{TITLE_PREFIX}{self.rng.choice(ADJECTIVES)} {item.title[len(TITLE_PREFIX):]}", category = item)
+            for item in items
+            for _ in range(self.spread(self.scale.subcategories))
+        ])
+        self.categories = [item.pk for item in items]
+
+    def create_tags(self) -> None:
+        tags = Tag.objects.bulk_create([
+            Tag(name = f"{self.rng.choice(ADJECTIVES)} {self.rng.choice(WORDS)}", category_id = self.rng.choice(self.categories))
+            for _ in range(self.scale.tags)
+        ])
+        self.tags = [tag.pk for tag in tags]
+
+    def create_specifications(self) -> None:
+        specifications = SpecificationsProduct.objects.bulk_create([
+            SpecificationsProduct(name = f"{TITLE_PREFIX}{name}", value = value)
+            for name, values in SPECIFICATIONS.items()
+            for value in values
+        ])
+        self.specifications = [specification.pk for specification in specifications]
+
+    def plan_reviews(self) -> list:
+        """Оценки отзывов товара; число отзывов с длинным хвостом, как у популярных товаров."""
+        if not self.profile_ids or self.scale.reviews <= 0:
+            return []
+        count = min(int(self.rng.expovariate(1 / self.scale.reviews)), self.scale.reviews * 10)
+        return self.rng.choices(VALUATIONS, weights = VALUATION_WEIGHTS, k = count)
+
+    def build_product(self, number:int, valuations:list) -> Product:
+        rated = [valuation for valuation in valuations if valuation is not None]
+        price = Decimal(self.rng.randrange(100, 10_000_000)).scaleb(-2)
+        is_sale = self.rng.random() < 0.05
+        product = Product(
+            category = self.rng.choice(self.categories),
+            price = price,
+            available = self.rng.random() < 0.9,
+            count = self.rng.randint(0, 500),
+            title = f"{self.rng.choice(ADJECTIVES).capitalize()} {self.rng.choice(NOUNS)} {number + 1}",
+            description = PRODUCT_DESCRIPTION,
+            fullDescription = self.sentence(30),
+            freeDelivery = self.rng.random() < 0.3,
+            review_count = len(valuations),
+            rating_count = len(rated),
+            rating_sum = sum(rated),
+            rating = round_rating(sum(rated), len(rated)) if rated else DEFAULT_RATING,
+            is_limit = self.rng.random() < 0.03,
+        )
+        if is_sale:
+            product.is_sale = True
+            product.salePrice = (price * Decimal("0.8")).quantize(CENTS)
+            product.dateForm = self.today - datetime.timedelta(days = self.rng.randint(0, 10))
+            product.dateTo = self.today + datetime.timedelta(days = self.rng.randint(1, 30))
+        return product
+
+    def create_products(self, start:int, size:int) -> None:
+        plans = [self.plan_reviews() for _ in range(size)]
+        products = Product.objects.bulk_create([
+            self.build_product(number, valuations) for number, valuations in zip(range(start, start + size), plans)
+        ])
+        # date — auto_now, bulk_create ставит всем сегодняшний день; разносим даты по двум годам
+        # по порядковому номеру товара, а не по id: id после clear() не переиспользуются
+        Product.objects.filter(pk__range = (products[0].pk, products[-1].pk)).update(
+            date = RawSQL("date('now', '-' || (((id - %s) * 7919) %% 730) || ' days')", [products[0].pk - start])
+        )
+
+        images, tag_links, specification_links, reviews = [], [], [], []
+        for product, valuations in zip(products, plans):
+            product_images = [
+                ProductImage(src = self.rng.choice(self.image_sources), alt = product.title, product = product)
+                for _ in range(self.spread(self.scale.images))
+            ]
+            images += product_images
+            for tag_id in self.rng.sample(self.tags, min(self.spread(self.scale.product_tags), len(self.tags))):
+                tag_links.append(Tag.product.through(tag_id = tag_id, product_id = product.pk))
+            for specification_id in self.rng.sample(
+                self.specifications, min(self.spread(self.scale.specifications), len(self.specifications))
+            ):
+                specification_links.append(SpecificationsProduct.products.through(
+                    specificationsproduct_id = specification_id, product_id = product.pk
+                ))
+            for valuation in valuations:
+                reviews.append(Review(
+                    autor_id = self.rng.choice(self.profile_ids),
+                    email = "reviewer@example.com",
+                    text = self.sentence(12),
+                    valuation = valuation,
+                    product = product,
+                ))
+            self.keep_sample(product, product_images[0].src if product_images else "")
+
+        ProductImage.objects.bulk_create(images)
+        Tag.product.through.objects.bulk_create(tag_links)
+        SpecificationsProduct.products.through.objects.bulk_create(specification_links)
+        Review.objects.bulk_create(reviews)
+
+    def keep_sample(self, product:Product, image:str) -> None:
+        price = product.salePrice if product.is_sale else product.price
+        item = (product.pk, product.title, product.description, price, str(image))
+        self.seen += 1
+        if len(self.sample) < SAMPLE_SIZE:
+            self.sample.append(item)
+            return
+        index = self.rng.randrange(self.seen)
+        if index < SAMPLE_SIZE:
+            self.sample[index] = item
+
+    def create_baskets(self) -> None:
+        lines = []
+        for user, profile, basket in self.users:
+            for item in self.rng.sample(self.sample, min(self.spread(self.scale.basket_lines), len(self.sample))):
+                lines.append(BasketObject(basket = basket, product_id = item[0], count = self.rng.randint(1, 3)))
+        BasketObject.objects.bulk_create(lines, batch_size = self.batch_size)
+
+    def create_orders(self) -> None:
+        """Оплаченные заказы привязаны к user без профиля, как после оплаты (см. orders.get_user_orders)."""
+        orders, order_items = [], []
+        for user, profile, basket in self.users:
+            for _ in range(self.spread(self.scale.orders) if self.sample else 0):
+                items = self.rng.sample(self.sample, min(max(self.spread(self.scale.order_lines), 1), len(self.sample)))
+                counts = [self.rng.randint(1, 3) for _ in items]
+                orders.append(Order(
+                    user = user,
+                    fullName = profile.fullName,
+                    phone = profile.phone,
+                    email = profile.email,
+                    deliveryType = self.rng.choice(("free", "express")),
+                    paymentType = self.rng.choice(("online", "someone")),
+                    totalCost = sum(item[3] * count for item, count in zip(items, counts)),
+                    status = "accepted",
+                    city = self.rng.choice(CITIES),
+                    address = f"{self.rng.choice(NOUNS).capitalize()} street {self.rng.randint(1, 200)}",
+                ))
+                order_items.append(list(zip(items, counts)))
+        Order.objects.bulk_create(orders, batch_size = self.batch_size)
+        OrderLine.objects.bulk_create([
+            OrderLine(
+                order = order,
+                product_id = product_id,
+                title = title,
+                description = description,
+                price = price,
+                count = count,
+                image_src = image,
+                image_alt = title,
+            )
+            for order, items in zip(orders, order_items)
+            for (product_id, title, description, price, image), count in items
+        ], batch_size = self.batch_size)
+
+
+def finalize() -> None:
+    """Обновляет то, что при обычном сохранении поддерживают сигналы."""
+    rebuild_index()
+    rebuild_auto_banners()
+    bump_catalog_version()
+
+
+def generated_products() -> QuerySet:
+    return Product.objects.filter(description = PRODUCT_DESCRIPTION)
+
+
+def generated_users() -> QuerySet:
+    return User.objects.filter(username__startswith = USER_PREFIX)
+
+
+def has_generated_data() -> bool:
+    return generated_users().exists() or generated_products().exists()
+
+
+def delete_rows(queryset:QuerySet) -> int:
+    """
+        Удаляет строки queryset одним DELETE с подзапросом, без Collector и сигналов:
+        QuerySet.delete() загрузил бы в память сотни тысяч отзывов и пересчитал рейтинг по каждому.
+    """
+    meta = queryset.model._meta
+    sql, params = queryset.values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {meta.db_table} WHERE {meta.pk.column} IN ({sql})", params)
+        return cursor.rowcount
+
+
+@transaction.atomic
+def clear() -> int:
+    """Удаляет данные, созданные CatalogGenerator, и всё, что на них ссылается. Возвращает число товаров."""
+    products = generated_products().values("pk")
+    users = generated_users().values("pk")
+    profiles = Profile.objects.filter(user__in = users).values("pk")
+    orders = Order.objects.filter(Q(user__in = users) | Q(profile__in = profiles)).values("pk")
+    baskets = Basket.objects.filter(Q(user__in = users) | Q(profile__in = profiles)).values("pk")
+    categories = CatalogItem.objects.filter(title__startswith = TITLE_PREFIX).values("pk")
+
+    delete_rows(OrderLine.objects.filter(order__in = orders))
+    delete_rows(Order.products.through.objects.filter(order__in = orders))
+    delete_rows(Order.objects.filter(pk__in = orders))
+    delete_rows(Order.products.through.objects.filter(basketobject__product__in = products))
+    delete_rows(BasketObject.objects.filter(Q(basket__in = baskets) | Q(product__in = products)))
+    delete_rows(Basket.objects.filter(pk__in = baskets))
+    delete_rows(Banner.objects.filter(product__in = products))
+    delete_rows(Review.objects.filter(Q(product__in = products) | Q(autor__in = profiles)))
+    delete_rows(Tag.product.through.objects.filter(product__in = products))
+    delete_rows(SpecificationsProduct.products.through.objects.filter(product__in = products))
+    delete_rows(ProductImage.objects.filter(product__in = products))
+    deleted = delete_rows(Product.objects.filter(pk__in = products))
+    delete_rows(Tag.product.through.objects.filter(tag__category__in = categories))
+    delete_rows(Tag.objects.filter(category__in = categories))
+    specifications = SpecificationsProduct.objects.filter(name__startswith = TITLE_PREFIX)
+    delete_rows(SpecificationsProduct.products.through.objects.filter(specificationsproduct__in = specifications.values("pk")))
+    delete_rows(specifications)
+    delete_rows(SubCatigory.objects.filter(category__in = categories))
+    delete_rows(CatalogItem.objects.filter(pk__in = categories))
+    delete_rows(Profile.objects.filter(pk__in = profiles))
+    delete_rows(User.groups.through.objects.filter(user__in = users))
+    delete_rows(User.user_permissions.through.objects.filter(user__in = users))
+    delete_rows(User.objects.filter(pk__in = users))
+    transaction.on_commit(finalize)
+    return deleted
+
+
+def describe_dataset() -> dict:
+    """Размер данных, на которых идёт нагрузка, — часть отчёта bench_load."""
+    return {
+        "products": Product.objects.count(),
+        "images": ProductImage.objects.count(),
+        "tags": Tag.objects.count(),
+        "reviews": Review.objects.count(),
+        "users": User.objects.count(),
+        "basket_lines": BasketObject.objects.count(),
+        "orders": Order.objects.count(),
+        "order_lines": OrderLine.objects.count(),
+    }
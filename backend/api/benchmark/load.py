@@ -0,0 +1,364 @@
+import datetime
+import http.cookiejar
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from ..models import CatalogItem, Order, Product, Tag
+from .data import USER_PASSWORD, WORDS, describe_dataset, generated_users
+
+PERCENTILES = (50, 95, 99)
+# Сколько id товаров и тегов держать для построения запросов
+POOL_SIZE = 10000
+
+
+def url(name:str, **kwargs) -> str:
+    return reverse(f"api:{name}", kwargs = kwargs or None)
+
+
+def catalog_params(rng:random.Random, pool:"Pool") -> dict:
+    """Параметры каталога в том же распределении, что bench_catalog."""
+    params = {
+        "sort": rng.choice(["price", "rating", "reviews", "date"]),
+        "sortType": rng.choice(["inc", "dec"]),
+        "limit": 20,
+        "currentPage": rng.choice([1, 1, 1, 2, 5, 50]),
+    }
+    if rng.random() < 0.4:
+        params["filter[minPrice]"] = rng.randint(0, 5000)
+        params["filter[maxPrice]"] = rng.randint(5000, 100000)
+    if rng.random() < 0.3:
+        params["filter[freeDelivery]"] = "true"
+    if rng.random() < 0.3:
+        params["filter[available]"] = "true"
+    if pool.tags and rng.random() < 0.3:
+        params["tags[]"] = rng.sample(pool.tags, min(2, len(pool.tags)))
+    if pool.categories and rng.random() < 0.3:
+        params["category"] = rng.choice(pool.categories)
+    return params
+
+
+def with_query(path:str, params:dict) -> str:
+    return f"{path}?{urllib.parse.urlencode(params, doseq = True)}"
+
+
+def catalog(rng, pool, username):
+    return "GET", with_query(url("catalog"), catalog_params(rng, pool)), None
+
+
+def search(rng, pool, username):
+    params = {"filter[name]": " ".join(rng.sample(WORDS, rng.randint(1, 2))), "limit": 20}
+    if rng.random() < 0.5:
+        params["sort"] = "relevance"
+    return "GET", with_query(url("catalog"), params), None
+
+
+def facets(rng, pool, username):
+    return "GET", with_query(url("catalog_facets"), catalog_params(rng, pool)), None
+
+
+def product(rng, pool, username):
+    return "GET", url("product_id", pk = rng.choice(pool.products)), None
+
+
+def basket_add(rng, pool, username):
+    return "POST", url("basket"), {"id": rng.choice(pool.products), "count": rng.randint(1, 2)}
+
+
+def basket_remove(rng, pool, username):
+    return "DELETE", url("basket"), {"id": rng.choice(pool.products), "count": 1}
+
+
+def category_tags(rng, pool, username):
+    return "GET", with_query(url("tags"), {"category": rng.choice(pool.categories)}), None
+
+
+def user_order(rng, pool, username):
+    return "GET", url("orderid", pk = rng.choice(pool.orders[username])), None
+
+
+def static(name:str, query:dict | None = None):
+    def build(rng, pool, username):
+        return "GET", with_query(url(name), query) if query else url(name), None
+    return build
+
+
+# (эндпоинт, вес, нужен ли вошедший пользователь, построитель запроса);
+# эндпоинт — имя URL api, для вариантов одного URL добавлен суффикс после ":"
+SCENARIO = (
+    ("catalog", 30, False, catalog),
+    ("catalog:search", 10, False, search),
+    ("catalog_facets", 5, False, facets),
+    ("product_id", 25, False, product),
+    ("popular", 5, False, static("popular")),
+    ("limited", 3, False, static("limited")),
+    ("sale", 3, False, static("sale")),
+    ("banners", 5, False, static("banners")),
+    ("catigories", 3, False, static("catigories")),
+    ("tags", 2, False, category_tags),
+    ("basket", 5, False, static("basket")),
+    ("basket:add", 3, False, basket_add),
+    ("basket:remove", 2, False, basket_remove),
+    ("orders", 4, True, static("orders")),
+    ("orders:summary", 2, True, static("orders", {"summary": 1})),
+    ("orderid", 2, True, user_order),
+)
+
+
+class Pool:
+    """Детерминированная выборка id, из которых строятся запросы: товары, теги, категории, заказы пользователей."""
+    def __init__(self, seed:int, users:int):
+        rng = random.Random(seed)
+        products = list(Product.objects.order_by("pk").values_list("pk", flat = True))
+        self.products = rng.sample(products, min(POOL_SIZE, len(products)))
+        self.tags = list(Tag.objects.order_by("pk").values_list("pk", flat = True)[:POOL_SIZE])
+        self.categories = list(CatalogItem.objects.order_by("pk").values_list("pk", flat = True)[:100])
+        self.users = list(
+            generated_users().filter(orders__isnull = False).distinct().order_by("pk").values_list("username", flat = True)[:users]
+        )
+        self.orders = {}
+        for username, order_id in Order.objects.filter(user__username__in = self.users).values_list("user__username", "pk"):
+            self.orders.setdefault(username, []).append(order_id)
+
+
+class ClientTransport:
+    """Запросы в процессе через тестовый клиент Django: весь стек middleware и URL, без сети."""
+    name = "in-process"
+
+    def __init__(self):
+        # Исключения тестовый клиент ловит глобальным сигналом из всех потоков сразу,
+        # поэтому ошибки считаются по коду ответа
+        self.client = Client(HTTP_HOST = "localhost", raise_request_exception = False)
+
+    def request(self, method:str, path:str, payload = None, form:bool = False) -> tuple[int, int]:
+        if payload is None:
+            response = self.client.generic(method, path)
+        elif form:
+            response = self.client.generic(method, path, payload, content_type = "application/x-www-form-urlencoded")
+        else:
+            response = self.client.generic(method, path, json.dumps(payload), content_type = "application/json")
+        return response.status_code, len(response.content)
+
+    def close(self) -> None:
+        connections.close_all()
+
+
+class HttpTransport:
+    """HTTP к запущенному серверу (runserver, gunicorn, uvicorn) с cookie и CSRF, как у браузера."""
+    def __init__(self, base_url:str, timeout:float = 30):
+        self.name = base_url
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def request(self, method:str, path:str, payload = None, form:bool = False) -> tuple[int, int]:
+        headers, body = {}, None
+        if payload is not None:
+            body = payload.encode() if form else json.dumps(payload).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded" if form else "application/json"
+        if method not in ("GET", "HEAD"):
+            token = next((cookie.value for cookie in self.cookies if cookie.name == settings.CSRF_COOKIE_NAME), None)
+            if token:
+                headers["X-CSRFToken"] = token
+        request = urllib.request.Request(self.base_url + path, data = body, headers = headers, method = method)
+        try:
+            with self.opener.open(request, timeout = self.timeout) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as error:
+            return error.code, len(error.read())
+        except (urllib.error.URLError, OSError):
+            return 0, 0
+
+    def close(self) -> None:
+        pass
+
+
+class Worker:
+    """
+        Один виртуальный клиент: свой транспорт (cookie, сессия), свой генератор случайных чисел
+        и, если досталось, свой пользователь. Анонимные воркеры не выбирают эндпоинты с need_user.
+    """
+    def __init__(self, index:int, seed:int, transport, pool:Pool, username:str | None):
+        self.rng = random.Random(seed * 1000 + index)
+        self.transport = transport
+        self.pool = pool
+        self.username = username
+        self.scenario = [entry for entry in SCENARIO if self.allows(*entry)]
+        self.weights = [entry[1] for entry in self.scenario]
+        self.latencies = {}
+        self.statuses = {}
+        self.response_bytes = 0
+
+    def allows(self, name:str, weight:int, need_user:bool, build) -> bool:
+        if need_user and not self.username:
+            return False
+        if build is user_order:
+            return bool(self.pool.orders.get(self.username))
+        if build is category_tags:
+            return bool(self.pool.categories)
+        return bool(self.pool.products) or build not in (product, basket_add, basket_remove)
+
+    def sign_in(self) -> bool:
+        """Вход через настоящий sign-in: тело — JSON в имени поля формы, как шлёт фронтенд."""
+        body = json.dumps({"username": self.username, "password": USER_PASSWORD})
+        status, size = self.transport.request("POST", url("login"), body, form = True)
+        return status == 200
+
+    def step(self, record:bool = True) -> None:
+        name, weight, need_user, build = self.rng.choices(self.scenario, weights = self.weights)[0]
+        method, path, payload = build(self.rng, self.pool, self.username)
+        started = time.perf_counter()
+        status, size = self.transport.request(method, path, payload)
+        duration = time.perf_counter() - started
+        if not record:
+            return
+        key = (name, method)
+        self.latencies.setdefault(key, []).append(duration)
+        statuses = self.statuses.setdefault(key, {})
+        statuses[status] = statuses.get(status, 0) + 1
+        self.response_bytes += size
+
+
+def percentile(values:list, rank:float) -> float:
+    """Перцентиль по ближайшему рангу; values отсортирован."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(math.ceil(rank / 100 * len(values)) - 1, 0))]
+
+
+def summarize(latencies:list, statuses:dict, elapsed:float) -> dict:
+    latencies = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 400)
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+    }
+    for rank in PERCENTILES:
+        summary[f"p{rank}_ms"] = round(percentile(latencies, rank) * 1000, 3)
+    summary["max_ms"] = round(latencies[-1] * 1000, 3) if latencies else 0.0
+    return summary
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd = settings.BASE_DIR, capture_output = True, text = True, timeout = 5, check = True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_load(
+    concurrency:int = 8,
+    requests:int = 2000,
+    duration:float | None = None,
+    warmup:int = 10,
+    seed:int = 0,
+    users:int | None = None,
+    base_url:str | None = None,
+) -> dict:
+    """
+        Гоняет смесь запросов SCENARIO в concurrency потоках и возвращает отчёт:
+        p50/p95/p99, среднее, максимум и пропускная способность по каждому эндпоинту и в целом.
+
+        Без duration каждый воркер делает requests / concurrency запросов, и набор запросов
+        при одинаковом seed и данных один и тот же. users — сколько воркеров входят как
+        сгенерированные пользователи (по умолчанию половина); остальные работают анонимно.
+        Без base_url запросы идут через тестовый клиент в этом процессе.
+    """
+    concurrency = max(concurrency, 1)
+    users = concurrency // 2 if users is None else min(users, concurrency)
+    pool = Pool(seed, users)
+    workers = []
+    for index in range(concurrency):
+        username = pool.users[index % len(pool.users)] if index < users and pool.users else None
+        transport = HttpTransport(base_url) if base_url else ClientTransport()
+        worker = Worker(index, seed, transport, pool, username)
+        if username and not worker.sign_in():
+            raise RuntimeError(f"Не удалось войти как {username}.")
+        workers.append(worker)
+
+    for worker in workers:
+        for _ in range(warmup):
+            worker.step(record = False)
+
+    per_worker = math.ceil(requests / concurrency)
+    deadline = time.perf_counter() + duration if duration else None
+
+    def drive(worker:Worker) -> None:
+        try:
+            if deadline is None:
+                for _ in range(per_worker):
+                    worker.step()
+            else:
+                while time.perf_counter() < deadline:
+                    worker.step()
+        finally:
+            worker.transport.close()
+
+    threads = [threading.Thread(target = drive, args = (worker,)) for worker in workers]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies, statuses = {}, {}
+    for worker in workers:
+        for key, values in worker.latencies.items():
+            latencies.setdefault(key, []).extend(values)
+            merged = statuses.setdefault(key, {})
+            for status, count in worker.statuses[key].items():
+                merged[status] = merged.get(status, 0) + count
+
+    total_statuses = {}
+    for counts in statuses.values():
+        for status, count in counts.items():
+            total_statuses[status] = total_statuses.get(status, 0) + count
+    return {
+        "commit": get_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec = "seconds"),
+        "target": workers[0].transport.name,
+        "config": {
+            "concurrency": concurrency,
+            "requests": None if duration else per_worker * concurrency,
+            "duration": duration,
+            "warmup": warmup,
+            "seed": seed,
+            "signed_in_workers": sum(1 for worker in workers if worker.username),
+        },
+        "dataset": describe_dataset(),
+        "elapsed_s": round(elapsed, 3),
+        "response_bytes": sum(worker.response_bytes for worker in workers),
+        "total": summarize([value for values in latencies.values() for value in values], total_statuses, elapsed),
+        "endpoints": {
+            f"{method} {name}": summarize(latencies[(name, method)], statuses[(name, method)], elapsed)
+            for name, method in sorted(latencies)
+        },
+    }
+
+
+def compare(baseline:dict, report:dict) -> list[tuple]:
+    """Строки (эндпоинт, p95 было, p95 стало, rps было, rps стало) для эндпоинтов из обоих отчётов."""
+    rows = []
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous:
+            rows.append((name, previous["p95_ms"], current["p95_ms"], previous["throughput_rps"], current["throughput_rps"]))
+    return rows
@@ -0,0 +1,159 @@
+import functools
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.http import HttpRequest, HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import CatalogVersion
+
+CATALOG_VERSION_ID = 1
+STATS_KEY = "response-cache:stats:{endpoint}:{result}"
+RESPONSE_CACHE_TIMEOUT = getattr(settings, "RESPONSE_CACHE_TIMEOUT", 60 * 5)
+
+cached_endpoints: set[str] = set()
+
+
+def get_catalog_version() -> int:
+    """
+        Текущая версия каталога. Хранится в базе (CatalogVersion), а не в кэше процесса:
+        ответы лежат в локальном кэше каждого воркера, но их ключи включают общую версию,
+        поэтому изменение в любом процессе делает старые записи недоступными везде.
+    """
+    version = CatalogVersion.objects.filter(pk = CATALOG_VERSION_ID).values_list("value", flat = True).first()
+    if version is None:
+        version = CatalogVersion.objects.get_or_create(pk = CATALOG_VERSION_ID)[0].value
+    return version
+
+
+async def aget_catalog_version() -> int:
+    version = await CatalogVersion.objects.filter(pk = CATALOG_VERSION_ID).values_list("value", flat = True).afirst()
+    if version is None:
+        version = (await CatalogVersion.objects.aget_or_create(pk = CATALOG_VERSION_ID))[0].value
+    return version
+
+
+def request_catalog_version(request) -> int:
+    """Версия каталога, прочитанная один раз на запрос: её используют и ETag, и кэш ответов."""
+    if not hasattr(request, "_catalog_version"):
+        request._catalog_version = get_catalog_version()
+    return request._catalog_version
+
+
+async def arequest_catalog_version(request:HttpRequest) -> int:
+    if not hasattr(request, "_catalog_version"):
+        request._catalog_version = await aget_catalog_version()
+    return request._catalog_version
+
+
+def bump_catalog_version() -> None:
+    """
+        Делает недоступными все закэшированные ответы, построенные по старому каталогу.
+        Внутри транзакции новая версия становится видна другим процессам вместе с изменёнными данными.
+    """
+    if not CatalogVersion.objects.filter(pk = CATALOG_VERSION_ID).update(value = F("value") + 1):
+        CatalogVersion.objects.get_or_create(pk = CATALOG_VERSION_ID, defaults = {"value": 2})
+
+
+def normalize_query(request:Request) -> str:
+    items = sorted((key, sorted(values)) for key, values in request.GET.lists())
+    return hashlib.md5(repr(items).encode()).hexdigest()
+
+
+def count(endpoint:str, result:str) -> None:
+    key = STATS_KEY.format(endpoint = endpoint, result = result)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout = None):
+            cache.incr(key)
+
+
+async def acount(endpoint:str, result:str) -> None:
+    key = STATS_KEY.format(endpoint = endpoint, result = result)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout = None):
+            await cache.aincr(key)
+
+
+def get_cache_stats() -> dict:
+    """
+        Счётчики попаданий и промахов по каждому кэшируемому эндпоинту в этом процессе,
+        как и /api/metrics: общий счётчик превратил бы каждый закэшированный GET в запись в базу.
+    """
+    stats = {}
+    for endpoint in sorted(cached_endpoints):
+        hits = cache.get(STATS_KEY.format(endpoint = endpoint, result = "hit"), 0)
+        misses = cache.get(STATS_KEY.format(endpoint = endpoint, result = "miss"), 0)
+        stats[endpoint] = {
+            "hits": hits,
+            "misses": misses,
+            "hitRatio": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return {"version": get_catalog_version(), "process": os.getpid(), "endpoints": stats}
+
+
+def cached_response(endpoint:str, timeout:int = RESPONSE_CACHE_TIMEOUT):
+    """
+        Кэширует данные успешного ответа GET-метода APIView.
+
+        Ключ строится из имени эндпоинта, версии каталога и нормализованной строки запроса,
+        поэтому изменение каталога (см. signals.py) сразу делает старые записи недоступными.
+        Ответы, собранные из готовых JSON-фрагментов (см. fragments.py), кэшируются как байты.
+    """
+    cached_endpoints.add(endpoint)
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request:Request, *args, **kwargs) -> Response:
+            key = f"response:{endpoint}:{request_catalog_version(request)}:{normalize_query(request)}"
+            data = cache.get(key)
+            if isinstance(data, bytes):
+                count(endpoint, "hit")
+                return HttpResponse(data, status = 200, content_type = "application/json")
+            if data is not None:
+                count(endpoint, "hit")
+                return Response(data = data, status = 200)
+
+            count(endpoint, "miss")
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data if isinstance(response, Response) else response.content, timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def acached_response(endpoint:str, timeout:int = RESPONSE_CACHE_TIMEOUT):
+    """
+        cached_response для асинхронных представлений: тот же ключ и те же счётчики,
+        в кэш кладётся тело ответа в байтах.
+    """
+    cached_endpoints.add(endpoint)
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request:HttpRequest, *args, **kwargs) -> HttpResponse:
+            key = f"response:{endpoint}:{await arequest_catalog_version(request)}:{normalize_query(request)}"
+            data = await cache.aget(key)
+            if isinstance(data, bytes):
+                await acount(endpoint, "hit")
+                return HttpResponse(data, status = 200, content_type = "application/json")
+            if data is not None:
+                await acount(endpoint, "hit")
+                return HttpResponse(JSONRenderer().render(data), status = 200, content_type = "application/json")
+
+            await acount(endpoint, "miss")
+            response = await view(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.content, timeout)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,131 @@
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import QuerySet
+from django.http import QueryDict
+
+from .filters import ProductFilter
+from .models import Product
+from .search import RANK_FIELD, annotate_rank, search_queryset
+
+SORT_FIELDS = {
+    "rating": "rating",
+    "price": "price",
+    "reviews": "review_count",
+    "date": "date",
+    "relevance": RANK_FIELD,
+}
+DEFAULT_SORT = "price"
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def to_decimal(value:str | None) -> Decimal | None:
+    try:
+        return Decimal(value) if value not in (None, "") else None
+    except InvalidOperation:
+        return None
+
+
+class CatalogQuery:
+    """
+        Нормализованный запрос каталога.
+
+        Разбирает параметры "filter[...]", "sort", "sortType", "tags[]", "category" и "limit"
+        в канонический вид: одинаковые по смыслу запросы дают одинаковый cache_key()
+        и компилируются в один и тот же queryset через ProductFilter.
+
+        "filter[name]" ищется по полнотекстовому индексу (см. search.py). Результаты поиска
+        сортируются по релевантности, если передан sort=relevance или sort не передан вовсе.
+    """
+    def __init__(self, filters:dict, sort:str = DEFAULT_SORT, descending:bool = False, limit:int = DEFAULT_LIMIT):
+        self.filters = filters
+        self.sort = sort
+        self.descending = descending
+        self.limit = limit
+
+    @classmethod
+    def from_query_params(cls, params:QueryDict) -> "CatalogQuery":
+        filters = {}
+        name = (params.get("filter[name]") or "").strip()
+        if name:
+            filters["title"] = name
+        for flag in ("freeDelivery", "available"):
+            if params.get(f"filter[{flag}]") == "true":
+                filters[flag] = True
+        for bound in ("minPrice", "maxPrice"):
+            value = to_decimal(params.get(f"filter[{bound}]"))
+            if value is not None:
+                filters[bound] = value
+        tags = sorted({int(tag) for tag in params.getlist("tags[]") if tag.isdigit()})
+        if tags:
+            filters["tags"] = tags
+        category = params.get("category") or ""
+        if category.isdigit():
+            filters["category"] = int(category)
+
+        sort = params.get("sort")
+        if sort is None and "title" in filters:
+            sort = "relevance"
+        if sort not in SORT_FIELDS or (sort == "relevance" and "title" not in filters):
+            sort = DEFAULT_SORT
+        limit = params.get("limit") or ""
+        return cls(
+            filters = filters,
+            sort = sort,
+            descending = params.get("sortType") == "inc",
+            limit = min(int(limit), MAX_LIMIT) if limit.isdigit() and int(limit) > 0 else DEFAULT_LIMIT,
+        )
+
+    @property
+    def ordering(self) -> str:
+        if self.sort == "relevance":
+            return RANK_FIELD
+        return f"{'-' if self.descending else ''}{SORT_FIELDS[self.sort]}"
+
+    def normalized(self) -> dict:
+        return {
+            "filter": {key: str(value) if not isinstance(value, list) else value for key, value in self.filters.items()},
+            "sort": self.sort,
+            "sortType": "inc" if self.descending else "dec",
+            "limit": self.limit,
+        }
+
+    def cache_key(self, prefix:str = "catalog", filters_only:bool = False) -> str:
+        """
+            Ключ кэша, не зависящий от порядка и формы записи параметров.
+            С filters_only=True сортировка и размер страницы в ключ не входят.
+        """
+        normalized = self.normalized()
+        if filters_only:
+            normalized = {"filter": normalized["filter"]}
+        payload = json.dumps(normalized, sort_keys = True, separators = (",", ":"))
+        return f"{prefix}:{hashlib.md5(payload.encode()).hexdigest()}"
+
+    def get_filter_data(self) -> dict:
+        data = {}
+        for key, value in self.filters.items():
+            if key == "title":
+                continue
+            if isinstance(value, bool):
+                data[key] = "true" if value else "false"
+            elif isinstance(value, list):
+                data[key] = ",".join(str(item) for item in value)
+            else:
+                data[key] = str(value)
+        return data
+
+    def compile(self, queryset:QuerySet | None = None, ranked:bool = True) -> QuerySet:
+        """
+            Применяет все фильтры одним проходом ProductFilter; сортировку задаёт пагинатор.
+            ranked=False не добавляет search_rank, такой queryset можно вкладывать в подзапросы.
+        """
+        if queryset is None:
+            queryset = Product.objects.all()
+        queryset = ProductFilter(data = self.get_filter_data(), queryset = queryset).qs
+        if "title" in self.filters:
+            queryset = search_queryset(queryset, self.filters["title"])
+            if ranked and self.sort == "relevance":
+                queryset = annotate_rank(queryset, self.filters["title"])
+        return queryset
@@ -0,0 +1,284 @@
+import datetime
+import math
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+from .cache import get_catalog_version
+from .catalog import CatalogQuery
+from .models import Product, Tag
+from .pagination import decode_cursor, encode_cursor, get_page_number
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+INITIAL_CAPACITY = 1024
+NUMERIC_COLUMNS = {
+    "price": "float64",
+    "rating": "int64",
+    "review_count": "int64",
+    "date": "int64",
+    "category": "int64",
+}
+FLAGS = ("alive", "freeDelivery", "available")
+MAX_AGE = getattr(settings, "CATALOG_INDEX_MAX_AGE", 60 * 5)
+
+
+def is_enabled() -> bool:
+    return np is not None and getattr(settings, "CATALOG_INDEX_ENABLED", False)
+
+
+class CatalogIndex:
+    """
+        Колоночный снимок каталога в памяти процесса.
+
+        Числовые поля товаров хранятся в массивах NumPy, а теги, категории и булевы флаги —
+        в упакованных битовых множествах (1 бит на товар). Фильтр — это пересечение битсетов
+        и сравнение колонок, сортировка — частичная сортировка только первых offset + limit строк.
+
+        Снимок обновляется точечно из сигналов моделей (см. signals.py) и перестраивается
+        целиком, если общая версия каталога (CatalogVersion в базе) изменилась в другом процессе.
+        Правки, прошедшие мимо сигналов и версии (например, queryset.update() из shell),
+        подхватываются полной перестройкой не позже чем через max_age секунд.
+    """
+    def __init__(self, max_age:float | None = MAX_AGE):
+        self.lock = threading.RLock()
+        self.version = None
+        self.max_age = max_age
+        self.built_at = 0.0
+        self.clear()
+
+    def clear(self, capacity:int = INITIAL_CAPACITY) -> None:
+        capacity = max(8, math.ceil(capacity / 8) * 8)
+        self.capacity = capacity
+        self.size = 0
+        self.positions: dict[int, int] = {}
+        self.ids = np.zeros(capacity, dtype = "int64")
+        self.columns = {name: np.zeros(capacity, dtype = dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        self.flags = {name: np.zeros(capacity // 8, dtype = "uint8") for name in FLAGS}
+        self.tags: dict[int, np.ndarray] = {}
+        self.categories: dict[int, np.ndarray] = {}
+        self.product_tags: dict[int, set] = {}
+
+    def new_bitset(self) -> "np.ndarray":
+        return np.zeros(self.capacity // 8, dtype = "uint8")
+
+    @staticmethod
+    def set_bit(bitset:"np.ndarray", position:int, value:bool) -> None:
+        mask = np.uint8(128 >> (position & 7))
+        if value:
+            bitset[position >> 3] |= mask
+        else:
+            bitset[position >> 3] &= ~mask
+
+    def grow(self, capacity:int) -> None:
+        capacity = math.ceil(capacity / 8) * 8
+        extra = capacity - self.capacity
+        self.ids = np.concatenate([self.ids, np.zeros(extra, dtype = "int64")])
+        for name, column in self.columns.items():
+            self.columns[name] = np.concatenate([column, np.zeros(extra, dtype = column.dtype)])
+        for bitsets in (self.flags, self.tags, self.categories):
+            for key, bitset in bitsets.items():
+                bitsets[key] = np.concatenate([bitset, np.zeros(extra // 8, dtype = "uint8")])
+        self.capacity = capacity
+
+    def get_product_rows(self, product_ids = None) -> tuple[list, dict]:
+        products = Product.objects.order_by("pk")
+        links = Tag.product.through.objects.all()
+        if product_ids is not None:
+            products = products.filter(pk__in = product_ids)
+            links = links.filter(product_id__in = product_ids)
+        rows = products.values_list(
+            "pk", "price", "rating", "review_count", "date", "category", "freeDelivery", "available"
+        )
+        tags = {}
+        for product_id, tag_id in links.values_list("product_id", "tag_id"):
+            tags.setdefault(product_id, set()).add(tag_id)
+        return list(rows), tags
+
+    def write_row(self, row:tuple, tags:set) -> None:
+        pk, price, rating, review_count, date, category, free_delivery, available = row
+        position = self.positions.get(pk)
+        if position is None:
+            if self.size == self.capacity:
+                self.grow(self.capacity * 2)
+            position = self.size
+            self.size += 1
+            self.positions[pk] = position
+            self.ids[position] = pk
+        else:
+            old_category = int(self.columns["category"][position])
+            if old_category in self.categories:
+                self.set_bit(self.categories[old_category], position, False)
+            for tag_id in self.product_tags.get(position, ()):
+                self.set_bit(self.tags[tag_id], position, False)
+
+        self.columns["price"][position] = float(price)
+        self.columns["rating"][position] = rating
+        self.columns["review_count"][position] = review_count
+        self.columns["date"][position] = date.toordinal()
+        self.columns["category"][position] = category
+        self.set_bit(self.flags["alive"], position, True)
+        self.set_bit(self.flags["freeDelivery"], position, free_delivery)
+        self.set_bit(self.flags["available"], position, available)
+        self.set_bit(self.categories.setdefault(category, self.new_bitset()), position, True)
+        for tag_id in tags:
+            self.set_bit(self.tags.setdefault(tag_id, self.new_bitset()), position, True)
+        self.product_tags[position] = set(tags)
+
+    def rebuild(self) -> None:
+        """Полная перестройка снимка: два запроса (товары и связи с тегами)."""
+        version = get_catalog_version()
+        rows, tags = self.get_product_rows()
+        with self.lock:
+            self.clear(capacity = max(len(rows), INITIAL_CAPACITY))
+            for row in rows:
+                self.write_row(row, tags.get(row[0], set()))
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def refresh_products(self, product_ids) -> None:
+        """Точечно обновляет строки товаров; удалённые товары помечаются как неживые."""
+        product_ids = set(product_ids)
+        rows, tags = self.get_product_rows(product_ids)
+        with self.lock:
+            for row in rows:
+                self.write_row(row, tags.get(row[0], set()))
+            for pk in product_ids - {row[0] for row in rows}:
+                position = self.positions.get(pk)
+                if position is not None:
+                    self.set_bit(self.flags["alive"], position, False)
+
+    def on_catalog_change(self, product_ids = ()) -> None:
+        """
+            Вызывается из сигналов после увеличения версии каталога.
+            Если между синхронизациями версия менялась только этим изменением,
+            применяется точечное обновление, иначе снимок перестроится при следующем запросе.
+        """
+        if self.version is None:
+            return
+        version = get_catalog_version()
+        with self.lock:
+            if self.version != version - 1:
+                return
+            if product_ids:
+                self.refresh_products(product_ids)
+            self.version = version
+
+    def is_expired(self) -> bool:
+        return self.max_age is not None and time.monotonic() - self.built_at > self.max_age
+
+    def ensure_fresh(self) -> None:
+        if self.is_expired() or self.version != get_catalog_version():
+            self.rebuild()
+
+    def supports(self, query:CatalogQuery) -> bool:
+        """Полнотекстовый поиск и сортировка по релевантности остаются за ORM."""
+        return is_enabled() and "title" not in query.filters and query.sort != "relevance"
+
+    def select(self, query:CatalogQuery) -> "np.ndarray":
+        """Позиции товаров, подходящих под фильтры запроса."""
+        filters = query.filters
+        bits = self.flags["alive"].copy()
+        for flag in ("freeDelivery", "available"):
+            if filters.get(flag):
+                bits &= self.flags[flag]
+        if "category" in filters:
+            bits &= self.categories.get(filters["category"], self.new_bitset())
+        if filters.get("tags"):
+            tags = self.new_bitset()
+            for tag_id in filters["tags"]:
+                if tag_id in self.tags:
+                    tags |= self.tags[tag_id]
+            bits &= tags
+
+        mask = np.unpackbits(bits, count = self.size).astype(bool)
+        price = self.columns["price"][:self.size]
+        if "minPrice" in filters:
+            mask &= price >= float(filters["minPrice"])
+        if "maxPrice" in filters:
+            mask &= price <= float(filters["maxPrice"])
+        return np.flatnonzero(mask)
+
+    def get_sort_keys(self, query:CatalogQuery, positions:"np.ndarray") -> tuple:
+        """Ключи сортировки (колонка, id); для убывающего порядка оба ключа инвертируются."""
+        field = query.ordering.lstrip("-")
+        keys = self.columns[field][positions]
+        ids = self.ids[positions]
+        if query.descending:
+            return -keys, -ids
+        return keys, ids
+
+    def encode_value(self, field:str, value):
+        if field == "price":
+            return f"{value:.2f}"
+        if field == "date":
+            return datetime.date.fromordinal(int(value)).isoformat()
+        return int(value)
+
+    def decode_value(self, field:str, value) -> float:
+        try:
+            if field == "date":
+                return datetime.date.fromisoformat(value).toordinal()
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValidationError({"cursor": "Invalid cursor."})
+
+    def top(self, keys:"np.ndarray", ids:"np.ndarray", k:int) -> "np.ndarray":
+        """Индексы первых k элементов по (keys, ids) без полной сортировки."""
+        if k < len(keys):
+            kth = np.partition(keys, k - 1)[k - 1]
+            candidates = np.flatnonzero(keys <= kth)
+        else:
+            candidates = np.arange(len(keys))
+        order = np.lexsort((ids[candidates], keys[candidates]))
+        return candidates[order][:k]
+
+    def paginate(self, request:Request, query:CatalogQuery) -> tuple[list, dict]:
+        """
+            То же, что pagination.paginate_queryset для ORM: курсоры совместимы между
+            обоими путями, а lastPage считается точно и бесплатно.
+        """
+        self.ensure_fresh()
+        field = query.ordering.lstrip("-")
+        with self.lock:
+            positions = self.select(query)
+            keys, ids = self.get_sort_keys(query, positions)
+            cursor = request.GET.get("cursor")
+            if cursor is not None:
+                if cursor:
+                    value, pk = decode_cursor(cursor, query.ordering)
+                    value = self.decode_value(field, value)
+                    if query.descending:
+                        value, pk = -value, -pk
+                    after = (keys > value) | ((keys == value) & (ids > pk))
+                    positions, keys, ids = positions[after], keys[after], ids[after]
+                order = self.top(keys, ids, query.limit + 1)
+                page_ids = [int(pk) for pk in self.ids[positions[order]]]
+                page_info = {"nextCursor": None}
+                if len(page_ids) > query.limit:
+                    page_ids = page_ids[:query.limit]
+                    last = positions[order[query.limit - 1]]
+                    page_info["nextCursor"] = encode_cursor(
+                        query.ordering,
+                        self.encode_value(field, self.columns[field][last]),
+                        int(self.ids[last]),
+                    )
+            else:
+                page_number = get_page_number(request)
+                offset = (page_number - 1) * query.limit
+                order = self.top(keys, ids, offset + query.limit)[offset:]
+                page_ids = [int(pk) for pk in self.ids[positions[order]]]
+                page_info = {
+                    "currentPage": page_number,
+                    "lastPage": max(math.ceil(len(positions) / query.limit), 1),
+                }
+        return page_ids, page_info
+
+
+catalog_index = CatalogIndex() if np is not None else None
@@ -0,0 +1,107 @@
+import functools
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+from .cache import RESPONSE_CACHE_TIMEOUT, arequest_catalog_version, get_catalog_version, normalize_query, request_catalog_version
+from .models import Banner, CatalogItem, Product, ProductImage, SubCatigory, Tag
+
+# Модели, от которых зависят ответы группы эндпоинтов. Изменения картинок, тегов
+# и отзывов сдвигают updated_at самого товара (см. signals.touch_products).
+VERSION_GROUPS = {
+    "products": (Product, Banner),
+    "categories": (CatalogItem, SubCatigory, Tag, ProductImage),
+}
+
+
+def get_group_version(group:str, catalog_version:int | None = None) -> tuple:
+    """
+        Версия данных группы: (последний updated_at, число строк) по каждой модели.
+        Число строк учитывает удаления, которые не оставляют updated_at.
+        Результат запоминается в кэше процесса под общей версией каталога (CatalogVersion в базе),
+        поэтому изменение в другом воркере сразу даёт новый ETag и здесь.
+    """
+    if catalog_version is None:
+        catalog_version = get_catalog_version()
+    key = f"conditional:{group}:{catalog_version}"
+    version = cache.get(key)
+    if version is None:
+        version = tuple(
+            tuple(model.objects.aggregate(last_modified = Max("updated_at"), total = Count("pk")).values())
+            for model in VERSION_GROUPS[group]
+        )
+        cache.set(key, version, RESPONSE_CACHE_TIMEOUT)
+    return version
+
+
+def make_etag(*parts) -> str:
+    return hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def list_condition(endpoint:str, group:str = "products"):
+    """
+        ETag для списочного GET-метода APIView: строится из версии группы моделей
+        и нормализованной строки запроса, поэтому при совпадении If-None-Match
+        ответ 304 отдаётся без выборки и сериализации тела.
+    """
+    def etag(request, *args, **kwargs) -> str:
+        return make_etag(endpoint, normalize_query(request), get_group_version(group, request_catalog_version(request)))
+    return method_decorator(condition(etag_func = etag))
+
+
+def get_product_updated_at(request, pk:int):
+    """updated_at товара; читается один раз на запрос, общий для ETag и Last-Modified."""
+    if not hasattr(request, "_product_updated_at"):
+        request._product_updated_at = Product.objects.filter(pk = pk).values_list("updated_at", flat = True).first()
+    return request._product_updated_at
+
+
+def product_etag(request, pk:int) -> str | None:
+    updated_at = get_product_updated_at(request, pk)
+    return make_etag("product", pk, updated_at.isoformat()) if updated_at else None
+
+
+product_condition = method_decorator(condition(etag_func = product_etag, last_modified_func = get_product_updated_at))
+
+
+async def aconditional_response(request:HttpRequest, view, etag:str | None, last_modified = None, *args, **kwargs) -> HttpResponse:
+    """Аналог django.views.decorators.http.condition для async-представлений с заранее посчитанными валидаторами."""
+    etag = quote_etag(etag) if etag else None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag = etag, last_modified = timestamp)
+    if response is None:
+        response = await view(request, *args, **kwargs)
+    if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+        if etag:
+            response.headers.setdefault("ETag", etag)
+        if timestamp:
+            response.headers.setdefault("Last-Modified", http_date(timestamp))
+    return response
+
+
+def alist_condition(endpoint:str, group:str = "products"):
+    """list_condition для async-представлений; версия группы читается в потоке синхронного кода."""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request:HttpRequest, *args, **kwargs) -> HttpResponse:
+            version = await sync_to_async(get_group_version)(group, await arequest_catalog_version(request))
+            etag = make_etag(endpoint, normalize_query(request), version)
+            return await aconditional_response(request, view, etag, None, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def aproduct_condition(view):
+    @functools.wraps(view)
+    async def wrapper(request:HttpRequest, pk:int, *args, **kwargs) -> HttpResponse:
+        updated_at = await Product.objects.filter(pk = pk).values_list("updated_at", flat = True).afirst()
+        etag = make_etag("product", pk, updated_at.isoformat()) if updated_at else None
+        return await aconditional_response(request, view, etag, updated_at, pk, *args, **kwargs)
+    return wrapper
@@ -1,6 +1,25 @@
 from django_filters import rest_framework as filters
 
+from .models import Tag
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
 class ProductFilter(filters.FilterSet):
     title = filters.CharFilter(field_name='title')
     freeDelivery = filters.BooleanFilter(field_name='freeDelivery')
-    available = filters.BooleanFilter(field_name='available')
\ No newline at end of file
+    available = filters.BooleanFilter(field_name='available')
+    minPrice = filters.NumberFilter(field_name='price', lookup_expr='gte')
+    maxPrice = filters.NumberFilter(field_name='price', lookup_expr='lte')
+    category = filters.NumberFilter(field_name='category')
+    tags = NumberInFilter(method='filter_tags')
+
+    def filter_tags(self, queryset, name, value):
+        """Товары, у которых есть хотя бы один из тегов, без JOIN и DISTINCT."""
+        if not value:
+            return queryset
+        return queryset.filter(
+            pk__in = Tag.product.through.objects.filter(tag_id__in = value).values("product_id")
+        )
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from .models import Product
+from .projections import project_products, rows_by_ids
+
+FRAGMENT_KEY = "product-card:{pk}:{version}"
+# Колонки страницы, по которым карточки берутся из кэша без отдельного запроса за updated_at
+FRAGMENT_ROW_FIELDS = ("id", "updated_at")
+FRAGMENT_TIMEOUT = getattr(settings, "PRODUCT_FRAGMENT_TIMEOUT", 60 * 60)
+
+renderer = JSONRenderer()
+
+
+def get_fragment_cache():
+    try:
+        return caches["fragments"]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def render_fragments(product_ids:list) -> dict[int, bytes]:
+    """Карточки товаров (как ProductSerializer), закодированные в JSON по отдельности."""
+    rows = rows_by_ids(Product.objects.all(), product_ids)
+    return {card["id"]: renderer.render(card) for card in project_products(rows)}
+
+
+def fragment_key(pk:int, updated_at) -> str:
+    return FRAGMENT_KEY.format(pk = pk, version = updated_at.isoformat())
+
+
+def get_fragments(product_ids:list, versions:dict | None = None) -> list[bytes]:
+    """
+        Готовые JSON-карточки товаров в порядке product_ids.
+
+        Ключ карточки — id и updated_at товара, который сдвигается при любом изменении данных
+        карточки (см. signals.touch_products), поэтому изменение в другом процессе сразу даёт
+        новый ключ и здесь. Без versions ({id: updated_at}) updated_at читается одним запросом
+        по первичному ключу.
+        Отсутствующие в кэше карточки строятся одним проходом и кладутся в кэш;
+        удалённые товары пропускаются.
+    """
+    fragment_cache = get_fragment_cache()
+    if versions is None:
+        versions = dict(Product.objects.filter(pk__in = product_ids).values_list("pk", "updated_at"))
+    keys = {pk: fragment_key(pk, versions[pk]) for pk in product_ids if pk in versions}
+    cached = fragment_cache.get_many(keys.values())
+    fragments = {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+    missing = [pk for pk in keys if pk not in fragments]
+    if missing:
+        rendered = render_fragments(missing)
+        fragment_cache.set_many(
+            {keys[pk]: fragment for pk, fragment in rendered.items()}, FRAGMENT_TIMEOUT
+        )
+        fragments.update(rendered)
+    return [fragments[pk] for pk in product_ids if pk in fragments]
+
+
+def get_row_fragments(rows:list[dict]) -> list[bytes]:
+    """Карточки для строк страницы с колонками FRAGMENT_ROW_FIELDS."""
+    return get_fragments([row["id"] for row in rows], {row["id"]: row["updated_at"] for row in rows})
+
+
+def fragment_response(fragments:list[bytes], page_info:dict | None = None, headers:dict | None = None) -> HttpResponse:
+    """
+        Собирает ответ склейкой готовых карточек без повторной сериализации.
+        Без page_info отдаётся список, с ним — {"items": [...], **page_info}.
+    """
+    body = b"[" + b",".join(fragments) + b"]"
+    if page_info:
+        body = b'{"items":' + body + b"," + renderer.render(page_info)[1:]
+    return HttpResponse(body, status = 200, content_type = "application/json", headers = headers)
@@ -0,0 +1,159 @@
+import io
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .models import Profile, ProductImage
+
+logger = logging.getLogger(__name__)
+
+# Имя варианта -> максимальные (ширина, высота); пропорции сохраняются, картинка не увеличивается
+IMAGE_VARIANTS = getattr(settings, "IMAGE_VARIANTS", {"thumb": (200, 200), "medium": (600, 600)})
+IMAGE_WORKERS = getattr(settings, "IMAGE_WORKERS", 2)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+# Модель -> (поле с исходной картинкой, JSON-поле с путями вариантов)
+IMAGE_FIELDS = {
+    ProductImage: ("src", "variants"),
+    Profile: ("avatar", "avatar_variants"),
+}
+
+# Варианты называются по исходному файлу, а он — по хэшу содержимого, поэтому одинаковые
+# загрузки делят одни и те же варианты. Они лежат рядом с оригиналами, но без подсчёта ссылок:
+# неиспользуемые удаляет collect_media_garbage.
+variant_storage = FileSystemStorage()
+
+executor = None
+executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers = IMAGE_WORKERS, thread_name_prefix = "image-variants")
+        return executor
+
+
+def variant_names(name:str) -> dict[str, str]:
+    """
+        Пути производных картинок для исходного файла (имя которого — хэш содержимого, см. storage.py):
+        content/ab/cd/abcd….jpg -> content/ab/cd/derivatives/abcd….thumb.jpg и abcd….thumb.webp.
+    """
+    directory, filename = posixpath.split(name)
+    stem, extension = posixpath.splitext(filename)
+    extension = ".png" if extension.lower() == ".png" else ".jpg"
+    names = {}
+    for variant in IMAGE_VARIANTS:
+        base = posixpath.join(directory, "derivatives", f"{stem}.{variant}")
+        names[variant] = base + extension
+        names[f"{variant}_webp"] = base + ".webp"
+    return names
+
+
+def needs_variants(name:str, variants:dict) -> bool:
+    return bool(name) and variants != variant_names(name)
+
+
+def variant_urls(variants:dict) -> dict[str, str]:
+    return {variant: variant_storage.url(path) for variant, path in variants.items()}
+
+
+def encode(image:Image.Image, format:str) -> bytes:
+    buffer = io.BytesIO()
+    if format == "WEBP":
+        image.save(buffer, "WEBP", quality = WEBP_QUALITY, method = 4)
+    elif format == "PNG":
+        image.save(buffer, "PNG", optimize = True)
+    else:
+        image.convert("RGB").save(buffer, "JPEG", quality = JPEG_QUALITY, optimize = True, progressive = True)
+    return buffer.getvalue()
+
+
+def write_variant(name:str, data:bytes) -> None:
+    """
+        Атомарно записывает вариант под точным именем: два воркера, строящие варианты
+        одного и того же содержимого, пишут одинаковые байты и не плодят копии с суффиксами.
+    """
+    path = variant_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    descriptor, temporary = tempfile.mkstemp(dir = os.path.dirname(path), suffix = ".part")
+    with os.fdopen(descriptor, "wb") as file:
+        file.write(data)
+    if variant_storage.file_permissions_mode is not None:
+        os.chmod(temporary, variant_storage.file_permissions_mode)
+    os.replace(temporary, path)
+
+
+def render_variants(name:str) -> dict[str, str]:
+    """
+        Строит уменьшенные копии и WebP-варианты исходного файла и сохраняет их в хранилище.
+        Если варианты этого содержимого уже построены для другой записи, они переиспользуются.
+    """
+    names = variant_names(name)
+    if all(variant_storage.exists(path) for path in names.values()):
+        return names
+    with default_storage.open(name, "rb") as file:
+        source = ImageOps.exif_transpose(Image.open(file))
+        source.load()
+    if source.mode not in ("RGB", "RGBA"):
+        source = source.convert("RGBA" if "transparency" in source.info else "RGB")
+
+    for variant, size in IMAGE_VARIANTS.items():
+        image = source.copy()
+        image.thumbnail(size, Image.LANCZOS)
+        for key, format in ((variant, "PNG" if names[variant].endswith(".png") else "JPEG"), (f"{variant}_webp", "WEBP")):
+            write_variant(names[key], encode(image, format))
+    return names
+
+
+def build_variants(model, pk:int) -> dict | None:
+    """
+        Строит варианты для одной записи и сохраняет их пути в JSON-поле.
+        Сохранение идёт через save(update_fields = [...]), поэтому обычные сигналы
+        (сброс кэшей каталога, updated_at товара) срабатывают, а повторная постановка в очередь — нет.
+    """
+    field, variants_field = IMAGE_FIELDS[model]
+    instance = model.objects.filter(pk = pk).first()
+    if instance is None:
+        return None
+    name = getattr(instance, field).name
+    if not needs_variants(name, getattr(instance, variants_field)):
+        return getattr(instance, variants_field)
+
+    variants = render_variants(name)
+    setattr(instance, variants_field, variants)
+    instance.save(update_fields = [variants_field])
+    return variants
+
+
+def run_build(model, pk:int) -> None:
+    try:
+        build_variants(model, pk)
+    except Exception:
+        logger.exception("Не удалось построить варианты картинки %s #%s", model.__name__, pk)
+    finally:
+        connections.close_all()
+
+
+def wait_for_variants() -> None:
+    """Дожидается всех поставленных в пул задач; нужно management-командам перед выходом."""
+    global executor
+    with executor_lock:
+        current, executor = executor, None
+    if current is not None:
+        current.shutdown(wait = True)
+
+
+def schedule_variants(model, pk:int) -> None:
+    """Ставит построение вариантов в пул воркеров после фиксации транзакции; поток запроса не ждёт."""
+    transaction.on_commit(lambda: get_executor().submit(run_build, model, pk))
@@ -0,0 +1,100 @@
+import asyncio
+import importlib.util
+import statistics
+import time
+import types
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from django.urls import include, path
+
+from api.models import CatalogItem, Product
+
+URLS = (
+    "/api/banners",
+    "/api/sales/",
+    "/api/catalog?sort=price&sortType=inc",
+    "/api/catalog?sort=rating&currentPage=2",
+    "/api/products/popular",
+    "/api/products/limited",
+    "/api/categories",
+)
+
+
+def build_urlconf(async_views:bool) -> types.ModuleType:
+    """Отдельная копия api.urls с синхронными или асинхронными представлениями."""
+    with override_settings(API_ASYNC_VIEWS = async_views):
+        spec = importlib.util.find_spec("api.urls")
+        api_urls = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(api_urls)
+    urlconf = types.ModuleType(f"bench_urls_{'async' if async_views else 'sync'}")
+    urlconf.urlpatterns = [path("api/", include((api_urls.urlpatterns, "api")))]
+    return urlconf
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает синхронные APIView и async-представления каталога под ASGI: "
+        "проверяет одинаковость ответов и меряет пропускную способность при N одновременных запросах."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type = int, nargs = "+", default = [1, 16, 64, 256])
+        parser.add_argument("--requests", type = int, default = 1000)
+
+    def get_urls(self) -> list[str]:
+        urls = list(URLS)
+        product = Product.objects.order_by("pk").values_list("pk", flat = True).first()
+        category = CatalogItem.objects.order_by("pk").values_list("pk", flat = True).first()
+        if product:
+            urls.append(f"/api/product/{product}")
+        if category:
+            urls.append(f"/api/tags?category={category}")
+        return urls
+
+    async def fetch_all(self, urls:list[str]) -> list:
+        client = AsyncClient()
+        responses = []
+        for url in urls:
+            response = await client.get(url)
+            responses.append((response.status_code, response.content))
+        return responses
+
+    async def load(self, urls:list[str], concurrency:int, total:int) -> tuple[float, list]:
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(index:int) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(urls[index % len(urls)])
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f"{urls[index % len(urls)]}: {response.status_code}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(total)))
+        return total / (time.perf_counter() - started), sorted(latencies)
+
+    def handle(self, *args, **options):
+        urls = self.get_urls()
+        urlconfs = {"sync": build_urlconf(False), "async": build_urlconf(True)}
+
+        bodies = {}
+        for mode, urlconf in urlconfs.items():
+            with override_settings(ROOT_URLCONF = urlconf, ALLOWED_HOSTS = ["testserver"]):
+                bodies[mode] = asyncio.run(self.fetch_all(urls))
+        for url, sync_response, async_response in zip(urls, bodies["sync"], bodies["async"]):
+            if sync_response != async_response:
+                raise CommandError(f"Ответы {url} различаются: {sync_response[0]} / {async_response[0]}")
+        self.stdout.write(f"Ответы совпадают на {len(urls)} адресах")
+
+        for concurrency in options["concurrency"]:
+            for mode, urlconf in urlconfs.items():
+                with override_settings(ROOT_URLCONF = urlconf, ALLOWED_HOSTS = ["testserver"]):
+                    rate, latencies = asyncio.run(self.load(urls, concurrency, options["requests"]))
+                self.stdout.write(
+                    f"c={concurrency:>4} {mode:>5}: {rate:8.1f} запр/с, "
+                    f"p50 {statistics.median(latencies):7.1f} мс, p95 {latencies[int(len(latencies) * 0.95)]:7.1f} мс"
+                )
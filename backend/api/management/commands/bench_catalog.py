@@ -0,0 +1,86 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from api.catalog import CatalogQuery
+from api.catalog_index import CatalogIndex, np
+from api.models import Product, Tag
+from api.pagination import paginate_queryset
+
+
+class Command(BaseCommand):
+    help = "Сравнивает выборку страницы каталога через ORM и через снимок каталога в памяти."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type = int, default = 200)
+        parser.add_argument("--seed", type = int, default = 0)
+
+    def make_params(self, rng:random.Random, tag_ids:list, categories:list) -> QueryDict:
+        params = QueryDict(mutable = True)
+        params["sort"] = rng.choice(["price", "rating", "reviews", "date"])
+        params["sortType"] = rng.choice(["inc", "dec"])
+        params["limit"] = "20"
+        params["currentPage"] = str(rng.choice([1, 1, 2, 5, 50]))
+        if rng.random() < 0.5:
+            params["filter[minPrice]"] = str(rng.randint(0, 5000))
+            params["filter[maxPrice]"] = str(rng.randint(5000, 500000))
+        if rng.random() < 0.3:
+            params["filter[freeDelivery]"] = "true"
+        if rng.random() < 0.3:
+            params["filter[available]"] = "true"
+        if tag_ids and rng.random() < 0.4:
+            params.setlist("tags[]", [str(tag) for tag in rng.sample(tag_ids, min(2, len(tag_ids)))])
+        if categories and rng.random() < 0.3:
+            params["category"] = str(rng.choice(categories))
+        return params
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError("Для снимка каталога нужен numpy.")
+
+        rng = random.Random(options["seed"])
+        tag_ids = list(Tag.objects.values_list("pk", flat = True)[:100])
+        categories = list(Product.objects.order_by().values_list("category", flat = True).distinct()[:100])
+        factory = RequestFactory()
+
+        index = CatalogIndex()
+        started = time.perf_counter()
+        index.rebuild()
+        self.stdout.write(f"Снимок построен за {(time.perf_counter() - started) * 1000:.1f} мс, товаров: {index.size}")
+
+        timings = {"orm": [], "index": []}
+        mismatches = 0
+        for _ in range(options["queries"]):
+            params = self.make_params(rng, tag_ids, categories)
+            request = Request(factory.get("/api/catalog", params))
+            query = CatalogQuery.from_query_params(params)
+
+            started = time.perf_counter()
+            object_list, orm_info = paginate_queryset(
+                request = request,
+                queryset = query.compile(Product.objects.only("pk", "price", "rating", "review_count", "date")),
+                ordering = query.ordering,
+                page_size = query.limit,
+            )
+            orm_ids = [product.pk for product in object_list]
+            timings["orm"].append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            index_ids, index_info = index.paginate(request = request, query = query)
+            timings["index"].append((time.perf_counter() - started) * 1000)
+
+            if orm_ids != index_ids:
+                mismatches += 1
+
+        for name, values in timings.items():
+            values.sort()
+            self.stdout.write(
+                f"{name:>5}: mean {statistics.mean(values):.3f} мс, "
+                f"p50 {values[len(values) // 2]:.3f} мс, p95 {values[int(len(values) * 0.95)]:.3f} мс"
+            )
+        self.stdout.write(f"Расхождений в выдаче: {mismatches}")
@@ -0,0 +1,136 @@
+import contextlib
+import logging
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+
+from api.models import Product
+
+READ_URLS = (
+    "/api/catalog?sort=price&sortType=inc",
+    "/api/catalog?sort=rating&currentPage=2",
+    "/api/catalog?filter=a&sort=date",
+    "/api/product/{pk}",
+)
+WRITER_PREFIX = "bench-database-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Смешанная нагрузка чтение/запись на SQLite: читатели листают каталог, писатели меняют корзины. "
+        "Сравнивает журнал DELETE без реплики и WAL с прагмами и маршрутизатором чтения на replica."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type = int, default = 8)
+        parser.add_argument("--writers", type = int, default = 2)
+        parser.add_argument("--seconds", type = float, default = 10)
+
+    @contextlib.contextmanager
+    def profile(self, tuned:bool):
+        """Без tuned — журнал DELETE, без прагм, реплики и постоянных соединений, как до настройки."""
+        saved = {alias: dict(connections.settings[alias]) for alias in connections.settings}
+        routers = ["api.routers.CatalogReplicaRouter"] if tuned else []
+        try:
+            with override_settings(DATABASE_ROUTERS = routers):
+                if not tuned:
+                    for alias in saved:
+                        connections.settings[alias].update(CONN_MAX_AGE = 0, OPTIONS = {})
+                    connections.settings["default"]["OPTIONS"] = {"pragmas": {"journal_mode": "DELETE"}}
+                connections.close_all()
+                connections["default"].ensure_connection()
+                yield
+        finally:
+            for alias, settings_dict in saved.items():
+                connections.settings[alias].update(settings_dict)
+            connections.close_all()
+            connections["default"].ensure_connection()
+
+    def run_worker(self, work, deadline:float, results:dict, kind:str) -> None:
+        latencies, errors = [], 0
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                if work() != 200:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            connections.close_all()
+            with self.lock:
+                results[kind]["latencies"].extend(latencies)
+                results[kind]["errors"] += errors
+
+    def reader(self, index:int):
+        # Исключения тестовый клиент ловит через глобальный сигнал, то есть из всех потоков сразу,
+        # поэтому ошибки считаются по коду ответа
+        client = Client(HTTP_HOST = "localhost", raise_request_exception = False)
+        urls = [url.format(pk = self.product_ids[index % len(self.product_ids)]) for url in READ_URLS]
+        counter = iter(range(10 ** 9))
+
+        def work():
+            return client.get(urls[next(counter) % len(urls)]).status_code
+        return work
+
+    def writer(self, user:User):
+        client = Client(HTTP_HOST = "localhost", raise_request_exception = False)
+        client.force_login(user)
+        counter = iter(range(10 ** 9))
+
+        def work():
+            step = next(counter)
+            product_id = self.product_ids[step % len(self.product_ids)]
+            if step % 2:
+                response = client.delete("/api/basket", {"id": product_id, "count": 1}, content_type = "application/json")
+            else:
+                response = client.post("/api/basket", {"id": product_id, "count": 1}, content_type = "application/json")
+            return response.status_code
+        return work
+
+    def run(self, readers:int, writers:list, seconds:float) -> dict:
+        for cache in caches.all():
+            cache.clear()
+        results = {kind: {"latencies": [], "errors": 0} for kind in ("read", "write")}
+        workers = [self.reader(index) for index in range(readers)]
+        kinds = ["read"] * readers + ["write"] * len(writers)
+        workers += [self.writer(user) for user in writers]
+        deadline = time.perf_counter() + seconds
+        threads = [
+            threading.Thread(target = self.run_worker, args = (work, deadline, results, kind))
+            for work, kind in zip(workers, kinds)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def report(self, name:str, results:dict, seconds:float) -> None:
+        for kind, result in results.items():
+            latencies = sorted(result["latencies"]) or [0]
+            self.stdout.write(
+                f"{name:>8} {kind:>5}: {len(result['latencies']) / seconds:8.1f} оп/с, "
+                f"p50 {statistics.median(latencies):7.1f} мс, p95 {latencies[int(len(latencies) * 0.95)]:7.1f} мс, "
+                f"ошибок: {result['errors']}"
+            )
+
+    def handle(self, *args, **options):
+        self.lock = threading.Lock()
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        self.product_ids = list(Product.objects.order_by("pk").values_list("pk", flat = True)[:50])
+        writers = [
+            User.objects.get_or_create(username = f"{WRITER_PREFIX}{index}")[0] for index in range(options["writers"])
+        ]
+        try:
+            for name, tuned in (("baseline", False), ("tuned", True)):
+                with self.profile(tuned):
+                    results = self.run(options["readers"], writers, options["seconds"])
+                self.report(name, results, options["seconds"])
+        finally:
+            User.objects.filter(username__startswith = WRITER_PREFIX).delete()
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark.data import BATCH_SIZE, CatalogGenerator, Scale, clear, has_generated_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Наполняет базу детерминированным синтетическим каталогом для нагрузочных тестов: "
+        "товары, картинки, теги, характеристики, отзывы, пользователи, корзины и заказы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type = int, default = 100_000)
+        parser.add_argument("--users", type = int, default = 1000)
+        parser.add_argument("--categories", type = int, default = 20)
+        parser.add_argument("--tags", type = int, default = 500)
+        parser.add_argument("--images", type = int, default = 2, help = "Картинок на товар в среднем.")
+        parser.add_argument("--reviews", type = int, default = 5, help = "Отзывов на товар в среднем.")
+        parser.add_argument("--orders", type = int, default = 3, help = "Заказов на пользователя в среднем.")
+        parser.add_argument("--basket-lines", type = int, default = 3, help = "Строк корзины на пользователя в среднем.")
+        parser.add_argument("--seed", type = int, default = 0)
+        parser.add_argument("--batch-size", type = int, default = BATCH_SIZE)
+        parser.add_argument("--clear", action = "store_true", help = "Удалить ранее сгенерированные данные перед генерацией.")
+        parser.add_argument("--clear-only", action = "store_true", help = "Только удалить сгенерированные данные.")
+
+    def handle(self, *args, **options):
+        if options["clear"] or options["clear_only"]:
+            self.stdout.write(f"Удалено сгенерированных товаров: {clear()}")
+            if options["clear_only"]:
+                return
+        if has_generated_data():
+            raise CommandError("В базе уже есть сгенерированные данные, запустите с --clear.")
+
+        scale = Scale(
+            products = options["products"],
+            users = options["users"],
+            categories = options["categories"],
+            tags = options["tags"],
+            images = options["images"],
+            reviews = options["reviews"],
+            orders = options["orders"],
+            basket_lines = options["basket_lines"],
+        )
+        generator = CatalogGenerator(scale, seed = options["seed"], batch_size = options["batch_size"], log = self.stdout.write)
+        started = time.perf_counter()
+        dataset = generator.generate()
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {time.perf_counter() - started:.1f} с: "
+            + ", ".join(f"{name} {count}" for name, count in dataset.items())
+        ))
@@ -0,0 +1,69 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark.load import PERCENTILES, compare, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузка на настоящие URL API смесью запросов каталога, карточек, корзины и заказов. "
+        "Печатает p50/p95/p99 и пропускную способность по эндпоинтам, полный отчёт пишет в JSON "
+        "для сравнения между коммитами. Данные — см. bench_generate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type = int, default = 8)
+        parser.add_argument("--requests", type = int, default = 2000, help = "Всего запросов (без --duration).")
+        parser.add_argument("--duration", type = float, default = None, help = "Секунд нагрузки вместо числа запросов.")
+        parser.add_argument("--warmup", type = int, default = 10, help = "Неучитываемых запросов на воркер.")
+        parser.add_argument("--users", type = int, default = None, help = "Воркеров, входящих как пользователи.")
+        parser.add_argument("--seed", type = int, default = 0)
+        parser.add_argument("--base-url", default = None, help = "Сервер, например http://127.0.0.1:8000; без него — в процессе.")
+        parser.add_argument("--output", default = None, help = "Файл для JSON-отчёта, '-' — stdout.")
+        parser.add_argument("--compare", default = None, help = "JSON-отчёт прошлого запуска для сравнения.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Не удалось прочитать {options['compare']}: {error}")
+
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        try:
+            report = run_load(
+                concurrency = options["concurrency"],
+                requests = options["requests"],
+                duration = options["duration"],
+                warmup = options["warmup"],
+                seed = options["seed"],
+                users = options["users"],
+                base_url = options["base_url"],
+            )
+        except RuntimeError as error:
+            raise CommandError(str(error))
+
+        if options["output"] == "-":
+            self.stdout.write(json.dumps(report, indent = 2, ensure_ascii = False))
+            return
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent = 2, ensure_ascii = False)
+
+        header = " ".join(f"{f'p{rank}':>8}" for rank in PERCENTILES)
+        self.stdout.write(f"{'эндпоинт':<24} {'запросов':>8} {'ошибок':>6} {'rps':>8} {header}")
+        for name, summary in {**report["endpoints"], "всего": report["total"]}.items():
+            percentiles = " ".join(f"{summary[f'p{rank}_ms']:8.1f}" for rank in PERCENTILES)
+            self.stdout.write(
+                f"{name:<24} {summary['requests']:>8} {summary['errors']:>6} {summary['throughput_rps']:>8.1f} {percentiles}"
+            )
+        if baseline:
+            self.stdout.write(f"\nСравнение с {baseline.get('commit') or options['compare']}:")
+            for name, before_p95, after_p95, before_rps, after_rps in compare(baseline, report):
+                self.stdout.write(
+                    f"{name:<24} p95 {before_p95:8.1f} → {after_p95:8.1f} мс, rps {before_rps:8.1f} → {after_rps:8.1f}"
+                )
@@ -0,0 +1,58 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Basket, BasketObject, Product
+from api.pricing import basket_total
+
+
+class Command(BaseCommand):
+    help = "Сравнивает подсчёт суммы корзины в Python по строкам и одним агрегатным запросом."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type = int, nargs = "+", default = [10, 100, 500])
+        parser.add_argument("--repeat", type = int, default = 20)
+
+    def python_total(self, basket:Basket) -> Decimal:
+        return sum(
+            (line.product.price * line.count for line in BasketObject.objects.filter(basket = basket)),
+            Decimal(0),
+        )
+
+    def measure(self, function, basket:Basket, repeat:int) -> tuple[float, int]:
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                function(basket)
+                timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), len(queries)
+
+    def handle(self, *args, **options):
+        for size in options["lines"]:
+            with transaction.atomic():
+                user = User.objects.create(username = f"bench-pricing-{size}")
+                basket = Basket.objects.create(user = user)
+                products = list(Product.objects.order_by("pk")[:size])
+                if len(products) < size:
+                    products += Product.objects.bulk_create([
+                        Product(title = f"bench {index}", price = Decimal("99.99") + index)
+                        for index in range(size - len(products))
+                    ])
+                BasketObject.objects.bulk_create([
+                    BasketObject(basket = basket, product = product, count = 1 + index % 3)
+                    for index, product in enumerate(products)
+                ])
+
+                python_ms, python_queries = self.measure(self.python_total, basket, options["repeat"])
+                sql_ms, sql_queries = self.measure(basket_total, basket, options["repeat"])
+                self.stdout.write(
+                    f"{size:>5} строк: python {python_ms:.2f} мс / {python_queries} запросов, "
+                    f"sql {sql_ms:.2f} мс / {sql_queries} запросов"
+                )
+                transaction.set_rollback(True)
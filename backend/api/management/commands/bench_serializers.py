@@ -0,0 +1,79 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from api.fragments import fragment_response, get_fragments
+from api.models import Product
+from api.projections import SALE_PRODUCT_FIELDS, product_rows, project_products, project_sale_products
+from api.serializers import ProductSerializer, SaleProductSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает сериализацию страницы товаров через DRF, через .values()-проекции "
+        "и склейкой готовых JSON-карточек."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type = int, default = 20)
+        parser.add_argument("--repeat", type = int, default = 50)
+
+    def measure(self, build, render:bool = True) -> tuple[bytes, list, int]:
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            body = JSONRenderer().render(build()) if render else build()
+            timings.append((time.perf_counter() - started) * 1000)
+        with CaptureQueriesContext(connection) as queries:
+            build()
+        return body, sorted(timings), len(queries)
+
+    def report(self, name:str, timings:list, queries:int) -> None:
+        self.stdout.write(
+            f"{name:>12}: mean {statistics.mean(timings):.3f} мс, "
+            f"p50 {timings[len(timings) // 2]:.3f} мс, запросов: {queries}"
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        limit = options["limit"]
+        pages = {
+            "catalog": (
+                lambda: ProductSerializer(
+                    Product.objects.prefetch_related("images", "tags").order_by("id")[:limit], many = True
+                ).data,
+                lambda: project_products(list(product_rows(Product.objects.order_by("id"))[:limit])),
+            ),
+            "sale": (
+                lambda: SaleProductSerializer(
+                    Product.objects.prefetch_related("images").filter(is_sale = True).order_by("id")[:limit],
+                    many = True,
+                ).data,
+                lambda: project_sale_products(
+                    list(product_rows(Product.objects.filter(is_sale = True).order_by("id"), SALE_PRODUCT_FIELDS)[:limit])
+                ),
+            ),
+        }
+        for page, (serialize, project) in pages.items():
+            self.stdout.write(f"[{page}]")
+            drf_body, drf_timings, drf_queries = self.measure(serialize)
+            fast_body, fast_timings, fast_queries = self.measure(project)
+            if drf_body != fast_body:
+                raise CommandError(f"Ответы {page} различаются: проекция не совпадает с сериализатором.")
+            self.report("serializer", drf_timings, drf_queries)
+            self.report("projection", fast_timings, fast_queries)
+
+        self.stdout.write("[catalog, fragments]")
+        product_ids = list(Product.objects.order_by("id").values_list("id", flat = True)[:limit])
+        get_fragments(product_ids)
+        fragments_body, fragments_timings, fragments_queries = self.measure(
+            lambda: fragment_response(get_fragments(product_ids)).content,
+            render = False,
+        )
+        if fragments_body != JSONRenderer().render(pages["catalog"][0]()):
+            raise CommandError("Ответ из фрагментов не совпадает с сериализатором.")
+        self.report("fragments", fragments_timings, fragments_queries)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.images import IMAGE_FIELDS, get_executor, needs_variants, run_build
+
+
+class Command(BaseCommand):
+    help = "Строит превью и WebP-варианты для уже загруженных картинок товаров и аватаров в пуле воркеров."
+
+    def handle(self, *args, **options):
+        jobs = []
+        for model, (field, variants_field) in IMAGE_FIELDS.items():
+            for pk, name, variants in model.objects.values_list("pk", field, variants_field).iterator():
+                if needs_variants(name, variants):
+                    jobs.append((model, pk))
+
+        executor = get_executor()
+        for future in [executor.submit(run_build, model, pk) for model, pk in jobs]:
+            future.result()
+        self.stdout.write(self.style.SUCCESS(f"Обработано картинок: {len(jobs)}"))
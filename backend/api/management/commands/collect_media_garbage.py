@@ -0,0 +1,131 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from api.images import IMAGE_FIELDS, wait_for_variants
+from api.models import OrderLine, StoredFile
+from api.storage import CONTENT_ROOT, INCOMING_DIR, is_content_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из хранилища медиа файлы без ссылок: оригиналы с нулевым счётчиком, "
+        "неиспользуемые варианты картинок и недописанные загрузки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace", type = int, default = 60, help = "Не трогать файлы моложе N минут.")
+        parser.add_argument("--recount", action = "store_true", help = "Пересчитать StoredFile.refs по записям.")
+        parser.add_argument(
+            "--import-legacy", action = "store_true",
+            help = "Перенести файлы, загруженные до хранилища по содержимому, в content/.",
+        )
+        parser.add_argument("--legacy", action = "store_true", help = "Удалять и старые файлы вне content/ без ссылок.")
+        parser.add_argument("--dry-run", action = "store_true")
+
+    def referenced_files(self) -> tuple[set, set]:
+        """Имена оригиналов и вариантов, на которые ссылаются записи, включая снимки строк заказов."""
+        files, variants = set(), set()
+        for model, (field, variants_field) in IMAGE_FIELDS.items():
+            for name, paths in model.objects.values_list(field, variants_field).iterator():
+                if name:
+                    files.add(name)
+                variants.update((paths or {}).values())
+        for url in OrderLine.objects.exclude(image_src = "").values_list("image_src", flat = True).iterator():
+            if url.startswith(settings.MEDIA_URL):
+                files.add(url[len(settings.MEDIA_URL):])
+        return files, variants
+
+    def import_legacy(self) -> int:
+        moved = 0
+        for model, (field, variants_field) in IMAGE_FIELDS.items():
+            for instance in model.objects.exclude(**{field: ""}).exclude(**{f"{field}__startswith": CONTENT_ROOT + "/"}):
+                file = getattr(instance, field)
+                if not default_storage.exists(file.name):
+                    continue
+                with default_storage.open(file.name, "rb") as source:
+                    file.save(os.path.basename(file.name), File(source), save = False)
+                instance.save(update_fields = [field])
+                moved += 1
+        wait_for_variants()
+        return moved
+
+    def recount(self) -> None:
+        counts = {}
+        for model, (field, variants_field) in IMAGE_FIELDS.items():
+            for row in model.objects.filter(**{f"{field}__startswith": CONTENT_ROOT + "/"}).values(field).annotate(
+                total = Count("pk")
+            ):
+                counts[row[field]] = counts.get(row[field], 0) + row["total"]
+        for stored in StoredFile.objects.iterator():
+            refs = counts.get(stored.name, 0)
+            if stored.refs != refs:
+                StoredFile.objects.filter(pk = stored.pk).update(refs = refs)
+
+    def remove_content(self, name:str, path:str, deadline:float) -> bool:
+        """
+            Удаляет файл content/ под блокировкой его строки StoredFile, заново проверив refs и mtime:
+            параллельная загрузка тех же байтов могла сослаться на него после снимка tracked.
+        """
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name = name).first()
+            if stored is not None and stored.refs > 0:
+                return False
+            if os.path.getmtime(path) > deadline:
+                return False
+            os.remove(path)
+            if stored is not None:
+                stored.delete()
+        return True
+
+    def walk(self, directory:str):
+        root = default_storage.path(directory)
+        for dirpath, dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, default_storage.location).replace(os.sep, "/"), path
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        deadline = time.time() - options["grace"] * 60
+        if options["import_legacy"] and not dry_run:
+            self.stdout.write(f"Перенесено в content/: {self.import_legacy()}")
+        if options["recount"] and not dry_run:
+            self.recount()
+
+        files, variants = self.referenced_files()
+        tracked = set(StoredFile.objects.filter(refs__gt = 0).values_list("name", flat = True))
+        removed, freed = [], 0
+        for name, path in self.walk(""):
+            original = False
+            if name.startswith(INCOMING_DIR + "/"):
+                garbage = True
+            elif "/derivatives/" in name:
+                garbage = name not in variants
+            elif is_content_name(name):
+                original = True
+                garbage = name not in tracked and name not in files
+            else:
+                garbage = options["legacy"] and name not in files
+            if not garbage or os.path.getmtime(path) > deadline:
+                continue
+            size = os.path.getsize(path)
+            if not dry_run:
+                if original:
+                    if not self.remove_content(name, path, deadline):
+                        continue
+                else:
+                    os.remove(path)
+            removed.append(name)
+            freed += size
+
+        for name in removed:
+            self.stdout.write(f"  {name}")
+        verb = "Будет удалено" if dry_run else "Удалено"
+        self.stdout.write(self.style.SUCCESS(f"{verb} файлов: {len(removed)}, {freed / 1024 / 1024:.1f} МБ"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.banners import BANNERS_LIMIT, rebuild_auto_banners
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает автоматические баннеры главной страницы (лучшие по рейтингу доступные товары)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type = int, default = BANNERS_LIMIT)
+
+    def handle(self, *args, **options):
+        count = rebuild_auto_banners(limit = options["limit"])
+        self.stdout.write(self.style.SUCCESS(f"Автоматических баннеров: {count}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.search import REBUILD_BATCH_SIZE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Перестраивает полнотекстовый индекс товаров (SQLite FTS5)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type = int, default = REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(batch_size = options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Проиндексировано товаров: {indexed}"))
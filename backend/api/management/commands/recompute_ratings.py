@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import bump_catalog_version
+from api.models import Product
+from api.ratings import recompute_products
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает review_count, rating_sum, rating_count и rating товаров пакетами SQL-запросов."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type = int, default = 1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk = 0
+        updated = 0
+        while True:
+            batch = list(
+                Product.objects.filter(pk__gt = last_pk).order_by("pk").values_list("pk", flat = True)[:batch_size]
+            )
+            if not batch:
+                break
+            with transaction.atomic():
+                updated += recompute_products(
+                    Product.objects.filter(pk__gte = batch[0], pk__lte = batch[-1])
+                )
+            last_pk = batch[-1]
+        # UPDATE без сигналов: сбрасываем закэшированные ответы каталога явно
+        if updated:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано товаров: {updated}"))
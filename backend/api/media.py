@@ -0,0 +1,148 @@
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+
+from .storage import is_content_name
+
+# Имена вида content/ab/cd/<sha256>.<ext> и их варианты никогда не меняют содержимое
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MEDIA_MAX_AGE = getattr(settings, "MEDIA_MAX_AGE", 60 * 60)
+# None — отдавать файл самим; "x-accel" (nginx) или "x-sendfile" (Apache, lighttpd) — поручить веб-серверу
+MEDIA_SENDFILE = getattr(settings, "MEDIA_SENDFILE", None)
+MEDIA_ACCEL_PREFIX = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeFile:
+    """
+        Читает из файла только диапазон [start, start + length).
+        Метода fileno нет намеренно: иначе wsgi.file_wrapper отдал бы файл целиком.
+    """
+    def __init__(self, file, start:int, length:int):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size:int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def parse_range(header:str, size:int) -> tuple[int, int] | None:
+    """
+        Разбирает заголовок Range с одним диапазоном в пару (start, length).
+        Несколько диапазонов не поддерживаются — тогда отдаётся весь файл (None).
+        Неудовлетворимый диапазон даёт ValueError.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = min(int(last), size)
+        if length == 0:
+            raise ValueError(header)
+        return size - length, length
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end - start + 1
+
+
+def get_etag(name:str, stat:os.stat_result) -> str:
+    if is_content_name(name):
+        # В имени уже есть хэш содержимого
+        return f'"{os.path.basename(name)}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def set_cache_headers(response:HttpResponse, name:str, etag:str, stat:os.stat_result) -> HttpResponse:
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Accept-Ranges"] = "bytes"
+    if is_content_name(name):
+        response["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response["Cache-Control"] = f"public, max-age={MEDIA_MAX_AGE}"
+    return response
+
+
+def sendfile_response(name:str, path:str, content_type:str) -> HttpResponse:
+    """Пустой ответ, по которому веб-сервер сам отдаёт файл (и сам обрабатывает Range)."""
+    response = HttpResponse(content_type = content_type)
+    if MEDIA_SENDFILE == "x-accel":
+        response["X-Accel-Redirect"] = MEDIA_ACCEL_PREFIX + name
+    else:
+        response["X-Sendfile"] = path
+    return response
+
+
+@require_safe
+def serve_media(request:HttpRequest, path:str) -> HttpResponse:
+    """
+        Отдаёт загруженные файлы из MEDIA_ROOT.
+
+        Файл не читается, пока не нужно тело: ETag и Last-Modified берутся из имени и stat(),
+        поэтому If-None-Match / If-Modified-Since отвечаются 304 сразу. Целый файл отдаётся
+        через FileResponse (wsgi.file_wrapper — sendfile у gunicorn/uwsgi), один диапазон
+        Range — ответом 206. При MEDIA_SENDFILE отдача поручается веб-серверу.
+    """
+    name = path.replace("\\", "/")
+    if any(part.startswith(".") for part in name.split("/")):
+        raise Http404(path)
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404(path)
+    if not S_ISREG(stat.st_mode):
+        raise Http404(path)
+
+    etag = get_etag(name, stat)
+    not_modified = get_conditional_response(request, etag = etag, last_modified = int(stat.st_mtime))
+    if not_modified is not None:
+        return set_cache_headers(not_modified, name, etag, stat)
+
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    if MEDIA_SENDFILE:
+        return set_cache_headers(sendfile_response(name, full_path, content_type), name, etag, stat)
+
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if "Range" in request.headers and (not if_range or etag in parse_etags(if_range)):
+        try:
+            byte_range = parse_range(request.headers["Range"], stat.st_size)
+        except ValueError:
+            response = HttpResponse(status = 416)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+            return set_cache_headers(response, name, etag, stat)
+
+    file = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type = content_type)
+    else:
+        start, length = byte_range
+        response = FileResponse(RangeFile(file, start, length), status = 206, content_type = content_type)
+        response["Content-Length"] = str(length)
+        response["Content-Range"] = f"bytes {start}-{start + length - 1}/{stat.st_size}"
+    return set_cache_headers(response, name, etag, stat)
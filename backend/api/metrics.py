@@ -0,0 +1,244 @@
+import contextvars
+import itertools
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+
+logger = logging.getLogger("api.metrics")
+
+METRICS_LATENCY_BUCKETS = getattr(
+    settings, "METRICS_LATENCY_BUCKETS", (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+# Запросы к базе дольше стольких миллисекунд попадают в журнал медленных запросов; None — не собирать
+METRICS_SLOW_QUERY_MS = getattr(settings, "METRICS_SLOW_QUERY_MS", None)
+METRICS_SLOW_QUERY_LOG = getattr(settings, "METRICS_SLOW_QUERY_LOG", 100)
+# Токен для сборщика Prometheus (Authorization: Bearer …); без него метрики видят только администраторы
+METRICS_TOKEN = getattr(settings, "METRICS_TOKEN", None)
+UNMATCHED = "unmatched"
+
+current_request = contextvars.ContextVar("metrics_request", default = None)
+slow_queries = deque(maxlen = METRICS_SLOW_QUERY_LOG)
+
+
+class EndpointStats:
+    __slots__ = ("requests", "statuses", "duration", "buckets", "queries", "db_time", "response_bytes")
+
+    def __init__(self):
+        self.requests = 0
+        self.statuses = {}
+        self.duration = 0.0
+        self.buckets = [0] * (len(METRICS_LATENCY_BUCKETS) + 1)
+        self.queries = 0
+        self.db_time = 0.0
+        self.response_bytes = 0
+
+
+class Shards(threading.local):
+    """
+        Счётчики текущего потока: {(endpoint, method): EndpointStats}.
+        Каждый поток пишет только в свой словарь, поэтому запись идёт без блокировок.
+        Когда объект завершившегося потока собирается, weakref.finalize под блокировкой
+        складывает его счётчики в retired, поэтому registry хранит только живые потоки.
+    """
+    lock = threading.Lock()
+    registry = {}
+    retired = {}
+    keys = itertools.count()
+
+    def __init__(self):
+        self.stats = {}
+        key = next(self.keys)
+        with self.lock:
+            self.registry[key] = self.stats
+        weakref.finalize(threading.current_thread(), Shards.retire, key)
+
+    @classmethod
+    def retire(cls, key:int) -> None:
+        with cls.lock:
+            stats_by_key = cls.registry.pop(key, None)
+            if stats_by_key is not None:
+                merge(cls.retired, stats_by_key)
+
+
+shards = Shards()
+
+
+class RequestMetrics:
+    """Запросы к базе, выполненные при обработке одного HTTP-запроса."""
+    __slots__ = ("request", "queries", "db_time")
+
+    def __init__(self, request:HttpRequest):
+        self.request = request
+        self.queries = 0
+        self.db_time = 0.0
+
+
+def get_endpoint(request:HttpRequest) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else UNMATCHED
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper для каждого соединения: считает запросы и время в базе текущего HTTP-запроса."""
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.db_time += duration
+        if METRICS_SLOW_QUERY_MS is not None and duration * 1000 >= METRICS_SLOW_QUERY_MS:
+            capture_slow_query(metrics.request, sql, params, duration, context["connection"].alias)
+
+
+def capture_slow_query(request:HttpRequest, sql:str, params, duration:float, alias:str) -> None:
+    match = getattr(request, "resolver_match", None)
+    entry = {
+        "endpoint": get_endpoint(request),
+        "view": match._func_path if match else None,
+        "path": request.path,
+        "database": alias,
+        "duration_ms": round(duration * 1000, 3),
+        "sql": sql,
+        "params": [str(param) for param in params] if isinstance(params, (list, tuple)) else str(params),
+        "time": time.time(),
+    }
+    slow_queries.append(entry)
+    logger.warning("Медленный запрос %.1f мс в %s: %s", entry["duration_ms"], entry["view"] or entry["path"], sql)
+
+
+def install(connection) -> None:
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def get_response_size(response:HttpResponse) -> int:
+    if response.has_header("Content-Length"):
+        return int(response["Content-Length"])
+    return 0 if response.streaming else len(response.content)
+
+
+def observe(request:HttpRequest, response:HttpResponse, metrics:RequestMetrics, duration:float) -> None:
+    key = (get_endpoint(request), request.method)
+    stats = shards.stats.get(key)
+    if stats is None:
+        stats = shards.stats[key] = EndpointStats()
+    stats.requests += 1
+    stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+    stats.duration += duration
+    for index, bound in enumerate(METRICS_LATENCY_BUCKETS):
+        if duration <= bound:
+            stats.buckets[index] += 1
+            break
+    else:
+        stats.buckets[-1] += 1
+    stats.queries += metrics.queries
+    stats.db_time += metrics.db_time
+    stats.response_bytes += get_response_size(response)
+
+
+def merge(total:dict, stats_by_key:dict) -> None:
+    """Прибавляет счётчики одного потока к total: {(endpoint, method): EndpointStats}."""
+    for key, stats in list(stats_by_key.items()):
+        merged = total.get(key)
+        if merged is None:
+            merged = total[key] = EndpointStats()
+        merged.requests += stats.requests
+        for status, count in list(stats.statuses.items()):
+            merged.statuses[status] = merged.statuses.get(status, 0) + count
+        merged.duration += stats.duration
+        merged.buckets = [left + right for left, right in zip(merged.buckets, stats.buckets)]
+        merged.queries += stats.queries
+        merged.db_time += stats.db_time
+        merged.response_bytes += stats.response_bytes
+
+
+def collect() -> dict:
+    """Сумма счётчиков живых и завершившихся потоков: {(endpoint, method): EndpointStats}."""
+    total = {}
+    with Shards.lock:
+        for stats_by_key in (Shards.retired, *Shards.registry.values()):
+            merge(total, stats_by_key)
+    return total
+
+
+def escape(value:str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(total:dict) -> str:
+    """Текстовый формат Prometheus 0.0.4."""
+    lines = []
+
+    def family(name:str, kind:str, description:str) -> None:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def labels(endpoint:str, method:str, **extra) -> str:
+        pairs = {"endpoint": endpoint, "method": method, **extra}
+        return "{" + ",".join(f'{name}="{escape(str(value))}"' for name, value in pairs.items()) + "}"
+
+    items = sorted(total.items())
+    family("api_requests_total", "counter", "HTTP requests by endpoint and status code.")
+    for (endpoint, method), stats in items:
+        for status, count in sorted(stats.statuses.items()):
+            lines.append(f"api_requests_total{labels(endpoint, method, status = status)} {count}")
+
+    family("api_request_duration_seconds", "histogram", "Time spent handling a request.")
+    for (endpoint, method), stats in items:
+        cumulative = 0
+        for bound, count in zip((*METRICS_LATENCY_BUCKETS, "+Inf"), stats.buckets):
+            cumulative += count
+            lines.append(f"api_request_duration_seconds_bucket{labels(endpoint, method, le = bound)} {cumulative}")
+        lines.append(f"api_request_duration_seconds_sum{labels(endpoint, method)} {stats.duration:.6f}")
+        lines.append(f"api_request_duration_seconds_count{labels(endpoint, method)} {stats.requests}")
+
+    for name, attribute, description in (
+        ("api_db_queries_total", "queries", "Database queries issued while handling requests."),
+        ("api_db_duration_seconds_total", "db_time", "Time spent in database queries."),
+        ("api_response_bytes_total", "response_bytes", "Response body bytes sent."),
+    ):
+        family(name, "counter", description)
+        for (endpoint, method), stats in items:
+            lines.append(f"{name}{labels(endpoint, method)} {getattr(stats, attribute)}")
+
+    family("api_slow_queries_captured", "gauge", "Slow queries currently kept in the capture buffer.")
+    lines.append(f"api_slow_queries_captured {len(slow_queries)}")
+    return "\n".join(lines) + "\n"
+
+
+def is_allowed(request:HttpRequest) -> bool:
+    if METRICS_TOKEN:
+        header = request.headers.get("Authorization", "")
+        if header.startswith("Bearer ") and constant_time_compare(header[len("Bearer "):], METRICS_TOKEN):
+            return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+@require_safe
+def metrics_view(request:HttpRequest) -> HttpResponse:
+    """Метрики эндпоинтов процесса в формате Prometheus."""
+    if not is_allowed(request):
+        return HttpResponse(status = 403)
+    return HttpResponse(render_prometheus(collect()), content_type = "text/plain; version=0.0.4; charset=utf-8")
+
+
+@require_safe
+def slow_queries_view(request:HttpRequest) -> HttpResponse:
+    """Последние медленные запросы к базе (при METRICS_SLOW_QUERY_MS) с SQL и представлением."""
+    if not is_allowed(request):
+        return HttpResponse(status = 403)
+    entries = sorted(slow_queries, key = lambda entry: entry["time"], reverse = True)
+    return HttpResponse(json.dumps(entries, ensure_ascii = False), content_type = "application/json")
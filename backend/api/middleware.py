@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import RequestMetrics, current_request, observe
+
+GZIP_MIN_LENGTH = getattr(settings, "GZIP_MIN_LENGTH", 1024)
+GZIP_CONTENT_TYPES = getattr(settings, "GZIP_CONTENT_TYPES", ("application/json", "text/"))
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """
+        Сжимает gzip только текстовые ответы (JSON, HTML) длиннее GZIP_MIN_LENGTH байт.
+        Короткие ответы и уже сжатые форматы (картинки, файлы) отдаются как есть.
+        Ответы на Range (206, Content-Range) тоже: сжатие сломало бы смещения диапазона.
+    """
+    def process_response(self, request, response):
+        if response.status_code == 206 or response.has_header("Content-Range"):
+            return response
+        if not response.get("Content-Type", "").startswith(GZIP_CONTENT_TYPES):
+            return response
+        if not response.streaming and len(response.content) < GZIP_MIN_LENGTH:
+            return response
+        return super().process_response(request, response)
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+        Для каждого эндпоинта (имени URL из api/urls.py) считает число запросов по кодам ответа,
+        гистограмму длительности, число запросов к базе и время в базе, размер ответов.
+        Стоит первым в MIDDLEWARE, чтобы мерить всю обработку и размер ответа уже после gzip.
+        Счётчики живут в памяти процесса: каждый воркер отдаёт свои.
+    """
+    def process_request(self, request:HttpRequest) -> None:
+        request._metrics = RequestMetrics(request)
+        request._metrics_started = time.perf_counter()
+        current_request.set(request._metrics)
+
+    def process_response(self, request:HttpRequest, response:HttpResponse) -> HttpResponse:
+        metrics = getattr(request, "_metrics", None)
+        if metrics is not None:
+            observe(request, response, metrics, time.perf_counter() - request._metrics_started)
+            current_request.set(None)
+        return response
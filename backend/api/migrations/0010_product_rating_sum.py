@@ -0,0 +1,54 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:17
+
+from django.db import migrations, models
+from django.db.models import Case, Count, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+from django.db.models.lookups import GreaterThan
+
+
+def backfill_ratings(apps, schema_editor):
+    Product = apps.get_model("api", "Product")
+    Review = apps.get_model("api", "Review")
+    reviews = Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+    rated = reviews.filter(valuation__isnull=False)
+    rating_count = Coalesce(
+        Subquery(rated.annotate(total=Count("pk")).values("total"), output_field=IntegerField()), 0
+    )
+    rating_sum = Coalesce(
+        Subquery(rated.annotate(total=Sum("valuation")).values("total"), output_field=IntegerField()), 0
+    )
+    Product.objects.update(
+        review_count=Coalesce(
+            Subquery(reviews.annotate(total=Count("pk")).values("total"), output_field=IntegerField()), 0
+        ),
+        rating_count=rating_count,
+        rating_sum=rating_sum,
+        rating=Case(
+            When(
+                GreaterThan(rating_count, 0),
+                then=Round(Cast(rating_sum, FloatField()) / rating_count, output_field=IntegerField()),
+            ),
+            default=Value(5),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_tag_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_product_rating_sum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Banner',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('source', models.CharField(choices=[('manual', 'manual'), ('auto', 'auto')], default='manual', max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='banners', to='api.product')),
+            ],
+            options={
+                'ordering': ['-source', 'position'],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+FTS_TABLE = "api_product_fts"
+FTS_COLUMNS = ("title", "description", "fullDescription", "tags", "specifications")
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    Product = apps.get_model("api", "Product")
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{', '.join(FTS_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    rows = [
+        (
+            product.pk,
+            product.title or "",
+            product.description or "",
+            product.fullDescription or "",
+            " ".join(tag.name for tag in product.tags.all()),
+            " ".join(spec.value or "" for spec in product.specifications.all()),
+        )
+        for product in Product.objects.prefetch_related("tags", "specifications").iterator(chunk_size=1000)
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_banner'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
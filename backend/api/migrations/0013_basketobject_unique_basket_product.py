@@ -0,0 +1,42 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:25
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    BasketObject = apps.get_model("api", "BasketObject")
+    OrderProducts = apps.get_model("api", "Order").products.through
+    duplicates = (
+        BasketObject.objects.values("basket_id", "product_id")
+        .annotate(lines=Count("pk"), keep=Min("pk"), total=Sum("count"))
+        .filter(lines__gt=1)
+    )
+    for group in duplicates:
+        extra = BasketObject.objects.filter(
+            basket_id=group["basket_id"], product_id=group["product_id"]
+        ).exclude(pk=group["keep"])
+        linked_orders = set(
+            OrderProducts.objects.filter(basketobject_id=group["keep"]).values_list("order_id", flat=True)
+        )
+        for link in OrderProducts.objects.filter(basketobject__in=extra):
+            if link.order_id not in linked_orders:
+                OrderProducts.objects.create(order_id=link.order_id, basketobject_id=group["keep"])
+                linked_orders.add(link.order_id)
+        extra.delete()
+        BasketObject.objects.filter(pk=group["keep"]).update(count=group["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_product_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='basketobject',
+            constraint=models.UniqueConstraint(fields=('basket', 'product'), name='unique_basket_product'),
+        ),
+    ]
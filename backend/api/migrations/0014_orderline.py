@@ -0,0 +1,54 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def snapshot_existing_orders(apps, schema_editor):
+    Order = apps.get_model("api", "Order")
+    OrderLine = apps.get_model("api", "OrderLine")
+    lines = []
+    for order in Order.objects.prefetch_related("products__product__images"):
+        for basket_object in order.products.all():
+            product = basket_object.product
+            images = sorted(product.images.all(), key=lambda image: image.pk)
+            lines.append(OrderLine(
+                order=order,
+                product_id=product.pk,
+                title=product.title,
+                description=product.description,
+                price=product.price,
+                count=basket_object.count,
+                image_src=f"{settings.MEDIA_URL}{images[0].src}" if images else "",
+                image_alt=images[0].alt if images else "",
+            ))
+    OrderLine.objects.bulk_create(lines, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_basketobject_unique_basket_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField(null=True)),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True, max_length=100, null=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('count', models.PositiveIntegerField(default=1)),
+                ('image_src', models.CharField(blank=True, default='', max_length=255)),
+                ('image_alt', models.CharField(blank=True, default='', max_length=100)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='api.order')),
+            ],
+            options={
+                'ordering': ['pk'],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_orderline'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='totalCost',
+            field=models.DecimalField(decimal_places=2, max_digits=12, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    apps.get_model("api", "CatalogVersion").objects.get_or_create(pk = 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveBigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
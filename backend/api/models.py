@@ -1,7 +1,6 @@
 from django.db import models
 from .utils import save_profile_avatar, save_product_image
 from django.contrib.auth.models import User
-import statistics, math
 
 class Profile(models.Model):
     avatar = models.ImageField(null = True, blank=True, upload_to = save_profile_avatar)
@@ -9,10 +8,31 @@ class Profile(models.Model):
     phone = models.IntegerField(null = True, blank = False)
     email = models.EmailField(null = True, blank = False)
     user = models.OneToOneField(User, on_delete = models.CASCADE)
+    avatar_variants = models.JSONField(default = dict, blank = True)
 
     def __str__(self):
         return self.fullName or self.pk
 
+class StoredFile(models.Model):
+    """Файл в хранилище с адресацией по содержимому и число записей, которые на него ссылаются."""
+    name = models.CharField(max_length = 255, unique = True)
+    size = models.PositiveBigIntegerField(default = 0)
+    refs = models.PositiveIntegerField(default = 0)
+    created_at = models.DateTimeField(auto_now_add = True)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.refs})"
+
+class CatalogVersion(models.Model):
+    """
+        Версия каталога — одна строка, общая для всех процессов (воркеры сервера, management-команды).
+        Меняется атомарным UPDATE при любом изменении каталога (см. cache.bump_catalog_version).
+    """
+    value = models.PositiveBigIntegerField(default = 1)
+
+    def __str__(self) -> str:
+        return str(self.value)
+
 class Product(models.Model):
     category = models.IntegerField(default = 1)
     
@@ -27,32 +47,68 @@ class Product(models.Model):
     freeDelivery = models.BooleanField(default = False)
     review_count = models.PositiveIntegerField(default = 0)
     rating = models.PositiveSmallIntegerField(default = 5)
+    rating_sum = models.PositiveIntegerField(default = 0)
+    rating_count = models.PositiveIntegerField(default = 0)
 
     is_sale = models.BooleanField(default = False)
     salePrice = models.DecimalField(max_digits=10, decimal_places=2, null = True)
     dateForm = models.DateField(default = "1111-1-1", auto_now=False, auto_now_add=False)
     dateTo = models.DateField(default = "1111-1-1", auto_now=False, auto_now_add=False)
     is_limit = models.BooleanField(default = False)
+    updated_at = models.DateTimeField(auto_now = True, db_index = True)
+
+    class Meta:
+        # SQLite дописывает rowid в конец каждого индекса, так что сортировки "поле, id"
+        # из пагинации идут по индексу без отдельной сортировки
+        indexes = [
+            # Витрины главной: распродажа и ограниченный тираж листаются по id
+            models.Index(fields = ["id"], condition = models.Q(is_sale = True), name = "product_sale_idx"),
+            models.Index(fields = ["id"], condition = models.Q(is_limit = True), name = "product_limited_idx"),
+            # Сортировки каталога и популярные товары (rating > 3)
+            models.Index(fields = ["price"], name = "product_price_idx"),
+            models.Index(fields = ["rating"], name = "product_rating_idx"),
+            models.Index(fields = ["review_count"], name = "product_review_count_idx"),
+            models.Index(fields = ["date"], name = "product_date_idx"),
+            # Каталог внутри категории
+            models.Index(fields = ["category", "price"], name = "product_category_price_idx"),
+            # Автоматические баннеры: лучшие доступные товары
+            models.Index(
+                fields = ["rating", "review_count"], condition = models.Q(available = True), name = "product_top_available_idx"
+            ),
+        ]
     
     def __str__(self) -> str:
         return self.title or self.pk
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        reviews_count = len(self.reviews.all())
-
-        self.review_count = reviews_count
-        
-        if reviews_count >= 1:
-            self.rating = statistics.mean(
-                [number.valuation for number in self.reviews.all()]
-            ) if self.reviews.count() > 1 else self.reviews.all()[0].valuation
-            print(self.rating)
-        
+
+
+class Banner(models.Model):
+    SOURCE_MANUAL = "manual"
+    SOURCE_AUTO = "auto"
+    SOURCE_CHOICES = [
+        (SOURCE_MANUAL, "manual"),
+        (SOURCE_AUTO, "auto"),
+    ]
+
+    product = models.ForeignKey(Product, on_delete = models.CASCADE, related_name = "banners")
+    position = models.PositiveSmallIntegerField(default = 0)
+    source = models.CharField(max_length = 10, choices = SOURCE_CHOICES, default = SOURCE_MANUAL)
+    is_active = models.BooleanField(default = True)
+    updated_at = models.DateTimeField(auto_now = True)
+
+    class Meta:
+        # "manual" > "auto": баннеры администратора идут первыми
+        ordering = ["-source", "position"]
+
+    def __str__(self) -> str:
+        return f"{self.source} #{self.position}: {self.product}"
 
 class ProductImage(models.Model):
     src = models.ImageField(upload_to=save_product_image)
     alt = models.CharField(max_length = 100)
     product = models.ForeignKey(Product, on_delete = models.CASCADE, related_name = "images")
+    variants = models.JSONField(default = dict, blank = True)
+    # Индекс — для MAX(updated_at) в версии группы "categories" (conditional.py)
+    updated_at = models.DateTimeField(auto_now = True, db_index = True)
 
     def __str__(self):
         return self.src.url
@@ -61,6 +117,7 @@ class Tag(models.Model):
     name = models.CharField(null = False, max_length = 100)
     product = models.ManyToManyField(Product, related_name="tags")
     category = models.ForeignKey("CatalogItem", null = True, on_delete = models.SET_NULL, related_name = "tags")
+    updated_at = models.DateTimeField(auto_now = True)
     def __str__(self) -> str:
         return self.name
     
@@ -92,6 +149,15 @@ class BasketObject(models.Model):
     basket = models.ForeignKey(Basket, on_delete = models.CASCADE, related_name = "basket_objects")
     created_at = models.DateTimeField(auto_now_add = True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields = ["basket", "product"], name = "unique_basket_product"),
+        ]
+        indexes = [
+            # Строки корзины в порядке добавления (get_basket_lines)
+            models.Index(fields = ["basket", "created_at"], name = "basketobject_basket_added_idx"),
+        ]
+
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add = True)
     profile = models.OneToOneField(Profile, on_delete = models.SET_NULL, null = True, related_name = "order")
@@ -103,7 +169,7 @@ class Order(models.Model):
     
     deliveryType = models.CharField(null = True, max_length = 15)
     paymentType = models.CharField(null = True, max_length = 15)
-    totalCost = models.IntegerField(null = True)
+    totalCost = models.DecimalField(null = True, max_digits = 12, decimal_places = 2)
     status = models.CharField(null = True, max_length = 15)
     city = models.CharField(null = True, max_length = 50)
     address = models.CharField(null = True, max_length = 200)
@@ -112,10 +178,28 @@ class Order(models.Model):
     def __str__(self):
         return f"{self.address}"
 
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete = models.CASCADE, related_name = "lines")
+    product_id = models.BigIntegerField(null = True)
+    title = models.CharField(max_length = 100)
+    description = models.TextField(null = True, blank = True, max_length = 10 ** 2)
+    price = models.DecimalField(max_digits = 10, decimal_places = 2)
+    count = models.PositiveIntegerField(default = 1)
+    image_src = models.CharField(max_length = 255, blank = True, default = "")
+    image_alt = models.CharField(max_length = 100, blank = True, default = "")
+
+    class Meta:
+        ordering = ["pk"]
+
+    def __str__(self) -> str:
+        return f"{self.title} x{self.count}"
+
 class CatalogItem(models.Model):
     title = models.CharField(null = False, max_length = 100)
     image = models.OneToOneField(ProductImage, null = True, on_delete = models.SET_NULL, related_name = "item")
+    updated_at = models.DateTimeField(auto_now = True)
 class SubCatigory(models.Model):
     title = models.CharField(null = False, max_length = 100)
     image = models.OneToOneField(ProductImage, null = True, on_delete = models.CASCADE, related_name = "subitem")
     category = models.ForeignKey(CatalogItem, on_delete = models.CASCADE, related_name = "subcategories")
+    updated_at = models.DateTimeField(auto_now = True)
@@ -0,0 +1,70 @@
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, QuerySet, Subquery
+
+from .models import Basket, BasketObject, Order, OrderLine, ProductImage, Profile
+from .pricing import order_total, unit_price
+
+ORDERS_PAGE_SIZE = 20
+
+
+def get_user_orders(user:User) -> QuerySet:
+    """
+        Заказы пользователя: оплаченные привязаны к user, текущий неоплаченный — к профилю.
+        Профиль выбирается подзапросом, а не JOIN: тогда обе ветви OR идут по индексам.
+    """
+    return Order.objects.filter(Q(user = user) | Q(profile__in = Profile.objects.filter(user = user).values("pk")))
+
+
+def with_order_details(orders:QuerySet) -> QuerySet:
+    """
+        План загрузки полной истории: заказы с профилем и снимки строк —
+        два запроса при любом числе заказов и строк, без обращения к каталогу.
+    """
+    return orders.select_related("profile").prefetch_related("lines")
+
+
+def with_order_summary(orders:QuerySet) -> QuerySet:
+    """Облегчённый режим для списка истории: один запрос без товаров."""
+    return orders.only("id", "created_at", "status", "totalCost").annotate(item_count = Count("lines"))
+
+
+def build_order_lines(order:Order, basket:Basket) -> list[OrderLine]:
+    """
+        Снимок строк корзины на момент оформления: название, цена с учётом активной скидки,
+        количество и главная картинка товара читаются одним запросом.
+    """
+    primary_image = ProductImage.objects.filter(product = OuterRef("product")).order_by("pk")
+    rows = BasketObject.objects.filter(basket = basket).order_by("created_at", "pk").values(
+        "product_id", "count",
+        title = F("product__title"),
+        description = F("product__description"),
+        price = unit_price("product__"),
+        image_src = Subquery(primary_image.values("src")[:1]),
+        image_alt = Subquery(primary_image.values("alt")[:1]),
+    )
+    return [
+        OrderLine(
+            order = order,
+            product_id = row["product_id"],
+            title = row["title"],
+            description = row["description"],
+            price = row["price"],
+            count = row["count"],
+            image_src = default_storage.url(row["image_src"]) if row["image_src"] else "",
+            image_alt = row["image_alt"] or "",
+        )
+        for row in rows
+    ]
+
+
+@transaction.atomic
+def snapshot_order(order:Order, basket:Basket) -> None:
+    """Заменяет строки открытого заказа снимком текущей корзины и пересчитывает сумму по снимку (order_total)."""
+    lines = build_order_lines(order, basket)
+    order.lines.all().delete()
+    OrderLine.objects.bulk_create(lines)
+    order.products.set(BasketObject.objects.filter(basket = basket))
+    order.totalCost = order_total(order)
+    order.save(update_fields = ["totalCost"])
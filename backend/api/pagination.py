@@ -0,0 +1,181 @@
+import base64
+import hashlib
+import json
+import math
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+COUNT_CACHE_TIMEOUT = 60
+MAX_PAGE_SIZE = 100
+PAGINATION_PARAMS = ("cursor", "currentPage", "limit")
+
+
+def encode_cursor(ordering:str, value, pk:int) -> str:
+    """Упаковывает позицию последнего элемента страницы в непрозрачную строку."""
+    payload = json.dumps({"o": ordering, "v": value, "id": pk}, cls = DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor:str, ordering:str) -> tuple:
+    """
+        Распаковывает курсор в пару (значение сортировки, id).
+        Курсор, выданный для другой сортировки или повреждённый, даёт ошибку 400.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if position["o"] != ordering:
+            raise ValueError(position["o"])
+        return position["v"], int(position["id"])
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+
+
+class KeysetPage:
+    def __init__(self, object_list:list, next_cursor:str | None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def page_info(self) -> dict:
+        return {"nextCursor": self.next_cursor}
+
+
+class KeysetPaginator:
+    """
+        Пагинация по ключу (сортируемое поле, id) без OFFSET и COUNT(*).
+        Работает и с объектами моделей, и со строками .values() (в них должны быть поле и "id").
+
+        Каждая страница — это один запрос "WHERE (field, id) > (v, id) ORDER BY field, id LIMIT n",
+        поэтому время ответа не зависит от глубины страницы.
+    """
+    def __init__(self, queryset:QuerySet, ordering:str, page_size:int):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.descending = ordering.startswith("-")
+        self.field = ordering.lstrip("-")
+        self.page_size = page_size
+
+    def get_ordering(self) -> tuple:
+        if self.field in ("id", "pk"):
+            return (self.ordering,)
+        return (self.ordering, "-id" if self.descending else "id")
+
+    def get_position_filter(self, value, pk:int) -> Q:
+        lookup = "lt" if self.descending else "gt"
+        if self.field in ("id", "pk"):
+            return Q(**{f"id__{lookup}": pk})
+        return Q(**{f"{self.field}__{lookup}": value}) | Q(**{self.field: value, f"id__{lookup}": pk})
+
+    def get_page_queryset(self, cursor:str | None = None) -> QuerySet:
+        queryset = self.queryset.order_by(*self.get_ordering())
+        if cursor:
+            value, pk = decode_cursor(cursor, self.ordering)
+            queryset = queryset.filter(self.get_position_filter(value, pk))
+        return queryset[:self.page_size + 1]
+
+    def get_offset_queryset(self, page_number:int) -> QuerySet:
+        """Старый контракт currentPage: та же сортировка с тай-брейком по id, но через OFFSET."""
+        offset = (page_number - 1) * self.page_size
+        return self.queryset.order_by(*self.get_ordering())[offset:offset + self.page_size]
+
+    def get_offset_page_info(self, page_number:int, count:int) -> dict:
+        return {"currentPage": page_number, "lastPage": max(math.ceil(count / self.page_size), 1)}
+
+    def page(self, cursor:str | None = None) -> KeysetPage:
+        return self.make_page(list(self.get_page_queryset(cursor)))
+
+    async def apage(self, cursor:str | None = None) -> KeysetPage:
+        return self.make_page([item async for item in self.get_page_queryset(cursor)])
+
+    def make_page(self, object_list:list) -> KeysetPage:
+        next_cursor = None
+        if len(object_list) > self.page_size:
+            object_list = object_list[:self.page_size]
+            last = object_list[-1]
+            if isinstance(last, dict):
+                next_cursor = encode_cursor(self.ordering, last[self.field], last["id"])
+            else:
+                next_cursor = encode_cursor(self.ordering, getattr(last, self.field), last.pk)
+        return KeysetPage(object_list, next_cursor)
+
+
+def get_count_key(queryset:QuerySet) -> str:
+    return "count:" + hashlib.md5(str(queryset.query).encode()).hexdigest()
+
+
+def cached_count(queryset:QuerySet, timeout:int = COUNT_CACHE_TIMEOUT) -> int:
+    """COUNT(*) для queryset, закэшированный по тексту SQL-запроса."""
+    key = get_count_key(queryset)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(key, count, timeout)
+    return count
+
+
+async def acached_count(queryset:QuerySet, timeout:int = COUNT_CACHE_TIMEOUT) -> int:
+    """То же, что cached_count, через асинхронные кэш и ORM."""
+    key = get_count_key(queryset)
+    count = await cache.aget(key)
+    if count is None:
+        count = await queryset.order_by().acount()
+        await cache.aset(key, count, timeout)
+    return count
+
+
+def get_page_number(request:Request) -> int:
+    try:
+        return max(int(request.GET.get("currentPage") or 1), 1)
+    except ValueError:
+        return 1
+
+
+def get_page_size(request:Request, default:int, maximum:int = MAX_PAGE_SIZE) -> int:
+    """Размер страницы из ?limit= в пределах [1, maximum]."""
+    limit = request.GET.get("limit") or ""
+    return min(int(limit), maximum) if limit.isdigit() and int(limit) > 0 else default
+
+
+def is_paginated(request:Request) -> bool:
+    """Запрошена ли постраничная выдача: без этих параметров списки, отдававшиеся целиком, не режутся."""
+    return any(param in request.GET for param in PAGINATION_PARAMS)
+
+
+def paginate_queryset(request:Request, queryset:QuerySet, ordering:str, page_size:int) -> tuple[list, dict]:
+    """
+        Возвращает объекты страницы и метаданные пагинации для ответа.
+
+        Если в запросе есть параметр "cursor", используется пагинация по ключу
+        и в метаданных отдаётся "nextCursor". Иначе сохраняется старый контракт
+        "currentPage"/"lastPage", но число страниц берётся из кэшированного COUNT.
+    """
+    paginator = KeysetPaginator(queryset, ordering, page_size)
+    cursor = request.GET.get("cursor")
+    if cursor is not None:
+        page = paginator.page(cursor or None)
+        return page.object_list, page.page_info
+
+    page_number = get_page_number(request)
+    object_list = list(paginator.get_offset_queryset(page_number))
+    return object_list, paginator.get_offset_page_info(page_number, cached_count(queryset))
+
+
+async def apaginate_queryset(request, queryset:QuerySet, ordering:str, page_size:int) -> tuple[list, dict]:
+    """
+        То же, что paginate_queryset, через асинхронный ORM (для async-представлений).
+        Курсоры и метаданные страниц у обеих версий общие (KeysetPaginator), поэтому совместимы.
+    """
+    paginator = KeysetPaginator(queryset, ordering, page_size)
+    cursor = request.GET.get("cursor")
+    if cursor is not None:
+        page = await paginator.apage(cursor or None)
+        return page.object_list, page.page_info
+
+    page_number = get_page_number(request)
+    object_list = [item async for item in paginator.get_offset_queryset(page_number)]
+    return object_list, paginator.get_offset_page_info(page_number, await acached_count(queryset))
@@ -0,0 +1,63 @@
+import datetime
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, IntegerField, Q, QuerySet, Sum, When
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from .models import Basket, BasketObject, Order
+
+CENTS = Decimal("0.01")
+
+
+def sale_is_active(prefix:str = "", today:datetime.date | None = None) -> Q:
+    """Условие активной скидки: is_sale, задан salePrice и сегодня внутри [dateForm, dateTo]."""
+    today = today or timezone.localdate()
+    return Q(**{
+        f"{prefix}is_sale": True,
+        f"{prefix}salePrice__isnull": False,
+        f"{prefix}dateForm__lte": today,
+        f"{prefix}dateTo__gte": today,
+    })
+
+
+def unit_price(prefix:str = "", today:datetime.date | None = None) -> Case:
+    """Цена за единицу с учётом активной скидки как SQL-выражение."""
+    return Case(
+        When(sale_is_active(prefix, today), then = F(f"{prefix}salePrice")),
+        default = F(f"{prefix}price"),
+        output_field = DecimalField(max_digits = 10, decimal_places = 2),
+    )
+
+
+def cents(expression) -> Round:
+    """Переводит денежное выражение в целые копейки, чтобы суммы считались точно на любой базе."""
+    return Round(expression * 100, output_field = IntegerField())
+
+
+def from_cents(value:int | None) -> Decimal:
+    return (Decimal(value or 0) / 100).quantize(CENTS)
+
+
+def annotate_line_prices(lines:QuerySet, today:datetime.date | None = None) -> QuerySet:
+    """Добавляет строкам корзины unit_price и line_total (в копейках: line_total_cents)."""
+    return lines.annotate(
+        unit_price = unit_price("product__", today),
+        line_total_cents = cents(unit_price("product__", today)) * F("count"),
+    )
+
+
+def basket_total(basket:Basket, today:datetime.date | None = None) -> Decimal:
+    """Сумма корзины одним агрегатным запросом."""
+    total = BasketObject.objects.filter(basket = basket).aggregate(
+        total = Coalesce(Sum(cents(unit_price("product__", today)) * F("count")), 0)
+    )["total"]
+    return from_cents(total)
+
+
+def order_total(order:Order) -> Decimal:
+    """Сумма заказа по снимкам строк одним агрегатным запросом."""
+    total = order.lines.aggregate(
+        total = Coalesce(Sum(cents(F("price")) * F("count")), 0)
+    )["total"]
+    return from_cents(total)
@@ -0,0 +1,135 @@
+from django.core.files.storage import default_storage
+from django.db.models import QuerySet
+from rest_framework import serializers
+
+from .images import variant_urls
+from .models import ProductImage, Tag
+
+PRODUCT_FIELDS = (
+    "id", "category", "price", "count",
+    "date", "title", "description",
+    "freeDelivery", "review_count", "rating",
+)
+SALE_PRODUCT_FIELDS = (
+    "id", "price", "salePrice",
+    "dateForm", "dateTo", "title",
+)
+
+price_field = serializers.DecimalField(max_digits = 10, decimal_places = 2)
+date_field = serializers.DateField()
+
+
+def format_price(value) -> str | None:
+    return None if value is None else price_field.to_representation(value)
+
+
+def format_date(value) -> str | None:
+    return None if value is None else date_field.to_representation(value)
+
+
+def product_rows(queryset:QuerySet, fields:tuple = PRODUCT_FIELDS, extra:tuple = ()) -> QuerySet:
+    """
+        Строки товаров как словари. extra — дополнительные колонки (например, поле
+        сортировки для курсора), которые не попадут в ответ.
+    """
+    return queryset.values(*fields, *[name for name in extra if name not in fields])
+
+
+def rows_by_ids(queryset:QuerySet, product_ids:list, fields:tuple = PRODUCT_FIELDS) -> list[dict]:
+    """Строки товаров по списку id в порядке этого списка."""
+    rows = {row["id"]: row for row in queryset.filter(pk__in = product_ids).values(*fields)}
+    return [rows[pk] for pk in product_ids if pk in rows]
+
+
+def get_images(product_ids:list) -> dict[int, list]:
+    """Картинки всех товаров страницы одним запросом, в формате ProductImageSerializer."""
+    images = {}
+    for image in ProductImage.objects.filter(product_id__in = product_ids).order_by("pk").values(
+        "product_id", "pk", "alt", "src", "variants"
+    ):
+        images.setdefault(image["product_id"], []).append({
+            "pk": image["pk"],
+            "alt": image["alt"],
+            "src": default_storage.url(image["src"]) if image["src"] else None,
+            "variants": variant_urls(image["variants"]),
+        })
+    return images
+
+
+def get_tags(product_ids:list) -> dict[int, list]:
+    """Теги всех товаров страницы одним запросом, в формате TagSerializer."""
+    tags = {}
+    for link in Tag.product.through.objects.filter(product_id__in = product_ids).order_by("tag_id").values(
+        "product_id", "tag_id", "tag__name"
+    ):
+        tags.setdefault(link["product_id"], []).append({"pk": link["tag_id"], "name": link["tag__name"]})
+    return tags
+
+
+def project_products(rows:list[dict]) -> list[dict]:
+    """
+        Карточки товаров в точности как ProductSerializer, но из .values()-строк
+        и двух сгруппированных запросов за картинками и тегами.
+    """
+    product_ids = [row["id"] for row in rows]
+    images = get_images(product_ids)
+    tags = get_tags(product_ids)
+    return [
+        {
+            "id": row["id"],
+            "category": row["category"],
+            "price": format_price(row["price"]),
+            "count": row["count"],
+            "date": format_date(row["date"]),
+            "title": row["title"],
+            "description": row["description"],
+            "freeDelivery": row["freeDelivery"],
+            "review_count": row["review_count"],
+            "rating": row["rating"],
+            "images": images.get(row["id"], []),
+            "tags": tags.get(row["id"], []),
+            "reviews": row["review_count"],
+        }
+        for row in rows
+    ]
+
+
+def project_sale_products(rows:list[dict]) -> list[dict]:
+    """Товары со скидкой в точности как SaleProductSerializer."""
+    images = get_images([row["id"] for row in rows])
+    return [
+        {
+            "id": row["id"],
+            "price": format_price(row["price"]),
+            "salePrice": format_price(row["salePrice"]),
+            "dateForm": format_date(row["dateForm"]),
+            "dateTo": format_date(row["dateTo"]),
+            "title": row["title"],
+            "images": images.get(row["id"], []),
+        }
+        for row in rows
+    ]
+
+
+def basket_rows(lines:QuerySet) -> list[dict]:
+    """
+        Строки корзины (с аннотацией unit_price) как словари товаров
+        с количеством из строки корзины.
+    """
+    rows = []
+    for line in lines.values("count", "unit_price", *[f"product__{name}" for name in PRODUCT_FIELDS]):
+        row = {name: line[f"product__{name}"] for name in PRODUCT_FIELDS}
+        row["line_count"] = line["count"]
+        row["unit_price"] = line["unit_price"]
+        rows.append(row)
+    return rows
+
+
+def project_basket(rows:list[dict]) -> list[dict]:
+    """Корзина в точности как BasketObjectSerializer: карточка товара с count и ценой строки."""
+    products = project_products(rows)
+    for product, row in zip(products, rows):
+        product["count"] = row["line_count"]
+        if row.get("unit_price") is not None:
+            product["price"] = format_price(row["unit_price"])
+    return products
@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import F, Case, When, Value, Count, Sum, Subquery, OuterRef, FloatField, IntegerField
+from django.db.models.functions import Cast, Coalesce, Round
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .models import Product, Review
+
+DEFAULT_RATING = 5
+
+
+def average_rating(rating_sum, rating_count) -> Round:
+    """Средняя оценка, округлённая до целого (4.5 -> 5), а не усечённая целочисленным делением."""
+    return Round(Cast(rating_sum, FloatField()) / rating_count, output_field = IntegerField())
+
+
+def round_rating(rating_sum:int, rating_count:int) -> int:
+    """То же округление в Python (половина вверх, как ROUND в SQL) для массовой генерации данных."""
+    return (2 * rating_sum + rating_count) // (2 * rating_count)
+
+
+def apply_review_delta(product_id:int, count_delta:int, rating_count_delta:int, rating_sum_delta:int) -> int:
+    """
+        Атомарно сдвигает агрегаты отзывов товара одним UPDATE через F-выражения.
+
+        Новый рейтинг считается в том же выражении из старых значений колонок,
+        поэтому параллельные отзывы не теряют обновления.
+    """
+    new_rating_count = F("rating_count") + rating_count_delta
+    new_rating_sum = F("rating_sum") + rating_sum_delta
+    return Product.objects.filter(pk = product_id).update(
+        review_count = F("review_count") + count_delta,
+        rating_count = new_rating_count,
+        rating_sum = new_rating_sum,
+        rating = Case(
+            When(rating_count__gt = -rating_count_delta, then = average_rating(new_rating_sum, new_rating_count)),
+            default = Value(DEFAULT_RATING),
+        ),
+    )
+
+
+def review_delta(valuation, sign:int = 1) -> tuple:
+    """Вклад одного отзыва в (review_count, rating_count, rating_sum)."""
+    if valuation is None:
+        return sign, 0, 0
+    return sign, sign, sign * valuation
+
+
+def recompute_products(queryset) -> int:
+    """
+        Пересчитывает агрегаты отзывов для товаров из queryset одним UPDATE
+        с коррелированными подзапросами. Используется для заполнения и починки дрейфа.
+    """
+    reviews = Review.objects.filter(product = OuterRef("pk")).order_by().values("product")
+    rated = reviews.filter(valuation__isnull = False)
+    review_count = Coalesce(
+        Subquery(reviews.annotate(total = Count("pk")).values("total"), output_field = IntegerField()), 0
+    )
+    rating_count = Coalesce(
+        Subquery(rated.annotate(total = Count("pk")).values("total"), output_field = IntegerField()), 0
+    )
+    rating_sum = Coalesce(
+        Subquery(rated.annotate(total = Sum("valuation")).values("total"), output_field = IntegerField()), 0
+    )
+    return queryset.update(
+        updated_at = timezone.now(),
+        review_count = review_count,
+        rating_count = rating_count,
+        rating_sum = rating_sum,
+        rating = Case(
+            When(GreaterThan(rating_count, 0), then = average_rating(rating_sum, rating_count)),
+            default = Value(DEFAULT_RATING),
+        ),
+    )
+
+
+@transaction.atomic
+def move_review(old_product_id, old_valuation, new_product_id, new_valuation) -> None:
+    """Переносит вклад изменённого отзыва со старых значений на новые."""
+    if old_product_id == new_product_id:
+        _, old_rated, old_sum = review_delta(old_valuation)
+        _, new_rated, new_sum = review_delta(new_valuation)
+        if (old_rated, old_sum) != (new_rated, new_sum):
+            apply_review_delta(new_product_id, 0, new_rated - old_rated, new_sum - old_sum)
+        return
+    apply_review_delta(old_product_id, *review_delta(old_valuation, sign = -1))
+    apply_review_delta(new_product_id, *review_delta(new_valuation))
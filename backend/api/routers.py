@@ -0,0 +1,37 @@
+from django.db import connections
+
+from .models import (
+    Banner, CatalogItem, Product, ProductImage, Review, SpecificationsProduct, SubCatigory, Tag,
+)
+
+REPLICA_DATABASE = "replica"
+# Модели витрины каталога, которые можно читать с реплики
+REPLICA_MODELS = (Banner, CatalogItem, Product, ProductImage, Review, SpecificationsProduct, SubCatigory, Tag)
+
+
+class CatalogReplicaRouter:
+    """
+        Чтения моделей каталога отправляет в соединение replica, всё остальное — в default.
+
+        Внутри транзакции на default чтения остаются на default, чтобы видеть свои же
+        незакоммиченные изменения. Миграции применяются только к default: реплика —
+        это тот же файл (или его копия), открытый только для чтения.
+    """
+    def db_for_read(self, model, **hints) -> str | None:
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if model not in REPLICA_MODELS or REPLICA_DATABASE not in connections.settings:
+            return None
+        if connections["default"].in_atomic_block:
+            return "default"
+        return REPLICA_DATABASE
+
+    def db_for_write(self, model, **hints) -> str:
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        return True
+
+    def allow_migrate(self, db:str, app_label:str, model_name:str | None = None, **hints) -> bool:
+        return db == "default"
@@ -0,0 +1,123 @@
+import re
+
+from django.db import connection, transaction
+from django.db.models import FloatField, QuerySet
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+FTS_TABLE = "api_product_fts"
+FTS_COLUMNS = ("title", "description", "fullDescription", "tags", "specifications")
+REBUILD_BATCH_SIZE = 1000
+RANK_FIELD = "search_rank"
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_available() -> bool:
+    """Полнотекстовый индекс есть только у SQLite; на других базах работает icontains."""
+    return connection.vendor == "sqlite"
+
+
+def build_match_query(text:str) -> str:
+    """
+        Превращает пользовательский ввод в безопасное FTS5-выражение:
+        каждое слово ищется по префиксу, все слова обязательны.
+    """
+    return " ".join(f'"{word}"*' for word in WORD_RE.findall(text))
+
+
+def search_queryset(queryset:QuerySet, text:str) -> QuerySet:
+    """Оставляет в queryset только товары, подходящие под поисковый запрос."""
+    match = build_match_query(text)
+    if not match:
+        return queryset
+    if not is_available():
+        return queryset.filter(title__icontains = text)
+    return queryset.filter(
+        pk__in = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+    )
+
+
+def annotate_rank(queryset:QuerySet, text:str) -> QuerySet:
+    """
+        Добавляет аннотацию search_rank (BM25 с весами колонок, меньше — релевантнее).
+        Подзапрос ссылается на таблицу товаров по имени, поэтому такой queryset
+        нельзя вкладывать в другой запрос по товарам.
+    """
+    match = build_match_query(text)
+    if not match or not is_available():
+        return queryset.annotate(**{RANK_FIELD: RawSQL("0", [], output_field = FloatField())})
+    return queryset.annotate(**{RANK_FIELD: RawSQL(
+        f"SELECT bm25({FTS_TABLE}, 10.0, 2.0, 1.0, 3.0, 1.0) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND rowid = {Product._meta.db_table}.id",
+        [match],
+        output_field = FloatField(),
+    )})
+
+
+def get_documents(product_ids) -> list[tuple]:
+    """Собирает строки индекса (rowid, колонки FTS_COLUMNS) для товаров."""
+    products = Product.objects.filter(pk__in = product_ids).prefetch_related("tags", "specifications")
+    return [
+        (
+            product.pk,
+            product.title or "",
+            product.description or "",
+            product.fullDescription or "",
+            " ".join(tag.name for tag in product.tags.all()),
+            " ".join(spec.value or "" for spec in product.specifications.all()),
+        )
+        for product in products
+    ]
+
+
+def remove_products(product_ids) -> None:
+    if not is_available() or not product_ids:
+        return
+    product_ids = list(product_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(product_ids))})",
+            product_ids,
+        )
+
+
+def index_products(product_ids) -> None:
+    """Переиндексирует товары: удаляет старые строки и вставляет актуальные."""
+    if not is_available():
+        return
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    documents = get_documents(product_ids)
+    with transaction.atomic():
+        remove_products(product_ids)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s)",
+                documents,
+            )
+
+
+def rebuild_index(batch_size:int = REBUILD_BATCH_SIZE) -> int:
+    """Полностью перестраивает индекс пакетами по batch_size товаров."""
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    indexed = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            Product.objects.filter(pk__gt = last_pk).order_by("pk").values_list("pk", flat = True)[:batch_size]
+        )
+        if not batch:
+            break
+        index_products(batch)
+        indexed += len(batch)
+        last_pk = batch[-1]
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return indexed
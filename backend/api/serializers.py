@@ -2,7 +2,8 @@ from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.conf import settings
-from .models import Profile, Product, Order, CatalogItem, SubCatigory, ProductImage,Basket, Tag, Review, SpecificationsProduct, BasketObject
+from .images import variant_urls
+from .models import Profile, Product, Order, OrderLine, CatalogItem, SubCatigory, ProductImage,Basket, Tag, Review, SpecificationsProduct, BasketObject
 
 class UserSerializer(ModelSerializer):
     class Meta:
@@ -15,9 +16,14 @@ class ProfileSerializer(ModelSerializer):
         fields = ["avatar", "fullName", "phone", "email", "user"]
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
-        fields = ["pk", "alt", "src"]
+        fields = ["pk", "alt", "src", "variants"]
+
+    def get_variants(self, instance:ProductImage) -> dict:
+        return variant_urls(instance.variants)
 
 class TagSerializer(ModelSerializer):
     class Meta:
@@ -89,6 +95,9 @@ class BasketObjectSerializer(ModelSerializer):
     def to_representation(self, instance):
         data = super().to_representation(instance)
         data["product"]["count"] = instance.count
+        unit_price = getattr(instance, "unit_price", None)
+        if unit_price is not None:
+            data["product"]["price"] = self.fields["product"].fields["price"].to_representation(unit_price)
         new_data = data["product"]
         return new_data
 
@@ -107,9 +116,22 @@ class OrderProfileSerializer(ModelSerializer):
 
         ]
 
+class OrderLineSerializer(ModelSerializer):
+    id = serializers.IntegerField(source = "product_id")
+    images = serializers.SerializerMethodField()
+    class Meta:
+        model = OrderLine
+        fields = [
+            "id", "title", "description", "price", "count", "images"
+        ]
+    def get_images(self, instance:OrderLine) -> list:
+        if not instance.image_src:
+            return []
+        return [{"src": instance.image_src, "alt": instance.image_alt}]
+
 class OrderSerializer(ModelSerializer):
     profile = OrderProfileSerializer()
-    products = BasketObjectSerializer(many = True)
+    products = OrderLineSerializer(source = "lines", many = True)
     class Meta:
         model = Order
         fields = [
@@ -118,11 +140,14 @@ class OrderSerializer(ModelSerializer):
             "totalCost", "status", "city",
             "address","products", "profile"
         ]
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        print(data)
 
-        return data 
+class OrderSummarySerializer(ModelSerializer):
+    itemCount = serializers.IntegerField(source = "item_count")
+    class Meta:
+        model = Order
+        fields = [
+            "id", "created_at", "status", "totalCost", "itemCount"
+        ]
     
 class SubCatigorySerializer(ModelSerializer):
     class Meta:
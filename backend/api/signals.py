@@ -0,0 +1,244 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Banner, Product, ProductImage, Profile, Tag, CatalogItem, SubCatigory, Review, SpecificationsProduct
+from .ratings import apply_review_delta, review_delta, move_review
+from . import search
+from .catalog_index import catalog_index
+from .images import IMAGE_FIELDS, needs_variants, schedule_variants
+from . import metrics
+
+CATALOG_MODELS = (Banner, Product, ProductImage, Tag, CatalogItem, SubCatigory, Review)
+UPDATED_AT_MODELS = (Banner, Product, ProductImage, Tag, CatalogItem, SubCatigory)
+
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs) -> None:
+    """Подсчёт запросов и времени в базе по эндпоинтам (см. metrics.py)."""
+    metrics.install(connection)
+
+
+def fill_updated_at_on_raw_save(sender, instance, raw:bool = False, **kwargs) -> None:
+    """
+        loaddata сохраняет объекты как есть (raw) и не вызывает auto_now, а default рядом с auto_now
+        Django не разрешает (fields.E160). Дампы без updated_at получают текущее время.
+    """
+    if raw and instance.updated_at is None:
+        instance.updated_at = timezone.now()
+
+
+for model in UPDATED_AT_MODELS:
+    pre_save.connect(fill_updated_at_on_raw_save, sender = model, dispatch_uid = f"fill_updated_at_{model.__name__}")
+
+
+@receiver(pre_save, sender = Review)
+def remember_previous_review(sender, instance:Review, **kwargs) -> None:
+    """Запоминает старые товар и оценку отзыва перед редактированием."""
+    instance._previous_review = None
+    if instance.pk is not None:
+        instance._previous_review = Review.objects.filter(pk = instance.pk).values_list(
+            "product_id", "valuation"
+        ).first()
+
+
+@receiver(post_save, sender = Review)
+def update_rating_on_review_save(sender, instance:Review, created:bool, **kwargs) -> None:
+    """Инкрементально обновляет рейтинг товара при создании или изменении отзыва."""
+    previous = getattr(instance, "_previous_review", None)
+    if created or previous is None:
+        apply_review_delta(instance.product_id, *review_delta(instance.valuation))
+    else:
+        move_review(*previous, instance.product_id, instance.valuation)
+
+
+@receiver(post_delete, sender = Review)
+def update_rating_on_review_delete(sender, instance:Review, **kwargs) -> None:
+    """Вычитает вклад удалённого отзыва из агрегатов товара."""
+    apply_review_delta(instance.product_id, *review_delta(instance.valuation, sign = -1))
+
+
+# Подключены раньше invalidate_catalog, чтобы updated_at товаров был сдвинут до смены версии каталога.
+def touch_products(product_ids) -> None:
+    """Сдвигает updated_at товаров, чьи связанные данные изменились (картинки, теги, отзывы, характеристики)."""
+    product_ids = set(product_ids)
+    if product_ids:
+        Product.objects.filter(pk__in = product_ids).update(updated_at = timezone.now())
+
+
+@receiver(post_save, sender = ProductImage)
+@receiver(post_delete, sender = ProductImage)
+@receiver(post_save, sender = Review)
+@receiver(post_delete, sender = Review)
+@receiver(post_save, sender = Tag)
+@receiver(post_delete, sender = Tag)
+@receiver(m2m_changed, sender = Tag.product.through)
+def touch_changed_products(sender, instance, **kwargs) -> None:
+    if kwargs.get("action", "post_").startswith("pre_"):
+        return
+    if sender is Tag.product.through and not isinstance(instance, Tag):
+        touch_products([instance.pk])
+        return
+    touch_products(changed_product_ids(sender, instance, **kwargs))
+
+
+@receiver(pre_delete, sender = SpecificationsProduct)
+def remember_specification_products(sender, instance:SpecificationsProduct, **kwargs) -> None:
+    instance._deleted_product_ids = list(instance.products.values_list("pk", flat = True))
+
+
+@receiver(post_save, sender = SpecificationsProduct)
+@receiver(post_delete, sender = SpecificationsProduct)
+@receiver(m2m_changed, sender = SpecificationsProduct.products.through)
+def touch_specification_products(sender, instance, **kwargs) -> None:
+    action = kwargs.get("action")
+    if action is None:
+        if kwargs.get("signal") is post_delete:
+            touch_products(getattr(instance, "_deleted_product_ids", []))
+        else:
+            touch_products(instance.products.values_list("pk", flat = True))
+    elif action.startswith("pre_"):
+        return
+    elif isinstance(instance, Product):
+        touch_products([instance.pk])
+    elif action == "post_clear":
+        touch_products(getattr(instance, "_cleared_product_ids", []))
+    else:
+        touch_products(kwargs.get("pk_set") or [])
+
+
+def invalidate_catalog(sender, **kwargs) -> None:
+    """Сбрасывает кэш ответов каталога при любом изменении его данных."""
+    if kwargs.get("action", "post_").startswith("post_"):
+        bump_catalog_version()
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(invalidate_catalog, sender = model, dispatch_uid = f"invalidate_catalog_save_{model.__name__}")
+    post_delete.connect(invalidate_catalog, sender = model, dispatch_uid = f"invalidate_catalog_delete_{model.__name__}")
+m2m_changed.connect(invalidate_catalog, sender = Tag.product.through, dispatch_uid = "invalidate_catalog_tags")
+
+
+@receiver(post_save, sender = Product)
+def index_product(sender, instance:Product, **kwargs) -> None:
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender = Product)
+def unindex_product(sender, instance:Product, **kwargs) -> None:
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender = Tag)
+@receiver(post_save, sender = SpecificationsProduct)
+def reindex_related_products(sender, instance, **kwargs) -> None:
+    """Переименование тега или значения характеристики меняет документы связанных товаров."""
+    related = instance.product if sender is Tag else instance.products
+    search.index_products(related.values_list("pk", flat = True))
+
+
+@receiver(post_delete, sender = Tag)
+@receiver(post_delete, sender = SpecificationsProduct)
+def reindex_products_of_deleted(sender, instance, **kwargs) -> None:
+    """Связи удалённого тега или характеристики уже удалены; товары запомнены в pre_delete."""
+    search.index_products(getattr(instance, "_deleted_product_ids", []))
+
+
+@receiver(m2m_changed, sender = Tag.product.through)
+@receiver(m2m_changed, sender = SpecificationsProduct.products.through)
+def reindex_on_m2m_change(sender, instance, action:str, reverse:bool, model, pk_set, **kwargs) -> None:
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+    if isinstance(instance, Product):
+        search.index_products([instance.pk])
+    elif action == "pre_clear":
+        related = instance.product if sender is Tag.product.through else instance.products
+        instance._cleared_product_ids = list(related.values_list("pk", flat = True))
+    elif action == "post_clear":
+        search.index_products(getattr(instance, "_cleared_product_ids", []))
+    else:
+        search.index_products(pk_set or [])
+
+
+def changed_product_ids(sender, instance, **kwargs) -> list:
+    """id товаров, чьи данные в каталоге затронуло изменение instance."""
+    if isinstance(instance, Product):
+        return [instance.pk]
+    if isinstance(instance, ProductImage):
+        return [instance.product_id]
+    if isinstance(instance, Review):
+        product_ids = [instance.product_id]
+        previous = getattr(instance, "_previous_review", None)
+        if previous:
+            product_ids.append(previous[0])
+        return product_ids
+    if isinstance(instance, Tag) and kwargs.get("action") == "post_clear":
+        return getattr(instance, "_cleared_product_ids", [])
+    if isinstance(instance, Tag) and "action" in kwargs:
+        return list(kwargs.get("pk_set") or [])
+    if isinstance(instance, Tag) and kwargs.get("signal") is post_delete:
+        return getattr(instance, "_deleted_product_ids", [])
+    if isinstance(instance, Tag):
+        return list(instance.product.values_list("pk", flat = True))
+    return []
+
+
+def refresh_catalog_index(sender, instance, **kwargs) -> None:
+    """Точечно обновляет снимок каталога в памяти после изменения версии каталога."""
+    if catalog_index is None:
+        return
+    if kwargs.get("action", "post_").startswith("pre_"):
+        return
+    if sender is Tag.product.through and not isinstance(instance, Tag):
+        catalog_index.on_catalog_change([instance.pk])
+        return
+    catalog_index.on_catalog_change(changed_product_ids(sender, instance, **kwargs))
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(refresh_catalog_index, sender = model, dispatch_uid = f"refresh_catalog_index_save_{model.__name__}")
+    post_delete.connect(refresh_catalog_index, sender = model, dispatch_uid = f"refresh_catalog_index_delete_{model.__name__}")
+m2m_changed.connect(refresh_catalog_index, sender = Tag.product.through, dispatch_uid = "refresh_catalog_index_tags")
+
+
+@receiver(pre_delete, sender = Tag)
+def remember_tag_products(sender, instance:Tag, **kwargs) -> None:
+    """Связи удаляемого тега исчезают без m2m_changed, поэтому товары запоминаются заранее."""
+    instance._deleted_product_ids = list(instance.product.values_list("pk", flat = True))
+
+
+@receiver(post_save, sender = ProductImage)
+@receiver(post_save, sender = Profile)
+def queue_image_variants(sender, instance, **kwargs) -> None:
+    """Новая или заменённая картинка отправляется в пул воркеров за превью и WebP-вариантами."""
+    field, variants_field = IMAGE_FIELDS[sender]
+    if needs_variants(getattr(instance, field).name, getattr(instance, variants_field)):
+        schedule_variants(sender, instance.pk)
+
+
+@receiver(pre_save, sender = ProductImage)
+@receiver(pre_save, sender = Profile)
+def remember_previous_file(sender, instance, **kwargs) -> None:
+    field, variants_field = IMAGE_FIELDS[sender]
+    instance._previous_file = None
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and field not in update_fields:
+        return
+    if instance.pk is not None:
+        instance._previous_file = sender.objects.filter(pk = instance.pk).values_list(field, flat = True).first()
+
+
+@receiver(post_save, sender = ProductImage)
+@receiver(post_save, sender = Profile)
+@receiver(post_delete, sender = ProductImage)
+@receiver(post_delete, sender = Profile)
+def release_file(sender, instance, **kwargs) -> None:
+    """Снимает ссылку с заменённого или удалённого файла в хранилище (см. storage.py)."""
+    field, variants_field = IMAGE_FIELDS[sender]
+    current = getattr(instance, field)
+    if kwargs.get("signal") is post_delete:
+        current.storage.delete(current.name)
+    elif getattr(instance, "_previous_file", None) and instance._previous_file != current.name:
+        current.storage.delete(instance._previous_file)
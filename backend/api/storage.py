@@ -0,0 +1,105 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+CONTENT_ROOT = "content"
+INCOMING_DIR = ".incoming"
+MEDIA_CHUNK_SIZE = getattr(settings, "MEDIA_CHUNK_SIZE", 64 * 1024)
+
+
+def content_name(digest:str, extension:str) -> str:
+    """content/ab/cd/abcd…ef.jpg — два уровня каталогов, чтобы не держать тысячи файлов в одном."""
+    return posixpath.join(CONTENT_ROOT, digest[:2], digest[2:4], digest + extension.lower())
+
+
+def is_content_name(name:str) -> bool:
+    return name.startswith(CONTENT_ROOT + "/")
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+        Файловое хранилище, в котором имя файла — SHA-256 его содержимого.
+
+        Каталог и имя, предложенные upload_to, отбрасываются (остаётся только расширение),
+        поэтому одинаковые загрузки хранятся один раз. Сколько записей ссылается на файл,
+        учитывается в StoredFile.refs: save() увеличивает счётчик, delete() уменьшает.
+        Сами файлы с нулевым счётчиком удаляет команда collect_media_garbage,
+        чтобы не гоняться с параллельной загрузкой тех же байтов.
+
+        Загрузка пишется во временный файл по частям с одновременным подсчётом хэша
+        и затем атомарно переносится на место, весь файл в памяти не держится.
+    """
+    def get_available_name(self, name:str, max_length:int | None = None) -> str:
+        return name
+
+    def write_incoming(self, content) -> tuple[str, str, int]:
+        directory = self.path(INCOMING_DIR)
+        os.makedirs(directory, exist_ok = True)
+        digest = hashlib.sha256()
+        size = 0
+        descriptor, temporary = tempfile.mkstemp(dir = directory)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks(MEDIA_CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    size += len(chunk)
+                    file.write(chunk)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        return temporary, digest.hexdigest(), size
+
+    def _save(self, name:str, content) -> str:
+        """
+            Ссылка добавляется в одной транзакции с проверкой файла: collect_media_garbage удаляет файл
+            под блокировкой той же строки StoredFile, поэтому не может убрать его между проверкой и ссылкой.
+            Повторная загрузка тех же байтов обновляет mtime файла, продлевая grace-период сборщика.
+        """
+        temporary, digest, size = self.write_incoming(content)
+        name = content_name(digest, posixpath.splitext(name)[1])
+        path = self.path(name)
+        with transaction.atomic():
+            self.add_reference(name, size)
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(path), exist_ok = True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary, self.file_permissions_mode)
+                os.replace(temporary, path)
+            else:
+                os.remove(temporary)
+        return name
+
+    def add_reference(self, name:str, size:int) -> None:
+        from .models import StoredFile
+
+        if StoredFile.objects.filter(name = name).update(refs = F("refs") + 1):
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name = name, size = size, refs = 1)
+        except IntegrityError:
+            StoredFile.objects.filter(name = name).update(refs = F("refs") + 1)
+
+    def delete(self, name:str) -> None:
+        """
+            Снимает одну ссылку с файла. Физически ничего не удаляется: файлы без ссылок
+            (и файлы, загруженные до этого хранилища) убирает collect_media_garbage.
+        """
+        from .models import StoredFile
+
+        if name and is_content_name(name):
+            StoredFile.objects.filter(name = name, refs__gt = 0).update(refs = F("refs") - 1)
@@ -1,3 +1,1272 @@
-from django.test import TestCase
+import copy
+import gc
+import gzip
+import importlib
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, connections, transaction
+from django.db.utils import load_backend
+from django.db.models import F
+from django.http import Http404, HttpResponse, QueryDict
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import async_views, images, media, metrics, urls as api_urls
+from .banners import rebuild_auto_banners
+from .basket import BASKET_COOKIE, get_basket_lines
+from .benchmark.data import CatalogGenerator, Scale, clear, describe_dataset, generated_products, has_generated_data
+from .cache import get_catalog_version
+from .catalog import CatalogQuery
+from .catalog_index import CatalogIndex
+from .facets import FACET_QUERIES, compute_facets
+from .models import (
+    Banner, Basket, BasketObject, CatalogItem, CatalogVersion, Order, OrderLine, Product, ProductImage, Profile, Review,
+    SpecificationsProduct, StoredFile, SubCatigory, Tag,
+)
+from .management.commands import collect_media_garbage
+from .middleware import GZIP_MIN_LENGTH, JSONGZipMiddleware
+from .orders import ORDERS_PAGE_SIZE, get_user_orders
+from .pagination import apaginate_queryset, decode_cursor, encode_cursor, paginate_queryset
+from .pricing import basket_total, order_total
+from .projections import (
+    SALE_PRODUCT_FIELDS, basket_rows, product_rows, project_basket, project_products, project_sale_products,
+)
+from .ratings import recompute_products
+from .search import RANK_FIELD, annotate_rank, search_queryset
+from .serializers import BasketObjectSerializer, ProductImageSerializer, ProductSerializer, SaleProductSerializer
+
+# Таблицы, которые растут вместе с каталогом и заказами. Справочники (категории, теги,
+# баннеры) маленькие, их полный просмотр допустим.
+HOT_TABLES = (
+    "api_product", "api_productimage", "api_tag_product", "api_review",
+    "api_basketobject", "api_order", "api_orderline",
+)
+FULL_SCAN_RE = re.compile(r"^SCAN (\w+)$")
+
+
+def query_plan(sql:str) -> list[str]:
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class FixtureTests(TestCase):
+    def test_loaddata_fixtures(self):
+        """fixtures.json из репозитория загружается на актуальную схему; недостающий updated_at заполняется."""
+        call_command("loaddata", settings.BASE_DIR / "fixtures.json", verbosity = 0)
+        self.assertEqual(Product.objects.count(), 6)
+        self.assertFalse(Product.objects.filter(updated_at__isnull = True).exists())
+        self.assertEqual(self.client.get(reverse("api:product_id", kwargs = {"pk": Product.objects.first().pk})).status_code, 200)
+
+
+class QueryPlanTests(TestCase):
+    """
+        EXPLAIN QUERY PLAN для запросов, которые реально выполняют эндпоинты каталога, корзины и заказов.
+        Падает, если запрос читает большую таблицу целиком или сортирует страницу каталога
+        во временном B-дереве вместо прохода по индексу.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = CatalogItem.objects.create(title = "Phones")
+        cls.tag = Tag.objects.create(name = "new", category = cls.category)
+        cls.products = []
+        for number in range(6):
+            product = Product.objects.create(
+                category = cls.category.pk,
+                price = Decimal(100 + number * 50),
+                title = f"Phone {number}",
+                description = "phone",
+                rating = number % 5 + 1,
+                review_count = number,
+                available = number != 5,
+                freeDelivery = number % 2 == 0,
+                is_sale = number in (1, 2),
+                salePrice = Decimal(90),
+                is_limit = number in (3, 4),
+            )
+            ProductImage.objects.create(product = product, src = f"products/{number}.jpg", alt = "photo")
+            cls.products.append(product)
+        cls.tag.product.add(*cls.products[:3])
+
+        cls.user = User.objects.create_user(username = "buyer", password = "secret-password")
+        basket = Basket.objects.create(user = cls.user)
+        for product in cls.products[:2]:
+            BasketObject.objects.create(basket = basket, product = product, count = 1)
+        Order.objects.create(user = cls.user, totalCost = 0)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def get_plans(self, url:str) -> list[tuple[str, list[str]]]:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return [
+            (query["sql"], query_plan(query["sql"]))
+            for query in queries.captured_queries
+            if query["sql"].startswith("SELECT")
+        ]
+
+    def assert_no_full_scans(self, url:str) -> list[tuple[str, list[str]]]:
+        plans = self.get_plans(url)
+        for sql, plan in plans:
+            for step in plan:
+                match = FULL_SCAN_RE.match(step)
+                if match and match.group(1) in HOT_TABLES:
+                    self.fail(f"{url}: полный просмотр {match.group(1)}\n{sql}\n" + "\n".join(plan))
+        return plans
+
+    def assert_page_sorted_by_index(self, url:str) -> None:
+        """Запрос страницы товаров (SELECT … FROM api_product … LIMIT) обходится без сортировки."""
+        page_queries = [
+            (sql, plan) for sql, plan in self.assert_no_full_scans(url)
+            if 'FROM "api_product"' in sql and "ORDER BY" in sql and "LIMIT" in sql
+        ]
+        self.assertTrue(page_queries, url)
+        for sql, plan in page_queries:
+            self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan, f"{url}\n{sql}\n" + "\n".join(plan))
+
+    def test_home_feeds(self):
+        for url in ("/api/sales/", "/api/products/popular", "/api/products/limited"):
+            with self.subTest(url = url):
+                self.assert_page_sorted_by_index(url)
+        self.assert_no_full_scans("/api/banners")
+
+    def test_catalog_sorting(self):
+        for query in (
+            "",
+            "?sort=price&sortType=inc",
+            "?sort=rating",
+            "?sort=rating&sortType=inc",
+            "?sort=reviews",
+            "?sort=date&sortType=inc",
+            "?currentPage=2&limit=2",
+            "?filter[available]=true&sort=reviews",
+        ):
+            with self.subTest(query = query):
+                self.assert_page_sorted_by_index(f"/api/catalog{query}")
+
+    def test_catalog_filters(self):
+        for query in (
+            f"?category={self.category.pk}",
+            f"?category={self.category.pk}&sort=date",
+            "?filter[freeDelivery]=true&filter[available]=true&filter[minPrice]=120&filter[maxPrice]=300",
+            f"?tags[]={self.tag.pk}&sort=reviews",
+            "?filter[name]=phone",
+        ):
+            with self.subTest(query = query):
+                self.assert_no_full_scans(f"/api/catalog{query}")
+
+    def test_product_detail(self):
+        self.assert_no_full_scans(f"/api/product/{self.products[0].pk}")
+
+    def test_basket_and_orders(self):
+        self.client.force_login(self.user)
+        plans = self.assert_no_full_scans("/api/basket")
+        for sql, plan in plans:
+            if 'FROM "api_basketobject"' in sql:
+                self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan, sql)
+        self.assert_no_full_scans("/api/orders")
+
+
+# Бюджеты числа запросов по эндпоинтам. Обновить после осознанного изменения:
+#   QUERY_BUDGETS_UPDATE=1 python manage.py test api.tests.QueryCountTests
+QUERY_BUDGETS_PATH = Path(__file__).with_name("query_budgets.json")
+SMALL_DATASET = 2
+LARGE_DATASET = 8
+
+
+def form_json(payload:dict) -> dict:
+    """Тело, которое ждёт get_data_from_request: JSON целиком в имени поля формы."""
+    return {"data": json.dumps(payload), "content_type": "application/x-www-form-urlencoded"}
+
+
+def png_upload(name:str = "avatar.png") -> SimpleUploadedFile:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type = "image/png")
+
+
+class Dataset:
+    """Каталог, пользователи, корзина и заказы, у которых всё, что может расти, растёт вместе с size."""
+    def __init__(self, size:int):
+        self.size = size
+        self.buyer = User.objects.create_user(username = "buyer", password = "secret-password")
+        self.profile = Profile.objects.create(user = self.buyer, fullName = "Buyer", email = "buyer@example.com")
+        self.staff = User.objects.create_user(username = "staff", password = "secret-password", is_staff = True)
+        Profile.objects.create(user = self.staff, fullName = "Staff")
+        reviewers = [
+            Profile.objects.create(user = User.objects.create_user(username = f"reviewer{number}"))
+            for number in range(size)
+        ]
+
+        self.products = []
+        for number in range(size):
+            product = Product.objects.create(
+                category = 1,
+                price = Decimal(100 + number),
+                title = f"Phone {number}",
+                description = "phone",
+                fullDescription = "phone " * 10,
+                rating = 4 + number % 2,
+                is_sale = number % 2 == 0,
+                salePrice = Decimal(90),
+                dateForm = "2000-01-01",
+                dateTo = "2999-01-01",
+                is_limit = number % 2 == 1,
+            )
+            for image in range(2):
+                ProductImage.objects.create(product = product, src = f"products/{number}-{image}.jpg", alt = "photo")
+            for reviewer in reviewers:
+                Review.objects.create(autor = reviewer, product = product, text = "ok", valuation = 5)
+            specification = SpecificationsProduct.objects.create(name = f"spec {number}", value = "1")
+            specification.products.add(product)
+            Banner.objects.create(product = product, position = number)
+            self.products.append(product)
+        self.product = self.products[0]
+
+        for number in range(size):
+            category = CatalogItem.objects.create(
+                title = f"Category {number}",
+                image = ProductImage.objects.create(product = self.product, src = f"categories/{number}.jpg", alt = "c"),
+            )
+            for sub in range(2):
+                SubCatigory.objects.create(
+                    title = f"Sub {number}-{sub}",
+                    category = category,
+                    image = ProductImage.objects.create(product = self.product, src = f"sub/{number}-{sub}.jpg", alt = "s"),
+                )
+            Tag.objects.create(name = f"tag {number}", category = category).product.add(*self.products)
+        self.category = CatalogItem.objects.order_by("pk").first()
+
+        basket = Basket.objects.create(user = self.buyer)
+        lines = [BasketObject.objects.create(basket = basket, product = product, count = 2) for product in self.products]
+        for number in range(size):
+            order = Order.objects.create(user = self.buyer, status = "accepted", totalCost = Decimal(200))
+            order.products.set(lines)
+            OrderLine.objects.bulk_create(
+                OrderLine(order = order, product_id = product.pk, title = product.title, price = product.price, count = 2)
+                for product in self.products
+            )
+        self.order = Order.objects.create(profile = self.profile, totalCost = Decimal(0))
+
+
+ORDER_FORM = {
+    "fullName": "Buyer", "phone": "79990000000", "email": "buyer@example.com", "deliveryType": "free",
+    "city": "Moscow", "address": "Red Square 1", "paymentType": "online", "status": "created",
+}
+
+# name: (имя URL в api/urls.py, кто залогинен, ожидаемый статус, запрос)
+ROUTE_CASES = {
+    "register": ("register", None, 200, lambda client, data: client.post(
+        reverse("api:register"), **form_json({"name": "New", "username": "newcomer", "password": "secret-password"})
+    )),
+    "login": ("login", None, 200, lambda client, data: client.post(
+        reverse("api:login"), **form_json({"username": "buyer", "password": "secret-password"})
+    )),
+    "logout": ("logout", "buyer", 200, lambda client, data: client.post(reverse("api:logout"))),
+    "profile GET": ("profile", "buyer", 200, lambda client, data: client.get(reverse("api:profile"))),
+    "profile POST": ("profile", "buyer", 200, lambda client, data: client.post(
+        reverse("api:profile"),
+        {"fullName": "Buyer Two", "email": "two@example.com", "phone": "7999", "avatar": None},
+        content_type = "application/json",
+    )),
+    "avatar POST": ("avatar", "buyer", 200, lambda client, data: client.post(
+        reverse("api:avatar"), {"avatar": png_upload()}
+    )),
+    "password POST": ("password", "buyer", 200, lambda client, data: client.post(
+        reverse("api:password"),
+        {"currentPassword": "secret-password", "newPassword": "secret-password-2"},
+        content_type = "application/json",
+    )),
+    "banners": ("banners", None, 200, lambda client, data: client.get(reverse("api:banners"))),
+    "sale": ("sale", None, 200, lambda client, data: client.get(reverse("api:sale"))),
+    "catalog": ("catalog", None, 200, lambda client, data: client.get(reverse("api:catalog"))),
+    "catalog filtered": ("catalog", None, 200, lambda client, data: client.get(
+        reverse("api:catalog"),
+        {"filter[name]": "phone", "filter[available]": "true", "tags[]": [data.category.tags.first().pk], "sort": "rating"},
+    )),
+    "catalog facets": ("catalog_facets", None, 200, lambda client, data: client.get(reverse("api:catalog_facets"))),
+    "popular": ("popular", None, 200, lambda client, data: client.get(reverse("api:popular"))),
+    "limited": ("limited", None, 200, lambda client, data: client.get(reverse("api:limited"))),
+    "product": ("product_id", None, 200, lambda client, data: client.get(reverse("api:product_id", args = [data.product.pk]))),
+    "review POST": ("create_review", "buyer", 200, lambda client, data: client.post(
+        reverse("api:create_review", args = [data.product.pk]),
+        {"author": "Buyer", "email": "buyer@example.com", "text": "good", "rate": 5},
+        content_type = "application/json",
+    )),
+    "basket GET": ("basket", "buyer", 200, lambda client, data: client.get(reverse("api:basket"))),
+    "basket GET anonymous": ("basket", None, 200, lambda client, data: client.get(reverse("api:basket"))),
+    "basket POST": ("basket", "buyer", 200, lambda client, data: client.post(
+        reverse("api:basket"), {"id": data.product.pk, "count": 1}, content_type = "application/json"
+    )),
+    "basket POST batch": ("basket", "buyer", 200, lambda client, data: client.post(
+        reverse("api:basket"),
+        [{"op": "add", "id": product.pk, "count": 1} for product in data.products],
+        content_type = "application/json",
+    )),
+    "basket DELETE": ("basket", "buyer", 200, lambda client, data: client.delete(
+        reverse("api:basket"), {"id": data.product.pk, "count": 1}, content_type = "application/json"
+    )),
+    "orders GET": ("orders", "buyer", 200, lambda client, data: client.get(reverse("api:orders"))),
+    "orders GET summary": ("orders", "buyer", 200, lambda client, data: client.get(reverse("api:orders"), {"summary": 1})),
+    "orders POST": ("orders", "buyer", 200, lambda client, data: client.post(reverse("api:orders"))),
+    "order GET": ("orderid", "buyer", 200, lambda client, data: client.get(reverse("api:orderid", args = [data.order.pk]))),
+    "order POST": ("orderid", "buyer", 200, lambda client, data: client.post(
+        reverse("api:orderid", args = [data.order.pk]), ORDER_FORM, content_type = "application/json"
+    )),
+    "payment POST": ("paymant", "buyer", 200, lambda client, data: client.post(
+        reverse("api:paymant", args = [data.order.pk]), {"number": "12345672"}, content_type = "application/json"
+    )),
+    "categories": ("catigories", None, 200, lambda client, data: client.get(reverse("api:catigories"))),
+    "tags": ("tags", None, 200, lambda client, data: client.get(reverse("api:tags"), {"category": data.category.pk})),
+    "cache stats": ("cache_stats", "staff", 200, lambda client, data: client.get(reverse("api:cache_stats"))),
+    "metrics": ("metrics", "staff", 200, lambda client, data: client.get(reverse("api:metrics"))),
+    "slow queries": ("slow_queries", "staff", 200, lambda client, data: client.get(reverse("api:slow_queries"))),
+}
+
+
+class QueryCountTests(TestCase):
+    """
+        Вызывает каждый маршрут api/urls.py на двух размерах данных. Число запросов к базе
+        не должно зависеть от числа строк (иначе это N+1) и не должно превышать бюджет
+        из query_budgets.json.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(
+            MEDIA_ROOT = cls.media_root,
+            PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"],
+        ))
+        cls.budgets = json.loads(QUERY_BUDGETS_PATH.read_text()) if QUERY_BUDGETS_PATH.exists() else {}
+        cls.measured = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.media_root, ignore_errors = True)
+        if os.environ.get("QUERY_BUDGETS_UPDATE") and cls.measured:
+            QUERY_BUDGETS_PATH.write_text(json.dumps(dict(sorted(cls.measured.items())), indent = 2) + "\n")
+        super().tearDownClass()
+
+    def count_queries(self, name:str, size:int) -> tuple[int, int, list[str]]:
+        """Число запросов одного вызова на свежих данных размера size; всё откатывается."""
+        url_name, user, status, call = ROUTE_CASES[name]
+        with transaction.atomic():
+            data = Dataset(size)
+            client = Client()
+            if user:
+                client.force_login(getattr(data, user))
+            for cache in caches.all():
+                cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = call(client, data)
+            transaction.set_rollback(True)
+        return len(queries), response.status_code, [query["sql"] for query in queries.captured_queries]
+
+    def test_every_route_is_covered(self):
+        names = {pattern.name for pattern in api_urls.urlpatterns}
+        covered = {url_name for url_name, user, status, call in ROUTE_CASES.values()}
+        self.assertFalse(names - covered, "Добавьте новые маршруты в ROUTE_CASES")
+
+    def test_query_counts(self):
+        for name in ROUTE_CASES:
+            with self.subTest(route = name):
+                small, small_status, small_sql = self.count_queries(name, SMALL_DATASET)
+                large, large_status, large_sql = self.count_queries(name, LARGE_DATASET)
+                # Бюджет, снятый с ответа 4xx, мерил бы отказ, а не работу маршрута
+                expected = ROUTE_CASES[name][2]
+                self.assertEqual(small_status, expected, name)
+                self.assertEqual(large_status, expected, name)
+                self.measured[name] = large
+                self.assertEqual(
+                    small, large,
+                    f"{name}: {small} запросов на {SMALL_DATASET} строках и {large} на {LARGE_DATASET}\n"
+                    + "\n".join(large_sql),
+                )
+                if os.environ.get("QUERY_BUDGETS_UPDATE"):
+                    continue
+                self.assertIn(name, self.budgets, f"{name}: нет бюджета в {QUERY_BUDGETS_PATH.name}")
+                self.assertLessEqual(
+                    large, self.budgets[name],
+                    f"{name}: {large} запросов при бюджете {self.budgets[name]}\n" + "\n".join(large_sql),
+                )
+
+
+@override_settings(PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"])
+class CatalogVersionTests(TestCase):
+    """Версия каталога общая для всех процессов: живёт в базе, а не в локальном кэше процесса."""
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.data = Dataset(1)
+
+    def test_version_survives_local_cache_flush(self):
+        version = get_catalog_version()
+        for cache in caches.all():
+            cache.clear()
+        self.assertEqual(get_catalog_version(), version)
+
+    def test_change_in_another_process_invalidates_cached_responses(self):
+        url = reverse("api:catigories")
+        self.assertEqual(self.client.get(url).json()[0]["title"], "Category 0")
+        # Другой процесс: в этом сигналы не срабатывают, меняются только строки в базе
+        CatalogItem.objects.filter(pk = self.data.category.pk).update(title = "Renamed")
+        CatalogVersion.objects.update(value = F("value") + 1)
+        self.assertEqual(self.client.get(url).json()[0]["title"], "Renamed")
+
+    def test_change_in_another_process_changes_etag(self):
+        url = reverse("api:catigories")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH = etag).status_code, 304)
+        CatalogItem.objects.filter(pk = self.data.category.pk).update(title = "Renamed", updated_at = timezone.now())
+        CatalogVersion.objects.update(value = F("value") + 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH = etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_change_in_another_process_refreshes_product_cards(self):
+        url = reverse("api:banners")
+        self.assertEqual(self.client.get(url).json()[0]["title"], "Phone 0")
+        Product.objects.filter(pk = self.data.product.pk).update(title = "Renamed", updated_at = timezone.now())
+        CatalogVersion.objects.update(value = F("value") + 1)
+        self.assertEqual(self.client.get(url).json()[0]["title"], "Renamed")
+
+
+@override_settings(PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"])
+class PricingTests(TestCase):
+    """Суммы корзины и заказа считаются в SQL (pricing.py) и сходятся с ценами строк в ответах."""
+    def setUp(self):
+        self.data = Dataset(2)
+        self.client.login(username = "buyer", password = "secret-password")
+
+    def test_basket_total_header(self):
+        response = self.client.get(reverse("api:basket"))
+        lines_total = sum(Decimal(str(item["price"])) * item["count"] for item in response.json())
+        # Phone 0 со скидкой 90 и Phone 1 за 101, по две штуки
+        self.assertEqual(lines_total, Decimal("382.00"))
+        self.assertEqual(response["Basket-Total"], "382.00")
+        self.assertEqual(basket_total(Basket.objects.get(user = self.data.buyer)), lines_total)
+
+        response = self.client.post(
+            reverse("api:basket"), {"id": self.data.products[1].pk, "count": 1}, content_type = "application/json"
+        )
+        self.assertEqual(response["Basket-Total"], "483.00")
+
+    def test_order_total_matches_snapshot_lines(self):
+        order_id = self.client.post(reverse("api:orders")).json()["orderId"]
+        order = Order.objects.get(pk = order_id)
+        lines_total = sum(line.price * line.count for line in order.lines.all())
+        self.assertEqual(lines_total, Decimal("382.00"))
+        self.assertEqual(order.totalCost, lines_total)
+        self.assertEqual(order_total(order), lines_total)
+
+
+@override_settings(PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"])
+class AutoBannerTests(TestCase):
+    def setUp(self):
+        self.data = Dataset(2)
+
+    def test_rebuild_bumps_catalog_version(self):
+        version = get_catalog_version()
+        self.assertEqual(rebuild_auto_banners(), 2)
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_admin_action_runs_without_selection(self):
+        User.objects.create_superuser(username = "admin", password = "secret-password")
+        self.client.login(username = "admin", password = "secret-password")
+        response = self.client.post(
+            reverse("admin:api_banner_changelist"), {"action": "rebuild_auto", "index": 0}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Banner.objects.filter(source = Banner.SOURCE_AUTO).count(), 2)
+
+
+@override_settings(PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"])
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.data = Dataset(1)
+        Order.objects.bulk_create(Order(user = self.data.buyer, totalCost = Decimal(1)) for _ in range(ORDERS_PAGE_SIZE + 5))
+        self.total = get_user_orders(self.data.buyer).count()
+        self.client.login(username = "buyer", password = "secret-password")
+
+    def test_full_list_without_pagination_params(self):
+        orders = self.client.get(reverse("api:orders")).json()
+        self.assertEqual(len(orders), self.total)
+        self.assertGreater(self.total, ORDERS_PAGE_SIZE)
+
+    def test_pages_on_request(self):
+        url = reverse("api:orders")
+        page = self.client.get(url, {"currentPage": 1}).json()
+        self.assertEqual(len(page["items"]), ORDERS_PAGE_SIZE)
+        self.assertEqual((page["currentPage"], page["lastPage"]), (1, 2))
+        page = self.client.get(url, {"currentPage": 2, "limit": 5}).json()
+        self.assertEqual(len(page["items"]), 5)
+        self.assertEqual((page["currentPage"], page["lastPage"]), (2, -(-self.total // 5)))
+        page = self.client.get(url, {"cursor": "", "limit": 5}).json()
+        self.assertEqual(len(page["items"]), 5)
+        self.assertIsNotNone(page["nextCursor"])
+
+    def test_other_users_order_is_not_found(self):
+        other = User.objects.create_user(username = "other", password = "secret-password")
+        order = Order.objects.create(user = other, totalCost = Decimal(1))
+        url = reverse("api:orderid", args = [order.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(url, ORDER_FORM, content_type = "application/json").status_code, 404)
+        self.assertEqual(self.client.get(reverse("api:orderid", args = [self.data.order.pk])).status_code, 200)
+
+
+class RatingTests(TestCase):
+    """Агрегаты отзывов: сдвиги из сигналов и пересчёт сходятся, средняя оценка округляется, а не усекается."""
+    def setUp(self):
+        self.data = Dataset(1)
+        self.autor = Profile.objects.get(user__username = "reviewer0")
+
+    def aggregates(self) -> tuple:
+        return Product.objects.values_list("review_count", "rating_count", "rating_sum", "rating").get(
+            pk = self.data.product.pk
+        )
+
+    def review(self, valuation:int | None) -> Review:
+        return Review.objects.create(autor = self.autor, product = self.data.product, text = "ok", valuation = valuation)
+
+    def test_review_deltas(self):
+        self.assertEqual(self.aggregates(), (1, 1, 5, 5))
+        review = self.review(4)
+        self.assertEqual(self.aggregates(), (2, 2, 9, 5))
+        review.valuation = 2
+        review.save()
+        self.assertEqual(self.aggregates(), (2, 2, 7, 4))
+        self.review(None)
+        self.assertEqual(self.aggregates(), (3, 2, 7, 4))
+        self.review(1)
+        self.assertEqual(self.aggregates(), (4, 3, 8, 3))
+        review.delete()
+        self.assertEqual(self.aggregates(), (3, 2, 6, 3))
+
+    def test_recompute_after_drift(self):
+        self.review(4)
+        Product.objects.filter(pk = self.data.product.pk).update(review_count = 0, rating_count = 7, rating_sum = 1, rating = 1)
+        version = get_catalog_version()
+        call_command("recompute_ratings", stdout = io.StringIO())
+        self.assertEqual(self.aggregates(), (2, 2, 9, 5))
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_backfill_migration_rounds(self):
+        self.review(4)
+        Product.objects.filter(pk = self.data.product.pk).update(review_count = 0, rating_count = 0, rating_sum = 0, rating = 1)
+        migration = importlib.import_module("api.migrations.0010_product_rating_sum")
+        migration.backfill_ratings(django_apps, None)
+        self.assertEqual(self.aggregates(), (2, 2, 9, 5))
+
+
+class ContentStorageTests(TestCase):
+    """Хранилище по содержимому и collect_media_garbage не теряют файл при повторной загрузке тех же байтов."""
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors = True)
+        self.enterContext(override_settings(MEDIA_ROOT = self.media_root))
+        self.old = time.time() - 2 * 60 * 60
+
+    def save(self, payload:bytes = b"payload") -> str:
+        return default_storage.save("photo.jpg", ContentFile(payload))
+
+    def collect(self) -> None:
+        call_command("collect_media_garbage", stdout = io.StringIO())
+
+    def test_dedupe_hit_refreshes_mtime(self):
+        name = self.save()
+        path = default_storage.path(name)
+        os.utime(path, (self.old, self.old))
+        self.assertEqual(self.save(), name)
+        self.assertGreater(os.path.getmtime(path), self.old + 60)
+        self.assertEqual(StoredFile.objects.get(name = name).refs, 2)
+
+    def test_garbage_collection_rechecks_refs(self):
+        name = self.save()
+        path = default_storage.path(name)
+        default_storage.delete(name)
+        os.utime(path, (self.old, self.old))
+        # Загрузка тех же байтов сослалась на файл уже после того, как сборщик снял список tracked
+        StoredFile.objects.filter(name = name).update(refs = 1)
+        self.assertFalse(collect_media_garbage.Command().remove_content(name, path, time.time() - 60 * 60))
+        self.assertTrue(os.path.exists(path))
+
+        StoredFile.objects.filter(name = name).update(refs = 0)
+        self.collect()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredFile.objects.filter(name = name).exists())
+
+
+class MediaServingTests(TestCase):
+    """serve_media: условные запросы, диапазоны, защита путей, кэширование и отдача через веб-сервер."""
+    PAYLOAD = b"0123456789abcdef"
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors = True)
+        self.enterContext(override_settings(MEDIA_ROOT = self.media_root))
+        Path(self.media_root, "notes.txt").write_bytes(self.PAYLOAD)
+        Path(self.media_root, ".secret").write_bytes(self.PAYLOAD)
+
+    def get(self, name:str = "notes.txt", **headers):
+        return self.client.get(reverse("media", args = [name]), headers = headers)
+
+    def body(self, response) -> bytes:
+        return b"".join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.PAYLOAD)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Cache-Control"], f"public, max-age={media.MEDIA_MAX_AGE}")
+
+    def test_not_modified(self):
+        etag = self.get()["ETag"]
+        response = self.get(If_None_Match = etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_ranges(self):
+        response = self.get(Range = "bytes=0-9")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.PAYLOAD[:10])
+        self.assertEqual((response["Content-Length"], response["Content-Range"]), ("10", "bytes 0-9/16"))
+        response = self.get(Range = "bytes=-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.PAYLOAD[-5:])
+        self.assertEqual(response["Content-Range"], "bytes 11-15/16")
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range = "bytes=16-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */16")
+
+    def test_if_range(self):
+        etag = self.get()["ETag"]
+        self.assertEqual(self.get(Range = "bytes=0-9", If_Range = etag).status_code, 206)
+        response = self.get(Range = "bytes=0-9", If_Range = '"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.PAYLOAD)
+
+    def test_traversal_and_dotfiles_are_not_found(self):
+        self.assertEqual(self.get(".secret").status_code, 404)
+        self.assertEqual(self.get("content/../.secret").status_code, 404)
+        request = RequestFactory().get("/media/")
+        for path in ("../settings.py", os.path.abspath(__file__)):
+            with self.subTest(path = path), self.assertRaises(Http404):
+                media.serve_media(request, path)
+
+    def test_content_names_are_immutable(self):
+        name = default_storage.save("photo.txt", ContentFile(self.PAYLOAD))
+        response = self.get(name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], f"public, max-age={media.IMMUTABLE_MAX_AGE}, immutable")
+        self.assertEqual(response["ETag"], f'"{os.path.basename(name)}"')
+
+    def test_sendfile_delegation(self):
+        with mock.patch("api.media.MEDIA_SENDFILE", "x-accel"):
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], media.MEDIA_ACCEL_PREFIX + "notes.txt")
+        self.assertEqual(response.content, b"")
+        with mock.patch("api.media.MEDIA_SENDFILE", "x-sendfile"):
+            response = self.get()
+        self.assertEqual(response["X-Sendfile"], os.path.join(self.media_root, "notes.txt"))
+        self.assertNotIn("X-Accel-Redirect", response)
+
+
+class GZipMiddlewareTests(TestCase):
+    """JSONGZipMiddleware сжимает только длинные текстовые ответы и не трогает ответы на Range."""
+    LONG = b'{"items": "' + b"x" * GZIP_MIN_LENGTH + b'"}'
+
+    def process(self, response:HttpResponse, accept_encoding:str = "gzip, deflate") -> HttpResponse:
+        request = RequestFactory().get("/api/catalog", headers = {"Accept-Encoding": accept_encoding})
+        return JSONGZipMiddleware(lambda request: response).process_response(request, response)
+
+    def json_response(self, content:bytes = LONG, **kwargs) -> HttpResponse:
+        return HttpResponse(content, content_type = "application/json", **kwargs)
+
+    def test_size_threshold(self):
+        response = self.process(self.json_response(b"{}"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, b"{}")
+        response = self.process(self.json_response())
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.LONG)
+
+    def test_content_type_allowlist(self):
+        response = self.process(HttpResponse(self.LONG, content_type = "text/html; charset=utf-8"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        response = self.process(HttpResponse(self.LONG, content_type = "image/png"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertFalse(response.has_header("Vary"))
+
+    def test_accept_encoding_negotiation(self):
+        response = self.process(self.json_response(), accept_encoding = "identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, self.LONG)
+
+    def test_vary_on_accept_encoding(self):
+        for accept_encoding in ("gzip", "identity"):
+            with self.subTest(accept_encoding = accept_encoding):
+                response = self.process(self.json_response(), accept_encoding = accept_encoding)
+                self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_range_responses_are_not_compressed(self):
+        response = self.process(self.json_response(status = 206))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        response = self.json_response()
+        response["Content-Range"] = f"bytes 0-{len(self.LONG) - 1}/{len(self.LONG)}"
+        response = self.process(response)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, self.LONG)
+
+
+class ProjectionTests(TestCase):
+    """Проекции из .values()-строк дают ровно те же байты JSON, что и сериализаторы DRF."""
+    def setUp(self):
+        call_command("loaddata", settings.BASE_DIR / "fixtures.json", verbosity = 0)
+        self.data = Dataset(3)
+        image = ProductImage.objects.filter(product = self.data.product).order_by("pk").first()
+        image.variants = {"thumb": "content/ab/cd/derivatives/abcd-thumb.webp"}
+        image.save()
+        # Пустые значения, которые форматируются отдельно
+        Product.objects.filter(pk = self.data.products[1].pk).update(salePrice = None, description = None)
+
+    def assertSameJSON(self, projected:list, serialized:list) -> None:
+        self.assertTrue(projected)
+        self.assertEqual(JSONRenderer().render(projected), JSONRenderer().render(serialized))
+
+    def test_products(self):
+        products = Product.objects.order_by("pk")
+        self.assertSameJSON(
+            project_products(list(product_rows(products))),
+            ProductSerializer(products.prefetch_related("images", "tags"), many = True).data,
+        )
+
+    def test_sale_products(self):
+        products = Product.objects.order_by("pk")
+        self.assertSameJSON(
+            project_sale_products(list(product_rows(products, SALE_PRODUCT_FIELDS))),
+            SaleProductSerializer(products.prefetch_related("images"), many = True).data,
+        )
+
+    def test_basket(self):
+        for basket in Basket.objects.filter(basket_objects__isnull = False).distinct():
+            with self.subTest(basket = basket.pk):
+                lines = get_basket_lines(basket)
+                self.assertSameJSON(
+                    project_basket(basket_rows(lines)),
+                    BasketObjectSerializer(lines.select_related("product"), many = True).data,
+                )
+
+
+class ImageVariantTests(TestCase):
+    """Загруженная картинка получает превью и WebP-варианты после фиксации транзакции."""
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors = True)
+        self.enterContext(override_settings(MEDIA_ROOT = self.media_root))
+        self.product = Product.objects.create(price = Decimal(100), title = "Phone", dateForm = "2000-01-01", dateTo = "2999-01-01")
+
+    def test_variants_built_after_commit(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 400), "red").save(buffer, "PNG")
+        upload = SimpleUploadedFile("photo.png", buffer.getvalue(), content_type = "image/png")
+        # Воркер пула работал бы в своём соединении и не увидел бы незафиксированную запись теста
+        inline = mock.Mock(submit = lambda run_build, model, pk: images.build_variants(model, pk))
+        with mock.patch("api.images.get_executor", return_value = inline):
+            with self.captureOnCommitCallbacks(execute = True) as callbacks:
+                image = ProductImage.objects.create(product = self.product, src = upload, alt = "photo")
+        self.assertEqual(len(callbacks), 1)
+
+        image.refresh_from_db()
+        self.assertEqual(image.variants, images.variant_names(image.src.name))
+        self.assertEqual(set(image.variants), {"thumb", "thumb_webp", "medium", "medium_webp"})
+        for path in image.variants.values():
+            self.assertTrue(images.variant_storage.exists(path), path)
+        with images.variant_storage.open(image.variants["thumb_webp"]) as file:
+            self.assertEqual(Image.open(file).size, (200, 100))
+
+        data = ProductImageSerializer(image).data
+        self.assertEqual(data["variants"], {
+            variant: images.variant_storage.url(path) for variant, path in image.variants.items()
+        })
+        self.assertTrue(data["variants"]["medium_webp"].startswith(settings.MEDIA_URL + "content/"))
+
+
+class MetricsTests(TestCase):
+    """Счётчики завершившихся потоков остаются в сумме, а их словари уходят из registry."""
+    def test_finished_thread_counters_are_folded(self):
+        request = RequestFactory().get("/missing")
+        key = (metrics.UNMATCHED, "GET")
+        before = metrics.collect().get(key, metrics.EndpointStats()).requests
+        shards_before = set(metrics.Shards.registry)
+
+        thread = threading.Thread(
+            target = metrics.observe, args = (request, HttpResponse(b"ok"), metrics.RequestMetrics(request), 0.01)
+        )
+        thread.start()
+        thread.join()
+        self.assertEqual(len(set(metrics.Shards.registry) - shards_before), 1)
+        del thread
+        gc.collect()
+
+        self.assertEqual(set(metrics.Shards.registry), shards_before)
+        self.assertEqual(metrics.collect()[key].requests, before + 1)
+
+
+class ServerTimingTests(TestCase):
+    """Этапы Server-Timing каталога одинаковы в sync- и async-представлениях."""
+    def test_catalog_phases(self):
+        Dataset(1)
+        responses = {
+            "sync": self.client.get(reverse("api:catalog")),
+            "async": async_to_sync(async_views.catalog)(RequestFactory().get(reverse("api:catalog"))),
+        }
+        for name, response in responses.items():
+            with self.subTest(view = name):
+                phases = [metric.split(";")[0] for metric in response["Server-Timing"].split(", ")]
+                self.assertEqual(phases, ["build", "query", "serialize"])
+
+
+class AsyncViewParityTests(TransactionTestCase):
+    """
+        async-представления (ASGI) отвечают тем же статусом и теми же байтами, что и APIView.
+        run_sync ходит в базу из пула потоков, а те не видят незафиксированных данных TestCase.
+    """
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        with mock.patch("api.signals.schedule_variants"):
+            self.data = Dataset(3)
+
+    def assertSameResponse(self, view, url:str, params:dict | None = None, *args) -> None:
+        for cache in caches.all():
+            cache.clear()
+        sync_response = self.client.get(url, params)
+        for cache in caches.all():
+            cache.clear()
+        async_response = async_to_sync(view)(RequestFactory().get(url, params), *args)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.content, sync_response.content)
+
+    def test_catalog(self):
+        url = reverse("api:catalog")
+        for params in ({}, {"filter[name]": "phone", "sort": "price", "sortType": "inc"}, {"cursor": "", "limit": 2}):
+            with self.subTest(params = params):
+                self.assertSameResponse(async_views.catalog, url, params)
+
+    def test_product(self):
+        pk = self.data.product.pk
+        self.assertSameResponse(async_views.product_detail, reverse("api:product_id", args = [pk]), None, pk)
+
+    def test_missing_product(self):
+        pk = Product.objects.order_by("-pk").first().pk + 1
+        url = reverse("api:product_id", args = [pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertSameResponse(async_views.product_detail, url, None, pk)
+
+    def test_banners(self):
+        self.assertSameResponse(async_views.banners, reverse("api:banners"))
+
+
+@override_settings(PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"])
+class BasketWriteTests(TestCase):
+    """Изменения корзины пользователя: добавление к существующей строке и уменьшение до нуля."""
+    def setUp(self):
+        self.data = Dataset(2)
+        self.client.login(username = "buyer", password = "secret-password")
+
+    def counts(self) -> dict:
+        return dict(BasketObject.objects.filter(basket__user = self.data.buyer).values_list("product_id", "count"))
+
+    def send(self, method:str, payload) -> dict:
+        response = getattr(self.client, method)(reverse("api:basket"), payload, content_type = "application/json")
+        self.assertEqual(response.status_code, 200)
+        return {item["id"]: item["count"] for item in response.json()}
+
+    def test_add_increments_existing_line(self):
+        phone, other = self.data.products
+        lines = BasketObject.objects.filter(basket__user = self.data.buyer).count()
+        self.assertEqual(self.send("post", {"id": phone.pk, "count": 3}), {phone.pk: 5, other.pk: 2})
+        self.assertEqual(self.counts(), {phone.pk: 5, other.pk: 2})
+        self.assertEqual(BasketObject.objects.filter(basket__user = self.data.buyer).count(), lines)
+
+    def test_decrement_to_zero_deletes_line(self):
+        phone, other = self.data.products
+        self.assertEqual(self.send("delete", {"id": phone.pk, "count": 1}), {phone.pk: 1, other.pk: 2})
+        self.assertEqual(self.send("delete", {"id": phone.pk, "count": 1}), {other.pk: 2})
+        self.assertEqual(self.counts(), {other.pk: 2})
+        self.assertEqual(self.send("post", [{"op": "set", "id": other.pk, "count": 0}]), {})
+        self.assertEqual(self.counts(), {})
+
+
+@override_settings(PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"])
+class AnonymousBasketTests(TestCase):
+    """Корзина гостя в подписанной cookie: подделка игнорируется, при входе строки переносятся в корзину."""
+    def setUp(self):
+        self.data = Dataset(2)
+
+    def test_tampered_cookie_is_ignored(self):
+        phone = self.data.product
+        response = self.client.post(reverse("api:basket"), {"id": phone.pk, "count": 2}, content_type = "application/json")
+        signed = response.cookies[BASKET_COOKIE].value
+        self.assertTrue(signed.startswith(f"{phone.pk}:2:"))
+        payload, signature = signed.rsplit(":", 1)
+        # Завышенное количество со старой подписью и испорченная подпись
+        for tampered in (signed.replace(f"{phone.pk}:2:", f"{phone.pk}:200:", 1), f"{payload}:{signature[::-1]}"):
+            with self.subTest(cookie = tampered):
+                self.client.cookies[BASKET_COOKIE] = tampered
+                self.assertEqual(self.client.get(reverse("api:basket")).json(), [])
+        self.client.cookies[BASKET_COOKIE] = signed
+        self.assertEqual([item["count"] for item in self.client.get(reverse("api:basket")).json()], [2])
+
+    def test_cookie_is_merged_on_sign_in(self):
+        phone, other = self.data.products
+        self.client.post(
+            reverse("api:basket"),
+            [{"id": phone.pk, "count": 3}, {"id": other.pk, "count": 1}],
+            content_type = "application/json",
+        )
+        response = self.client.post(
+            reverse("api:login"), **form_json({"username": "buyer", "password": "secret-password"})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies[BASKET_COOKIE].value, "")
+        counts = dict(BasketObject.objects.filter(basket__user = self.data.buyer).values_list("product_id", "count"))
+        self.assertEqual(counts, {phone.pk: 5, other.pk: 3})
+
+
+@override_settings(PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"])
+class OrderSnapshotTests(TestCase):
+    """Строки заказа — снимок на момент оформления и не следуют за изменениями каталога."""
+    def setUp(self):
+        self.data = Dataset(2)
+        self.client.login(username = "buyer", password = "secret-password")
+
+    def test_lines_stay_frozen_after_price_change(self):
+        order_id = self.client.post(reverse("api:orders")).json()["orderId"]
+        url = reverse("api:orderid", args = [order_id])
+        before = self.client.get(url).json()
+
+        for product in Product.objects.filter(pk__in = [product.pk for product in self.data.products]):
+            product.price += 1000
+            product.salePrice = Decimal(1)
+            product.title = "Renamed"
+            product.save()
+
+        after = self.client.get(url).json()
+        self.assertEqual(after["products"], before["products"])
+        self.assertEqual(after["totalCost"], before["totalCost"])
+        self.assertEqual([line["title"] for line in after["products"]], ["Phone 0", "Phone 1"])
+
+
+# Настройки реплики до запуска тестов: тестовый раннер делает её зеркалом тестовой базы default
+REPLICA_SETTINGS = copy.deepcopy(settings.DATABASES["replica"])
+
+
+@override_settings(PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+        Роутер на настоящих соединениях. TestCase держит каждый тест в atomic() на default,
+        и роутер там всегда выбирает default, поэтому реплика проверяется здесь.
+    """
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        # Вне atomic() on_commit срабатывает сразу; фоновые превью для несуществующих файлов здесь не нужны
+        with mock.patch("api.signals.schedule_variants"):
+            self.data = Dataset(1)
+
+    def test_catalog_reads_go_to_replica(self):
+        with CaptureQueriesContext(connections["replica"]) as replica, CaptureQueriesContext(connection) as default:
+            response = self.client.get(reverse("api:product_id", kwargs = {"pk": self.data.product.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('"api_product"' in query["sql"] for query in replica.captured_queries))
+        self.assertFalse(any('"api_product"' in query["sql"] for query in default.captured_queries))
+        self.assertEqual(Product.objects.get(pk = self.data.product.pk)._state.db, "replica")
+
+    def test_writes_and_reads_in_transaction_go_to_default(self):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            with transaction.atomic():
+                product = Product.objects.get(pk = self.data.product.pk)
+                product.title = "Renamed"
+                product.save()
+                self.assertEqual(Product.objects.get(pk = product.pk).title, "Renamed")
+        self.assertEqual(product._state.db, "default")
+        self.assertEqual(replica.captured_queries, [])
+
+        with CaptureQueriesContext(connection) as default:
+            Tag.objects.create(name = "new", category = self.data.category)
+        self.assertTrue(any(query["sql"].startswith("INSERT") for query in default.captured_queries))
+
+    def test_read_only_connection_rejects_writes(self):
+        # В тестах реплика зеркалит тестовую базу default, поэтому mode=ro проверяется на отдельном файле
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "db.sqlite3"
+            with sqlite3.connect(path) as database:
+                database.execute("CREATE TABLE item (id INTEGER PRIMARY KEY)")
+            database.close()
+            self.assertIn("mode=ro", str(REPLICA_SETTINGS["NAME"]))
+            replica = load_backend(REPLICA_SETTINGS["ENGINE"]).DatabaseWrapper(
+                {**REPLICA_SETTINGS, "NAME": f"file:{path}?mode=ro"}, "replica-check"
+            )
+            try:
+                with replica.cursor() as cursor:
+                    cursor.execute("SELECT COUNT(*) FROM item")
+                    self.assertEqual(cursor.fetchone(), (0,))
+                    with self.assertRaisesMessage(OperationalError, "readonly"):
+                        cursor.execute("INSERT INTO item (id) VALUES (1)")
+            finally:
+                replica.close()
+
+
+class FacetQueryTests(TestCase):
+    """compute_facets укладывается в FACET_QUERIES запросов при любых фильтрах и размере каталога."""
+    def test_query_count_is_pinned(self):
+        CatalogGenerator(Scale(products = 30, users = 2, categories = 3, tags = 6), seed = 2).generate()
+        tag_ids = [str(pk) for pk in Tag.objects.order_by("pk").values_list("pk", flat = True)[:2]]
+        for params in (
+            {},
+            {"tags[]": tag_ids, "filter[minPrice]": "100"},
+            {"filter[name]": "phone", "filter[available]": "true", "filter[freeDelivery]": "true"},
+        ):
+            query_dict = QueryDict(mutable = True)
+            for key, value in params.items():
+                query_dict.setlist(key, value if isinstance(value, list) else [value])
+            with self.subTest(params = params), self.assertNumQueries(FACET_QUERIES):
+                compute_facets(CatalogQuery.from_query_params(query_dict))
+
+
+class PaginationTests(TestCase):
+    """Курсоры пагинации по ключу: упаковка, тай-брейк по id и совместимость со страницами currentPage."""
+    def setUp(self):
+        self.data = Dataset(5)
+        # Одинаковая цена у трёх товаров: порядок внутри группы задаёт только id
+        Product.objects.filter(pk__in = [product.pk for product in self.data.products[:3]]).update(price = Decimal(150))
+
+    def request(self, **params) -> Request:
+        return Request(RequestFactory().get("/api/catalog", params))
+
+    def walk(self, ordering:str, page_size:int, paginate = paginate_queryset) -> list[int]:
+        ids, cursor = [], ""
+        while cursor is not None:
+            object_list, page_info = paginate(self.request(cursor = cursor), Product.objects.all(), ordering, page_size)
+            ids += [product.pk for product in object_list]
+            cursor = page_info["nextCursor"]
+        return ids
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor("-price", Decimal("150.00"), 7)
+        self.assertEqual(decode_cursor(cursor, "-price"), ("150.00", 7))
+        for broken, ordering in ((cursor, "price"), ("not-a-cursor", "-price"), (cursor[:-3], "-price")):
+            with self.subTest(cursor = broken, ordering = ordering):
+                with self.assertRaises(ValidationError):
+                    decode_cursor(broken, ordering)
+
+    def test_ties_are_broken_by_id(self):
+        for ordering in ("price", "-price"):
+            with self.subTest(ordering = ordering):
+                expected = list(
+                    Product.objects.order_by(ordering, ordering.replace("price", "id")).values_list("pk", flat = True)
+                )
+                self.assertEqual(self.walk(ordering, page_size = 2), expected)
+                self.assertEqual(self.walk(ordering, page_size = 2, paginate = async_to_sync(apaginate_queryset)), expected)
+
+    def test_offset_pages_match_cursor_pages(self):
+        ids = []
+        for page_number in (1, 2, 3):
+            object_list, page_info = paginate_queryset(
+                self.request(currentPage = page_number), Product.objects.all(), "-price", 2
+            )
+            self.assertEqual(page_info, {"currentPage": page_number, "lastPage": 3})
+            ids += [product.pk for product in object_list]
+        self.assertEqual(ids, self.walk("-price", page_size = 2))
+
+
+class SearchTests(TestCase):
+    """Полнотекстовый поиск: ранжирование BM25, префиксы и синхронизация индекса с каталогом."""
+    def product(self, title:str, fullDescription:str = "") -> Product:
+        return Product.objects.create(
+            price = Decimal(100), title = title, description = "", fullDescription = fullDescription
+        )
+
+    def found(self, text:str) -> set:
+        return set(search_queryset(Product.objects.all(), text).values_list("pk", flat = True))
+
+    def test_title_outranks_description(self):
+        in_description = self.product("Charger", fullDescription = "works with any phone")
+        in_title = self.product("Phone X")
+        ranked = annotate_rank(Product.objects.all(), "phone").order_by(RANK_FIELD)
+        self.assertEqual([product.pk for product in ranked], [in_title.pk, in_description.pk])
+
+        response = self.client.get(reverse("api:catalog"), {"filter[name]": "phone"})
+        self.assertEqual([card["title"] for card in response.json()["items"]], ["Phone X", "Charger"])
+
+    def test_prefix_matching(self):
+        product = self.product("Smartphone Galaxy")
+        self.assertEqual(self.found("gal"), {product.pk})
+        self.assertEqual(self.found("smart gala"), {product.pk})
+        self.assertEqual(self.found("galaxy note"), set())
+
+    def test_index_follows_product_rename(self):
+        product = self.product("Old name")
+        product.title = "Fresh name"
+        product.save()
+        self.assertEqual(self.found("fresh"), {product.pk})
+        self.assertEqual(self.found("old"), set())
+
+    def test_index_follows_tag_changes(self):
+        product = self.product("Phone")
+        tag = Tag.objects.create(name = "waterproof")
+        tag.product.add(product)
+        self.assertEqual(self.found("waterproof"), {product.pk})
+        tag.name = "rugged"
+        tag.save()
+        self.assertEqual(self.found("rugged"), {product.pk})
+        self.assertEqual(self.found("waterproof"), set())
+        tag.product.remove(product)
+        self.assertEqual(self.found("rugged"), set())
+        tag.product.add(product)
+        tag.delete()
+        self.assertEqual(self.found("rugged"), set())
+
+    def test_index_follows_specification_changes(self):
+        product = self.product("Phone")
+        specification = SpecificationsProduct.objects.create(name = "color", value = "crimson")
+        specification.products.add(product)
+        self.assertEqual(self.found("crimson"), {product.pk})
+        specification.value = "amber"
+        specification.save()
+        self.assertEqual(self.found("amber"), {product.pk})
+        self.assertEqual(self.found("crimson"), set())
+        specification.delete()
+        self.assertEqual(self.found("amber"), set())
+
+
+class CatalogIndexTests(TestCase):
+    """Снимок каталога в памяти отдаёт те же страницы, что и ORM, для одного и того же CatalogQuery."""
+    @classmethod
+    def setUpTestData(cls):
+        CatalogGenerator(Scale(products = 60, users = 4, categories = 3, tags = 10), seed = 1).generate()
+        cls.tag_ids = list(Tag.objects.order_by("pk").values_list("pk", flat = True)[:2])
+        cls.category = Product.objects.order_by("pk").values_list("category", flat = True).first()
+
+    def catalog_params(self) -> list[dict]:
+        params = [
+            {"sort": sort, "sortType": sort_type}
+            for sort in ("price", "rating", "reviews", "date") for sort_type in ("inc", "dec")
+        ]
+        params += [
+            {"filter[minPrice]": "100", "filter[maxPrice]": "5000", "sort": "price"},
+            {"filter[freeDelivery]": "true", "filter[available]": "true", "sort": "date", "sortType": "dec"},
+            {"tags[]": [str(tag) for tag in self.tag_ids], "sort": "rating"},
+            {"category": str(self.category), "sort": "reviews", "sortType": "dec"},
+        ]
+        return params
+
+    def paginate(self, params:dict, index:CatalogIndex) -> tuple:
+        query_dict = QueryDict(mutable = True)
+        for key, value in params.items():
+            query_dict.setlist(key, value if isinstance(value, list) else [value])
+        request = Request(RequestFactory().get("/api/catalog", query_dict))
+        query = CatalogQuery.from_query_params(query_dict)
+        object_list, orm_info = paginate_queryset(
+            request = request,
+            queryset = query.compile(Product.objects.only("pk")),
+            ordering = query.ordering,
+            page_size = query.limit,
+        )
+        index_ids, index_info = index.paginate(request = request, query = query)
+        return [product.pk for product in object_list], orm_info, index_ids, index_info
+
+    def test_pages_match_orm(self):
+        index = CatalogIndex()
+        for params in self.catalog_params():
+            for page in ("1", "2"):
+                with self.subTest(params = params, page = page):
+                    orm_ids, orm_info, index_ids, index_info = self.paginate(
+                        {**params, "limit": "7", "currentPage": page}, index
+                    )
+                    self.assertEqual(index_ids, orm_ids)
+                    self.assertEqual(index_info, orm_info)
+
+    def test_cursor_pages_match_orm(self):
+        index = CatalogIndex()
+        for params in self.catalog_params():
+            with self.subTest(params = params):
+                cursor, pages = "", 0
+                while cursor is not None:
+                    orm_ids, orm_info, index_ids, index_info = self.paginate(
+                        {**params, "limit": "7", "cursor": cursor}, index
+                    )
+                    self.assertEqual(index_ids, orm_ids)
+                    self.assertEqual(index_info, orm_info)
+                    cursor, pages = orm_info["nextCursor"], pages + 1
+                self.assertGreater(pages, 0)
+
+    def test_rebuilds_after_max_age(self):
+        params = {"sort": "price", "sortType": "inc", "limit": "1"}
+        fresh, stale = CatalogIndex(max_age = 0), CatalogIndex(max_age = None)
+        fresh.rebuild()
+        stale.rebuild()
+        # Правка мимо сигналов и версии каталога: её видит только снимок с истёкшим max_age
+        product = Product.objects.order_by("price").first()
+        Product.objects.filter(pk = product.pk).update(price = Decimal("99999999.00"))
+        self.assertEqual(self.paginate(params, fresh)[2], [product.pk])
+        self.assertNotEqual(self.paginate(params, stale)[2], [product.pk])
+
+
+class BenchmarkDataTests(TestCase):
+    """Генератор нагрузочного стенда: агрегаты отзывов сходятся с пересчётом, clear() убирает всё созданное."""
+    def aggregates(self) -> list[tuple]:
+        return list(
+            generated_products().order_by("pk").values_list("review_count", "rating_count", "rating_sum", "rating")
+        )
+
+    def test_generate_and_clear(self):
+        before = describe_dataset()
+        scale = Scale(products = 40, users = 4, categories = 3, tags = 10)
+        CatalogGenerator(scale, seed = 1, batch_size = 15).generate()
+
+        self.assertEqual(describe_dataset()["products"], before["products"] + 40)
+        generated = self.aggregates()
+        recompute_products(generated_products())
+        self.assertEqual(self.aggregates(), generated)
+
+        self.assertEqual(clear(), 40)
+        self.assertFalse(has_generated_data())
+        self.assertEqual(describe_dataset(), before)
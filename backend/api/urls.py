@@ -1,7 +1,34 @@
+from django.conf import settings
 from django.urls import path
-from .views import RegisterApiView,ProductReview, TagsAPIView ,PaymantAPIView,CatigoriesAPIView, OrdersIdAPIView, OrdersAPIView, BasketAPIView, LogoutAPIView,ProductIdAPIView, LoginAPIView, ProfileAPIView, BannersAPIView, ProductlimitedAPIView, SaleAPIView, CatalogAPIView, ProductPopularAPIView
+from . import async_views
+from .metrics import metrics_view, slow_queries_view
+from .views import CacheStatsAPIView, CatalogFacetsAPIView, RegisterApiView,ProductReview, TagsAPIView ,PaymantAPIView,CatigoriesAPIView, OrdersIdAPIView, OrdersAPIView, BasketAPIView, LogoutAPIView,ProductIdAPIView, LoginAPIView, ProfileAPIView, BannersAPIView, ProductlimitedAPIView, SaleAPIView, CatalogAPIView, ProductPopularAPIView
 app_name = "api"
 
+# Под ASGI читающие эндпоинты каталога обслуживаются async-представлениями (см. async_views.py)
+if getattr(settings, "API_ASYNC_VIEWS", False):
+    read_views = {
+        "banners": async_views.banners,
+        "sale": async_views.sale,
+        "catalog": async_views.catalog,
+        "popular": async_views.popular,
+        "limited": async_views.limited,
+        "product_id": async_views.product_detail,
+        "catigories": async_views.categories,
+        "tags": async_views.tags,
+    }
+else:
+    read_views = {
+        "banners": BannersAPIView.as_view(),
+        "sale": SaleAPIView.as_view(),
+        "catalog": CatalogAPIView.as_view(),
+        "popular": ProductPopularAPIView.as_view(),
+        "limited": ProductlimitedAPIView.as_view(),
+        "product_id": ProductIdAPIView.as_view(),
+        "catigories": CatigoriesAPIView.as_view(),
+        "tags": TagsAPIView.as_view(),
+    }
+
 urlpatterns = [
     path("sign-up", RegisterApiView.as_view(), name = "register"),
     path("sign-in", LoginAPIView.as_view(), name = "login"),
@@ -11,12 +38,13 @@ urlpatterns = [
     path("profile/avatar", ProfileAPIView.as_view(), name="avatar"),
     path("profile/password", ProfileAPIView.as_view(), name = "password"),
      
-    path("banners", BannersAPIView.as_view(), name = "banners"),
-    path("sales/", SaleAPIView.as_view(), name="sale"),
-    path("catalog", CatalogAPIView.as_view(), name = "catalog"),
-    path("products/popular", ProductPopularAPIView.as_view(), name="popular"),
-    path("products/limited", ProductlimitedAPIView.as_view(), name="limited"),
-    path("product/<int:pk>", ProductIdAPIView.as_view(), name="product_id"),
+    path("banners", read_views["banners"], name = "banners"),
+    path("sales/", read_views["sale"], name="sale"),
+    path("catalog", read_views["catalog"], name = "catalog"),
+    path("catalog/facets", CatalogFacetsAPIView.as_view(), name = "catalog_facets"),
+    path("products/popular", read_views["popular"], name="popular"),
+    path("products/limited", read_views["limited"], name="limited"),
+    path("product/<int:pk>", read_views["product_id"], name="product_id"),
     path("product/<int:pk>/reviews", ProductReview.as_view(), name="create_review"),
 
     path("basket", BasketAPIView.as_view(), name="basket"),
@@ -24,7 +52,11 @@ urlpatterns = [
     path("order/<int:pk>", OrdersIdAPIView.as_view(), name="orderid"),
     path("payment/<int:id>", PaymantAPIView.as_view(), name = "paymant"),
 
-    path("categories", CatigoriesAPIView.as_view(), name = "catigories"),
-    path("tags", TagsAPIView.as_view(), name="tags"),
+    path("categories", read_views["catigories"], name = "catigories"),
+    path("tags", read_views["tags"], name="tags"),
+
+    path("cache/stats", CacheStatsAPIView.as_view(), name="cache_stats"),
+    path("metrics", metrics_view, name = "metrics"),
+    path("metrics/slow-queries", slow_queries_view, name = "slow_queries"),
 
 ]
\ No newline at end of file
@@ -4,6 +4,8 @@ from rest_framework.serializers import ModelSerializer
 
 from django.db import models
 from django.core.paginator import Paginator
+from contextlib import contextmanager
+import time
 def get_data_from_request(request:Request) -> dict:
         """
             Функция, преобразующая 'сломанный' объект request.data в обычный словарь (dict).
@@ -26,12 +28,15 @@ def get_data_from_request(request:Request) -> dict:
         return data
 
 def save_profile_avatar(instance, filename:str) -> str:
-     return f"images/previews/{instance.pk}/{filename}"
+     # Хранилище по умолчанию именует файл по хэшу содержимого (см. storage.py), от пути остаётся расширение
+     return f"images/previews/{filename}"
 
 def save_product_image(instance, filename:str) -> str:
-     return f"images/product/{instance.product.pk}/{filename}"
+     return f"images/product/{filename}"
 
 def get_user_profile_info(user_profile) -> dict:
+    from .images import variant_urls
+
     user_avatar = user_profile.avatar or None
     data:dict = {
         "fullName":user_profile.fullName,
@@ -43,6 +48,7 @@ def get_user_profile_info(user_profile) -> dict:
         data["avatar"] = {
             'src':user_avatar.url,
             "alt": "NONE",
+            "variants": variant_urls(user_profile.avatar_variants),
         }
     return data
 
@@ -62,3 +68,20 @@ def get_paginate_data(paginator:Paginator, page:int, serializer:ModelSerializer)
     page = paginator.page(page)
     return serializer(page.object_list, many = True)
 
+class ServerTiming:
+    """
+        Собирает длительность этапов обработки запроса для заголовка Server-Timing.
+    """
+    def __init__(self):
+        self.metrics: list[tuple[str, float]] = []
+
+    @contextmanager
+    def measure(self, name:str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metrics.append((name, (time.perf_counter() - start) * 1000))
+
+    def header(self) -> str:
+        return ", ".join(f"{name};dur={duration:.2f}" for name, duration in self.metrics)
@@ -7,12 +7,27 @@ from rest_framework.authentication import SessionAuthentication
 from rest_framework import permissions
 from django.contrib.auth import authenticate, login, logout
 from rest_framework.permissions import IsAuthenticated
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404
 
-from .filters import ProductFilter
-from .serializers import UserSerializer, OrderSerializer, CatalogItemsSerializer, ProfileSerializer, ProductSerializer, BasketSerializer, SaleProductSerializer, ReviewSerializer, ProductIdSerializer
-from .utils import get_data_from_request, get_user_profile_info, is_valid_and_save
+from .banners import get_banner_product_ids
+from .basket import (
+    apply_operations, basket_headers, get_basket, get_basket_lines, parse_operations, BASKET_COOKIE,
+    read_anonymous_basket, write_anonymous_basket, apply_anonymous_operations, get_anonymous_rows, merge_anonymous_basket,
+)
+from .cache import cached_response, get_cache_stats, request_catalog_version
+from .catalog import CatalogQuery
+from .conditional import list_condition, product_condition
+from .catalog_index import catalog_index, is_enabled as is_catalog_index_enabled
+from .facets import get_facets
+from .fragments import FRAGMENT_ROW_FIELDS, fragment_response, get_fragments, get_row_fragments
+from .orders import ORDERS_PAGE_SIZE, get_user_orders, snapshot_order, with_order_details, with_order_summary
+from .pagination import get_page_size, is_paginated, paginate_queryset
+from .pricing import order_total
+from .projections import (
+    SALE_PRODUCT_FIELDS, basket_rows, product_rows, project_basket, project_sale_products,
+)
+from .serializers import UserSerializer, OrderSerializer, OrderSummarySerializer, CatalogItemsSerializer, ProfileSerializer, ReviewSerializer, ProductIdSerializer
+from .utils import get_data_from_request, get_user_profile_info, is_valid_and_save, ServerTiming
 from .models import Profile, Product, Basket, BasketObject, Order, CatalogItem
 
 class RegisterApiView(APIView):
@@ -51,7 +66,10 @@ class RegisterApiView(APIView):
             )
 
             login(request=request, user = auth_user)
-            return Response(status = 200)
+            response = Response(status = 200)
+            if merge_anonymous_basket(request = request, user = auth_user):
+                response.delete_cookie(BASKET_COOKIE)
+            return response
         
         return Response(status = 400)
         
@@ -61,7 +79,10 @@ class LoginAPIView(APIView):
         data = get_data_from_request(request=request)
         user = User.objects.get(username = data.get("username"))
         login(request = request, user = user )
-        return Response({}, status=200)
+        response = Response({}, status=200)
+        if merge_anonymous_basket(request = request, user = user):
+            response.delete_cookie(BASKET_COOKIE)
+        return response
         
 class LogoutAPIView(APIView, IsAuthenticated):
     def post(self, request:Request) -> Response:
@@ -148,150 +169,154 @@ class ProfileAPIView(APIView, IsAuthenticated):
             return Response(status = 400)
 
 class BannersAPIView(APIView):
+    @list_condition("banners")
+    @cached_response("banners")
     def get(self, request:Request) -> Response:
         """
             Метод обработки HTTP GET-запроса для загрузки баннеров на главную страницу сайта.
         """
-        
-        banners = ProductSerializer(
-            Product.objects.prefetch_related("tags", "images"), many = True
-        )
-        return Response(banners.data[:3], status = 200)
+        return fragment_response(get_fragments(get_banner_product_ids()))
     
 class SaleAPIView(APIView):
 
+    @list_condition("sale")
+    @cached_response("sale")
     def get(self, request:Request) -> Response:
         """
             Метод обработки HTTP GET-запроса для загрузки товаров со скидкой.
         """
-        page_number = request.GET.get("currentPage")
-
-        paginator = Paginator(
-                Product.objects.prefetch_related("images").filter(is_sale = True),
-                10
-            )
-        
+        object_list, page_info = paginate_queryset(
+            request = request,
+            queryset = product_rows(Product.objects.filter(is_sale = True), SALE_PRODUCT_FIELDS),
+            ordering = "id",
+            page_size = 10,
+        )
 
-        serializer = SaleProductSerializer(paginator.page(page_number).object_list, many = True)
         result = {
-            "items": [dict(item) for item in serializer.data],
-            "currentPage":page_number,
-            "lastPage":paginator.num_pages
-
+            "items": project_sale_products(object_list),
+            **page_info,
         }
 
         return Response(result, status = 200)
     
 class CatalogAPIView(APIView):
+    @list_condition("catalog")
     def get(self, request:Request) -> Response:
         """
             Метод обработки HTTP GET-запроса для загрузки и фильтрации товаров по критериям.
             
-            "name": "string",
-            "minPrice": 0,
-            "maxPrice": 0,
-            "freeDelivery": false,
-            "available": true
-            
-        """
-        params = dict(request.GET)
-        filters_list = {}
-        
-        for key in params.copy().keys():
-            if params[key][0] != '':
-                params[key] = params[key][0] if not params[key][0].isdigit() else int(params[key][0])
+            "filter[name]": "string",
+            "filter[minPrice]": 0,
+            "filter[maxPrice]": 0,
+            "filter[freeDelivery]": false,
+            "filter[available]": true,
+            "tags[]": [0],
+            "category": 0,
+            "sort": "price",
+            "sortType": "inc"
+
+            При CATALOG_INDEX_ENABLED запросы без поиска обслуживаются снимком каталога в памяти
+            (см. catalog_index.py), иначе — через ORM.
+            Длительность этапов отдаётся в заголовке Server-Timing: build — разбор параметров и построение
+            ленивого queryset (без запроса к базе), query — выполнение запроса страницы, serialize — карточки.
+            Страница выбирает только id товаров, ответ склеивается из готовых карточек (см. fragments.py).
+        """
+        timing = ServerTiming()
+        with timing.measure("build"):
+            query = CatalogQuery.from_query_params(request.GET)
+            use_index = is_catalog_index_enabled() and catalog_index.supports(query)
+            if not use_index:
+                queryset = product_rows(
+                    query.compile(Product.objects.all()), FRAGMENT_ROW_FIELDS, extra = (query.ordering.lstrip("-"),)
+                )
+
+        with timing.measure("query"):
+            if use_index:
+                product_ids, page_info = catalog_index.paginate(request = request, query = query)
             else:
-                params.pop(key)
-      
-        for key in params.keys():
-            if key.startswith("filter"):
-                short_key = key[7:-1]
-                if short_key == "name":
-                    filters_list["title"] = params[key]
-                elif short_key == "available":
-                    if params[key] == "true":
-                        filters_list[short_key] = True
-                   
-                elif short_key == "minPrice" or short_key == "maxPrice":
-                    filters_list["price__range"] = (params["filter[minPrice]"], params["filter[maxPrice]"])
-                elif short_key == "freeDelivery":
-                   if params[key] == "true":
-                        filters_list[short_key] = True
-                else: 
-                    filters_list[key] = params[key]
-        print(filters_list)
-        sorting_mode = "-" if params['sortType'] == "inc" else ""
-        queryset = Product.objects.prefetch_related("images", "tags").order_by(f"{sorting_mode}{params['sort']}").filter(price__range = filters_list["price__range"])
-        filterset = ProductFilter(
-                data = filters_list,
-                queryset = queryset
-            )
-        
-        paginator = Paginator(
-            filterset.qs,
-            params["limit"]
-        )
-        serializer = ProductSerializer(
-            paginator.page(params["currentPage"]).object_list,
-            many = True
-        )
-        data = {
-            "items":serializer.data,
-            "currentPage":params["currentPage"],
-            "lastPage": 1            
-        }
+                object_list, page_info = paginate_queryset(
+                    request = request,
+                    queryset = queryset,
+                    ordering = query.ordering,
+                    page_size = query.limit,
+                )
+                product_ids = [row["id"] for row in object_list]
+        with timing.measure("serialize"):
+            fragments = get_fragments(product_ids) if use_index else get_row_fragments(object_list)
         
-        return Response(data = data,  status = 200)
+        return fragment_response(fragments, page_info, headers = {"Server-Timing": timing.header()})
     
+class CatalogFacetsAPIView(APIView):
+    @list_condition("catalog_facets")
+    def get(self, request:Request) -> Response:
+        """
+            Метод обработки HTTP GET-запроса для получения количества товаров по тегам, категориям,
+            флагам freeDelivery/available и диапазонам цен. Принимает те же параметры, что и каталог.
+        """
+        query = CatalogQuery.from_query_params(request.GET)
+        return Response(data = get_facets(query, request_catalog_version(request)), status = 200)
+
 class ProductPopularAPIView(APIView):
+    @list_condition("popular")
+    @cached_response("popular")
     def get(self, request:Request) -> Response:
         """
             Метод обработки HTTP GET-запроса для загрузки товаров с самым лудшим рейтингом.
         """
-        paginator = Paginator(
-            Product.objects.prefetch_related("tags", "images").filter(rating__gt = 3),
-            20
+        object_list, page_info = paginate_queryset(
+            request = request,
+            queryset = product_rows(Product.objects.filter(rating__gt = 3), FRAGMENT_ROW_FIELDS, extra = ("rating",)),
+            ordering = "-rating",
+            page_size = 20,
         )
-        serializer = ProductSerializer(
-                paginator.page(1).object_list, many = True
-            )
-        
-        return Response(data = serializer.data, status=200)
+        fragments = get_row_fragments(object_list)
+        if "nextCursor" in page_info:
+            return fragment_response(fragments, page_info)
+        return fragment_response(fragments)
 
 class ProductlimitedAPIView(APIView):
+    @list_condition("limited")
+    @cached_response("limited")
     def get(self, request:Request) -> Response:
         """
             Метод обработки HTTP GET-запроса для загрузки товаров с ограничиным тиражом.
         """
-        paginator = Paginator(
-            Product.objects.prefetch_related("tags", "images").filter(is_limit = True),
-            20
+        object_list, page_info = paginate_queryset(
+            request = request,
+            queryset = product_rows(Product.objects.filter(is_limit = True), FRAGMENT_ROW_FIELDS),
+            ordering = "id",
+            page_size = 20,
         )
         
-        serializer = ProductSerializer(
-                paginator.page(1).object_list, many = True
-            )
-        
-        return Response(data = serializer.data, status=200)
+        fragments = get_row_fragments(object_list)
+        if "nextCursor" in page_info:
+            return fragment_response(fragments, page_info)
+        return fragment_response(fragments)
 
 class ProductIdAPIView(APIView):
+    @product_condition
     def get(self, request:Request, pk:int) -> Response:
         """
             Метод обработки HTTP GET-запроса для загрузки деталей товара по индексу pk.
         """
-        serializer = ProductIdSerializer(instance = Product.objects.get(pk = pk), partial = True, many = False)
+        product = get_object_or_404(
+            Product.objects.prefetch_related("images", "tags", "reviews", "specifications"), pk = pk
+        )
+        serializer = ProductIdSerializer(instance = product, partial = True, many = False)
         
         return Response(serializer.data, status = 200)
 
 class ProductReview(APIView, IsAuthenticated):
+    permission_classes = [IsAuthenticated]
 
     def post(self, request:Request, pk:int) -> Response:
         """
-            Метод обработки HTTP POSt-запроса для загрузки комметариев к товару (доработать к исправлению фронтенда).
+            Метод обработки HTTP POSt-запроса для загрузки комметариев к товару.
+            Фронтенд шлёт JSON {author, email, text, rate}; автор отзыва — профиль текущего пользователя.
         """
-        print(request.POST.get("text"))
-        data = dict(request.POST)
+        data = {field: request.data.get(field) for field in ("email", "text", "rate")}
         data["product"] = pk
+        data["autor"] = request.user.profile.pk
         serializer = ReviewSerializer(data = data)
         if is_valid_and_save(serializer=serializer):
             serializer = ProductIdSerializer(instance = Product.objects.get(pk = pk), partial = True, many = False)
@@ -302,92 +327,102 @@ class BasketAPIView(APIView, IsAuthenticated):
     def get(self, request:Request) -> Response:
         """
             Метод обработки HTTP GET-запроса для загрузки корцины пользователя.
+            Корзина гостя читается из подписанной cookie без обращения к таблицам корзин.
+            Сумма корзины пользователя отдаётся в заголовке Basket-Total (см. pricing.basket_total).
         """
-        if isinstance(request.user, User):
-            user = request.user
-            basket, basket_is_create = Basket.objects.get_or_create(user = user)
-            basket_serializer = BasketSerializer(instance = basket)
+        if request.user.is_authenticated:
+            basket = get_basket(request.user)
+            items = project_basket(basket_rows(get_basket_lines(basket)))
             
-            return Response(data = basket_serializer.data["basket_objects"][::-1], status = 200)
-        else:
-            return Response({"user":"Anonimus"}, status = 200)
+            return Response(data = items[::-1], status = 200, headers = basket_headers(basket))
+        lines = read_anonymous_basket(request)
+        items = project_basket(get_anonymous_rows(lines))
+        return Response(data = items[::-1], status = 200)
+
     def post(self, request:Request) -> Response:
         """
-            Метод обработки HTTP POST-запроса для создания карцины пользователя.
+            Метод обработки HTTP POST-запроса для добавления товаров в карзину пользователя.
+
+            Принимает {"id": 1, "count": 2} или список таких объектов с полем "op"
+            ("add", "set", "remove") для пакетного изменения корзины.
         """
-        product_instance = Product.objects.prefetch_related("images","tags").get(
-                    pk = request.data['id']
-                )
-        basket, basket_is_create = Basket.objects.get_or_create(user = request.user)
-        
-        basket_object, basket_object_is_create = BasketObject.objects.get_or_create(
-            basket = basket, product = product_instance
-        )
-        
-        if not basket_object_is_create:
-            basket_object.count += request.data["count"]
-            basket_object.save()
-        else:
-            basket_object.count = request.data["count"]
-            basket_object.save()
-            
-        user = request.user
-        basket, basket_is_create = Basket.objects.get_or_create(user = user)
-        basket_serializer = BasketSerializer(instance = basket)
-        data = basket_serializer.data["basket_objects"]
-        return Response(data = data, status = 200)
+        return self.mutate(request = request, operations = parse_operations(request.data))
     
     def delete(self, request:Request):
         """
             Метод обработки HTTP DALETE-запроса для удаления обьекта из козины
         """
-        basket = request.user.basket
-        data = request.data
-        basket_object = basket.basket_objects.get(product__id = data["id"])
-        if basket_object.count == data['count']:
-            basket_object.delete()
-        else:
-            basket_object.count = basket_object.count - data['count']
-            basket_object.save()
-        basket_serializer = BasketSerializer(instance = basket)
-        data = basket_serializer.data["basket_objects"]
-        return Response(data = data, status = 200)
+        operations = [
+            ("remove", product_id, count) for op, product_id, count in parse_operations(request.data)
+        ]
+        return self.mutate(request = request, operations = operations)
+
+    def mutate(self, request:Request, operations:list) -> Response:
+        if request.user.is_authenticated:
+            basket = get_basket(request.user)
+            apply_operations(basket = basket, operations = operations)
+            return Response(
+                data = project_basket(basket_rows(get_basket_lines(basket))), status = 200, headers = basket_headers(basket)
+            )
+
+        lines = apply_anonymous_operations(read_anonymous_basket(request), operations)
+        response = Response(data = project_basket(get_anonymous_rows(lines)), status = 200)
+        write_anonymous_basket(response, lines)
+        return response
         
-class OrdersAPIView(APIView, IsAuthenticated):
+class OrdersAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
     def get(self, request:Request) -> Response:
         """
-            Метод обработки HTTP GET-запроса для получает все заказы.
+            Метод обработки HTTP GET-запроса для получения заказов текущего пользователя, новые первыми.
+
+            ?summary=1 — только id, дата, статус, сумма и число позиций.
+            ?cursor= — пагинация по ключу, ответ {"items": [...], "nextCursor": "..."};
+            ?currentPage= — страница по номеру, ответ {"items": [...], "currentPage": n, "lastPage": m}, как у каталога.
+            Размер страницы в обоих режимах — ?limit= (по умолчанию 20).
+            Без этих параметров, как и раньше, возвращается весь список заказов.
         """
-        orders = Order.objects.prefetch_related("products", "profile").all()
-        order_serializer = OrderSerializer(orders, many = True)
-        return Response(order_serializer.data, status = 200)
+        orders = get_user_orders(request.user)
+        summary = request.GET.get("summary") in ("1", "true")
+        if summary:
+            orders, serializer_class = with_order_summary(orders), OrderSummarySerializer
+        else:
+            orders, serializer_class = with_order_details(orders), OrderSerializer
+
+        if not is_paginated(request):
+            return Response(serializer_class(orders.order_by("-id"), many = True).data, status = 200)
+        object_list, page_info = paginate_queryset(
+            request = request,
+            queryset = orders,
+            ordering = "-id",
+            page_size = get_page_size(request, default = ORDERS_PAGE_SIZE),
+        )
+        order_serializer = serializer_class(object_list, many = True)
+        return Response({"items": order_serializer.data, **page_info}, status = 200)
     
     @transaction.atomic
     def post(self, request:Request):
         """
             Метод обработки HTTP POST-запроса для создания заказа отдельного пользователя.
         """
-        basket_objects = BasketObject.objects.filter(basket = request.user.basket)
         order, order_is_create = Order.objects.get_or_create(
             
             profile = request.user.profile,
         )
-        if order_is_create:
-            order.products.set(basket_objects)
-        total_price = sum(
-                [product.product.price for product in order.products.prefetch_related("product").all()]
-            )
-        order.totalCost = total_price
-        order.save()
+        snapshot_order(order = order, basket = get_basket(request.user))
         
         return Response({"orderId":order.pk}, status = 200)
 
-class OrdersIdAPIView(APIView, IsAuthenticated):
+class OrdersIdAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
     def get(self, request:Request, pk:int)-> Response:
         """
             Метод обработки HTTP GET-запроса для получения по ID заказа и вывода по ниму информации.
+            Чужие заказы не видны: поиск идёт только среди заказов пользователя (get_user_orders).
         """
-        order = get_object_or_404(Order, pk = pk)
+        order = get_object_or_404(with_order_details(get_user_orders(request.user)), pk = pk)
         order_serializer = OrderSerializer(instance = order)
         return Response(order_serializer.data, status = 200)
     
@@ -405,12 +440,13 @@ class OrdersIdAPIView(APIView, IsAuthenticated):
             "address":request.data["address"],
             "paymentType":request.data["paymentType"],
             "status":request.data["status"],
-            "totalCost":request.data["totalCost"],
 
         }
         
+        order = get_object_or_404(get_user_orders(request.user), pk = pk)
+        data["totalCost"] = order_total(order)
         order_serializer = OrderSerializer(
-            instance = Order.objects.get(pk = pk)
+            instance = order
         )
         order_serializer.update(instance = order_serializer.instance, validated_data = data).save()
 
@@ -427,6 +463,7 @@ class PaymantAPIView(APIView, IsAuthenticated):
             
         if int(request.data["number"]) % 2 == 0 and int(request.data["number"]) % 10 != 0:
             order.status = "accepted"
+            order.totalCost = order_total(order)
             order.profile = None
             order.user = request.user
             basket.user = None
@@ -439,17 +476,20 @@ class PaymantAPIView(APIView, IsAuthenticated):
         return Response(status=400)
 
 class CatigoriesAPIView(APIView):
+    @list_condition("catigories", group = "categories")
+    @cached_response("catigories")
     def get(self, request:Request) -> Response:
         """
             Метод обработки HTTP GET-запроса для получения катигорий.
         """
         item_serializer = CatalogItemsSerializer(
-            CatalogItem.objects.prefetch_related("subcategories", "image"), many = True
+            CatalogItem.objects.select_related("image").prefetch_related("subcategories", "tags"), many = True
         )
         return Response(data = item_serializer.data, status = 200)
 
 class TagsAPIView(APIView):
     
+    @list_condition("tags", group = "categories")
     def get(self, request:Response):
         """
             Метод обработки HTTP GET-запроса для получения тегов отдельной категории.
@@ -479,3 +519,13 @@ class TagsAPIView(APIView):
 
 
 
+
+
+class CacheStatsAPIView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request:Request) -> Response:
+        """
+            Метод обработки HTTP GET-запроса для получения статистики попаданий в кэш ответов.
+        """
+        return Response(get_cache_stats(), status = 200)
\ No newline at end of file
@@ -47,7 +47,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.JSONGZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,13 +82,85 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# api.backends.sqlite3 applies OPTIONS['pragmas'] on connect and starts atomic() blocks with
+# BEGIN IMMEDIATE, so concurrent writers wait for busy_timeout instead of failing under WAL
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'api.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pragmas': SQLITE_PRAGMAS, 'transaction_mode': 'IMMEDIATE'},
+    },
+    # Read-only connection to the same file: with WAL, catalog readers never wait for basket/checkout
+    # writers. Point NAME at a copy kept in sync by litestream/sqlite3_rsync to read from a real replica.
+    'replica': {
+        'ENGINE': 'api.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pragmas': {
+            **{name: value for name, value in SQLITE_PRAGMAS.items() if name != 'journal_mode'},
+            'query_only': 1,
+        }},
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# Catalog reads go to the 'replica' connection, everything else to 'default' (see api/routers.py)
+DATABASE_ROUTERS = ['api.routers.CatalogReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Pre-rendered product card JSON, one entry per product (see api/fragments.py)
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Seconds a cached API response stays valid if the catalog does not change
+RESPONSE_CACHE_TIMEOUT = 60 * 5
+
+# Seconds a pre-rendered product card lives without being invalidated by a change
+PRODUCT_FRAGMENT_TIMEOUT = 60 * 60
+
+# Route read-only catalog endpoints to the async views in api/async_views.py (for ASGI deployments);
+# their sync-only parts run in a pool of ASYNC_SYNC_WORKERS threads
+API_ASYNC_VIEWS = False
+ASYNC_SYNC_WORKERS = 8
+
+# Resized product image / avatar variants, built in a background thread pool (see api/images.py)
+IMAGE_VARIANTS = {"thumb": (200, 200), "medium": (600, 600)}
+IMAGE_WORKERS = 2
+
+# Per-endpoint request metrics at /api/metrics (Prometheus text format, see api/metrics.py).
+# Scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>"; staff users can always read them.
+# Queries slower than METRICS_SLOW_QUERY_MS are kept (last METRICS_SLOW_QUERY_LOG) at /api/metrics/slow-queries
+METRICS_TOKEN = None
+METRICS_SLOW_QUERY_MS = None
+METRICS_SLOW_QUERY_LOG = 100
+
+# Only JSON/text responses at least this many bytes long are gzip-compressed
+GZIP_MIN_LENGTH = 1024
+
+# Serve catalog filtering and sorting from an in-memory NumPy snapshot (requires numpy)
+CATALOG_INDEX_ENABLED = False
+# The snapshot is rebuilt from the database at least every CATALOG_INDEX_MAX_AGE seconds (None disables)
+CATALOG_INDEX_MAX_AGE = 60 * 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -126,6 +200,24 @@ USE_TZ = True
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
 
+# Uploads are stored once per content hash with reference counting (see api/storage.py)
+STORAGES = {
+    "default": {
+        "BACKEND": "api.storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+# Media is served by api.media.serve_media; set to "x-accel" (nginx) or "x-sendfile"
+# to hand the file transfer to the web server, which must map MEDIA_ACCEL_PREFIX to MEDIA_ROOT
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+# Cache lifetime for media without a content hash in the name
+MEDIA_MAX_AGE = 60 * 60
+
 STATIC_URL = 'static/'
 
 # Default primary key field type
@@ -16,18 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
 from django.conf import settings
+from api.media import serve_media
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/", include("api.urls")),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name = "media"),
     path("", include("frontend.urls")),
 ]
 
-urlpatterns.extend(
-    static(
-        settings.MEDIA_URL, document_root = settings.MEDIA_ROOT
-    )
-)
-
 